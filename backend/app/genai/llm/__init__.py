@@ -1,3 +1,21 @@
-from .openai_agent import OpenAIAgent
+from app.utils.lifecycle import LazySingleton
 
-llm_agent = OpenAIAgent()
+
+def _openai():
+    from .openai_agent import OpenAIAgent
+
+    return OpenAIAgent()
+
+
+def _create_llm_agent():
+    from app.genai.llm.routed_agent import Routed_LLM_Agent
+    from app.genai.provider_router import ProviderRouter
+
+    # Hedging only starts once LLM_PROVIDERS lists a second provider to hedge to
+    router = ProviderRouter.from_env(
+        "llm", {"openai": _openai}, "openai:1", timeout=30, hedge=True, hedge_delay=8
+    )
+    return Routed_LLM_Agent(router)
+
+
+llm_agent = LazySingleton(_create_llm_agent, "llm_agent")
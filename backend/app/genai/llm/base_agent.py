@@ -1,5 +1,7 @@
-import time
+from typing import Optional
 
+from app.genai.llm.message_assembly import MessageAssembler
+from app.utils.metrics import record_llm_input_tokens, stage
 from pydantic import BaseModel
 
 
@@ -46,38 +48,63 @@ class Base_LLM_Agent:
     def generate_response(
         self,
         query: str,
-        message_history: list[dict] = [],
+        message_history: Optional[list[dict]] = None,
         response_model=str,
         system_prompt: str = "",
     ) -> str:
         # if not self.__validate_message_history(message_history):
         #     raise ValueError("Invalid message history")
 
-        # Add the new message to the message history
-        if len(system_prompt) > 0:
-            message_history.append({"role": "system", "content": system_prompt})
-
-        message_history.append({"role": self.user_prefix, "content": query})
+        # The caller's history is copied into the prefix, never modified
+        assembler = MessageAssembler.create(system_prompt, message_history or [])
+        assembler.append({"role": self.user_prefix, "content": query})
+        message_history = assembler.build()
 
         response = None
 
-        llm_start_time = time.time()
-        if response_model is str:
-            response = self._generate_normal_response(message_history)
-        else:
-            response = self._generate_structured_response(
-                message_history, response_model
-            )
-        llm_end_time = time.time()
-        llm_duration = llm_end_time - llm_start_time
-        print(f"LLM generated response in {llm_duration} seconds")
+        with stage("llm", self.agent_name) as timing:
+            if response_model is str:
+                response = self._generate_normal_response(message_history)
+            else:
+                response = self._generate_structured_response(
+                    message_history, response_model
+                )
+        print(f"LLM generated response in {timing.duration} seconds")
 
         if response is None:
             raise ValueError(f"Response is None for agent {self.agent_name}")
 
         return response
 
-    def _generate_tool_call_response(self, message_history: list[dict], tools: list[dict]) -> str:
+    def _embed(self, text: str) -> list[float]:
+        raise NotImplementedError("Subclasses must implement _embed")
+
+    def _report_prompt_cache(self, input_tokens: int, cached_tokens: int):
+        record_llm_input_tokens(self.agent_name, input_tokens, cached_tokens)
+        print(
+            f"{self.agent_name} input tokens: {cached_tokens} cached, "
+            f"{input_tokens - cached_tokens} uncached"
+        )
+
+    def _generate_tool_call_response(
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
+    ) -> str:
         raise NotImplementedError(
             "Subclasses must implement _generate_tool_call_response"
         )
+
+    async def _stream_tool_call_response(
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
+        text_tool: str = None,
+        text_argument: str = "response",
+    ):
+        raise NotImplementedError(
+            "Subclasses must implement _stream_tool_call_response"
+        )
+        yield
@@ -0,0 +1,46 @@
+import copy
+from typing import Sequence
+
+
+class PromptPrefix:
+    """System prompt, tools and older history, frozen for the whole turn.
+
+    Providers cache prompts by exact prefix, so everything in here is copied
+    once and never reordered or mutated; new items only ever go after it.
+    """
+
+    __slots__ = ("system_prompt", "tools", "messages")
+
+    def __init__(self, system_prompt: str, tools: Sequence[dict], history: Sequence[dict]):
+        self.system_prompt = system_prompt
+        self.tools = tuple(copy.deepcopy(list(tools)))
+        messages = []
+        if len(system_prompt) > 0:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.extend(copy.deepcopy(list(history)))
+        self.messages = tuple(messages)
+
+
+class MessageAssembler:
+    """Builds model inputs as a stable prefix followed by the turns added since."""
+
+    def __init__(self, prefix: PromptPrefix):
+        self.prefix = prefix
+        self.turns = []
+
+    @classmethod
+    def create(
+        cls, system_prompt: str, history: Sequence[dict], tools: Sequence[dict] = ()
+    ) -> "MessageAssembler":
+        return cls(PromptPrefix(system_prompt, tools, history))
+
+    def append(self, item) -> None:
+        self.turns.append(item)
+
+    @property
+    def tools(self) -> list[dict]:
+        return list(self.prefix.tools)
+
+    def build(self) -> list:
+        """A fresh input list, so callers can never modify the prefix in place."""
+        return list(self.prefix.messages) + list(self.turns)
@@ -3,8 +3,10 @@ import os
 
 import instructor
 from app.genai.llm.base_agent import Base_LLM_Agent
+from app.genai.llm.partial_json import PartialJSONStringField
 from dotenv import load_dotenv
-from openai import OpenAI
+from models.genai.llm_stream import LLMStreamEvent, LLMStreamEventType
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel
 
 load_dotenv()
@@ -14,25 +16,94 @@ class OpenAIAgent(Base_LLM_Agent):
     def __init__(self):
         super().__init__("OpenAI", "assistant", "user")
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.instrcutor_client = instructor.from_openai(self.client)
         self.model = "gpt-4.1"
+        self.embedding_model = "text-embedding-3-small"
 
     def _generate_tool_call_response(
-        self, message_history: list[dict], tools: list[dict], system_prompt: str
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
     ) -> str:
-        message_history.insert(0, {"role": "system", "content": system_prompt})
         response = self.client.responses.create(
             model=self.model,
             input=message_history,
             tools=tools,
-            tool_choice="required",
+            tool_choice=tool_choice,
+            parallel_tool_calls=True,
         )
+        self._report_response_usage(response)
         return response
 
+    async def _stream_tool_call_response(
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
+        text_tool: str = None,
+        text_argument: str = "response",
+    ):
+        """Yields text deltas and finished tool calls while the response is generated.
+
+        The ``text_argument`` of ``text_tool`` calls is streamed as text deltas,
+        the same way plain output text is.
+        """
+        stream = await self.async_client.responses.create(
+            model=self.model,
+            input=message_history,
+            tools=tools,
+            tool_choice=tool_choice,
+            parallel_tool_calls=True,
+            stream=True,
+        )
+
+        text_fields = {}
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield LLMStreamEvent(type=LLMStreamEventType.TEXT_DELTA, text=event.delta)
+            elif event.type == "response.output_item.added":
+                if event.item.type == "function_call" and event.item.name == text_tool:
+                    text_fields[event.item.id] = PartialJSONStringField(text_argument)
+            elif event.type == "response.function_call_arguments.delta":
+                if event.item_id in text_fields:
+                    text = text_fields[event.item_id].feed(event.delta)
+                    if text:
+                        yield LLMStreamEvent(type=LLMStreamEventType.TEXT_DELTA, text=text)
+            elif event.type == "response.output_item.done":
+                if event.item.type == "function_call":
+                    yield LLMStreamEvent(
+                        type=LLMStreamEventType.TOOL_CALL, tool_call=event.item
+                    )
+            elif event.type == "response.completed":
+                self._report_response_usage(event.response)
+                yield LLMStreamEvent(
+                    type=LLMStreamEventType.COMPLETED, response=event.response
+                )
+
+    def _embed(self, text: str) -> list[float]:
+        response = self.client.embeddings.create(model=self.embedding_model, input=text)
+        return response.data[0].embedding
+
+    def _report_response_usage(self, response):
+        if response.usage is None:
+            return
+        self._report_prompt_cache(
+            response.usage.input_tokens,
+            response.usage.input_tokens_details.cached_tokens,
+        )
+
     def _generate_normal_response(self, message_history: list[dict]) -> str:
         response = self.client.chat.completions.create(
             model=self.model, messages=message_history
         )
+        if response.usage is not None:
+            details = response.usage.prompt_tokens_details
+            self._report_prompt_cache(
+                response.usage.prompt_tokens,
+                (details.cached_tokens or 0) if details else 0,
+            )
         return response.choices[0].message.content
 
     def _generate_structured_response(
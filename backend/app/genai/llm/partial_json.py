@@ -0,0 +1,60 @@
+import json
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class PartialJSONStringField:
+    """Decodes one top-level string field of a JSON object while it is still streaming.
+
+    ``feed`` takes the next chunk of the arguments JSON and returns whatever part
+    of the field's value became decodable, so text can be forwarded before the
+    object is complete.
+    """
+
+    def __init__(self, key: str):
+        self.key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*"')
+        self.buffer = ""
+        self.position = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+        if self.position is None:
+            match = self.key_pattern.search(self.buffer)
+            if match is None:
+                return ""
+            self.position = match.end()
+
+        decoded = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                decoded.append(char)
+                self.position += 1
+                continue
+
+            # Wait for the rest of an escape sequence that is split across chunks
+            if self.position + 1 >= len(self.buffer):
+                break
+            escape = self.buffer[self.position + 1]
+            if escape == "u":
+                if self.position + 6 > len(self.buffer):
+                    break
+                code = self.buffer[self.position : self.position + 6]
+                # Surrogate pairs need both halves before they can be decoded
+                if 0xD800 <= int(code[2:], 16) <= 0xDBFF:
+                    if self.position + 12 > len(self.buffer):
+                        break
+                    code = self.buffer[self.position : self.position + 12]
+                decoded.append(json.loads(f'"{code}"'))
+                self.position += len(code)
+            else:
+                decoded.append(_ESCAPES.get(escape, escape))
+                self.position += 2
+        return "".join(decoded)
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+from app.genai.llm.base_agent import Base_LLM_Agent
+from app.genai.provider_router import ProviderRouter, ProviderUnavailable
+from pydantic import BaseModel
+
+
+class Routed_LLM_Agent(Base_LLM_Agent):
+    """Spreads LLM calls over the router's providers."""
+
+    def __init__(self, router: ProviderRouter):
+        first = router.providers[0].agent
+        super().__init__(
+            "+".join(provider.agent.agent_name for provider in router.providers),
+            first.agent_prefix,
+            first.user_prefix,
+        )
+        self.router = router
+
+    def _generate_normal_response(self, message_history: list[dict]) -> str:
+        return self.router.call(lambda agent: agent._generate_normal_response(message_history))
+
+    def _generate_structured_response(self, message_history: list[dict], response_model: BaseModel):
+        return self.router.call(
+            lambda agent: agent._generate_structured_response(message_history, response_model)
+        )
+
+    def _generate_tool_call_response(self, message_history: list[dict], tools: list[dict], tool_choice="required"):
+        return self.router.call(
+            lambda agent: agent._generate_tool_call_response(message_history, tools, tool_choice)
+        )
+
+    def _embed(self, text: str) -> list[float]:
+        # Vectors from different models cannot be compared, the semantic cache needs one
+        return self.router.call(lambda agent: agent._embed(text), pinned=True)
+
+    async def _stream_tool_call_response(
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
+        text_tool: str = None,
+        text_argument: str = "response",
+    ):
+        # Streamed text is already on its way to the client, so streams are not
+        # hedged and only fail over while nothing has been yielded yet
+        errors = []
+        for provider in self.router.ranked():
+            started = time.monotonic()
+            stream = provider.agent._stream_tool_call_response(
+                message_history, tools, tool_choice, text_tool, text_argument
+            )
+            yielded = False
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(anext(stream), timeout=self.router.timeout)
+                    except StopAsyncIteration:
+                        break
+                    yielded = True
+                    yield event
+            except Exception as e:
+                self.router.record(provider, None)
+                if yielded:
+                    raise
+                print(f"llm provider {provider.name} failed before streaming: {e!r}")
+                errors.append(f"{provider.name}: {e!r}")
+                continue
+            finally:
+                await stream.aclose()
+            self.router.record(provider, time.monotonic() - started)
+            return
+        raise ProviderUnavailable(f"All llm providers failed: {'; '.join(errors)}")
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from crawler.normalize import normalize_title
+
+
+class SemanticCache:
+    """Replies keyed by query meaning and the recent context.
+
+    Queries are embedded and compared by cosine similarity against a brute-force
+    NumPy index. A hit additionally requires the same context fingerprint and an
+    entry that has not outlived its TTL. The index lives in process memory only,
+    so a restart, which a new system prompt or tool set needs anyway, empties it.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Sequence[float]],
+        threshold: float = 0.92,
+        ttl: float = 3600,
+        max_entries: int = 10000,
+        context_turns: int = 2,
+        max_embeddings: int = 256,
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.context_turns = context_turns
+        self.max_embeddings = max_embeddings
+
+        self.lock = threading.Lock()
+        # Recent query embeddings, so the store after a miss reuses the lookup's
+        self.embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.vectors: Optional[np.ndarray] = None
+        self.fingerprints: List[str] = []
+        self.expires_at = np.empty(0, dtype=np.float64)
+        self.replies: List[str] = []
+
+    def _context_fingerprint(self, message_history: Sequence[dict]) -> str:
+        recent = list(message_history)[-self.context_turns :] if self.context_turns > 0 else []
+        context = [
+            [message.get("role"), normalize_title(str(message.get("content", "")))]
+            for message in recent
+        ]
+        return hashlib.sha1(json.dumps(context, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _embed(self, query: str) -> np.ndarray:
+        text = normalize_title(query)
+        with self.lock:
+            vector = self.embeddings.get(text)
+            if vector is not None:
+                self.embeddings.move_to_end(text)
+                return vector
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm > 0 else vector
+        with self.lock:
+            self.embeddings[text] = vector
+            if len(self.embeddings) > self.max_embeddings:
+                self.embeddings.popitem(last=False)
+        return vector
+
+    def _live_mask(self, fingerprint: str) -> np.ndarray:
+        return (self.expires_at > time.time()) & (np.asarray(self.fingerprints) == fingerprint)
+
+    def lookup(self, query: str, message_history: Sequence[dict]) -> Optional[str]:
+        if not normalize_title(query):
+            return None
+        vector = self._embed(query)
+        fingerprint = self._context_fingerprint(message_history)
+        with self.lock:
+            if self.vectors is None or len(self.replies) == 0:
+                return None
+            similarities = np.where(self._live_mask(fingerprint), self.vectors @ vector, -1.0)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            print(f"Semantic cache hit ({similarities[best]:.3f}) for {query}")
+            return self.replies[best]
+
+    def store(self, query: str, message_history: Sequence[dict], reply: str) -> None:
+        if not normalize_title(query) or not reply:
+            return
+        vector = self._embed(query)
+        fingerprint = self._context_fingerprint(message_history)
+        with self.lock:
+            self._evict()
+            if self.vectors is None:
+                self.vectors = vector[np.newaxis, :]
+            else:
+                self.vectors = np.vstack([self.vectors, vector])
+            self.fingerprints.append(fingerprint)
+            self.expires_at = np.append(self.expires_at, time.time() + self.ttl)
+            self.replies.append(reply)
+
+    def _evict(self) -> None:
+        if self.vectors is None:
+            return
+        keep = self.expires_at > time.time()
+        # Oldest entries go first once the index is full
+        overflow = int(keep.sum()) - self.max_entries + 1
+        if overflow > 0:
+            keep[np.flatnonzero(keep)[:overflow]] = False
+        if keep.all():
+            return
+        indices = np.flatnonzero(keep)
+        self.vectors = self.vectors[indices]
+        self.fingerprints = [self.fingerprints[i] for i in indices]
+        self.expires_at = self.expires_at[indices]
+        self.replies = [self.replies[i] for i in indices]
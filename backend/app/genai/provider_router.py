@@ -0,0 +1,229 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.metrics.prometheus import (PROVIDER_BREAKER_OPEN,
+                                          PROVIDER_HEDGES, PROVIDER_REQUESTS)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ProviderUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures. Once ``reset_timeout`` passed it lets a
+    single trial call through, its success closes the breaker and its failure
+    reopens it for another ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        opened_at = self.opened_at
+        return opened_at is not None and time.monotonic() - opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Whether a call may go out, taking the trial slot when the breaker is half-open."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Restarting the timer lets no other call through until the trial
+            # reports, or the next window if it never does
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    def __init__(self, name: str, agent: Any, weight: float, breaker: CircuitBreaker, window: int = 200):
+        self.name = name
+        self.agent = agent
+        self.weight = weight
+        self.breaker = breaker
+        self.latencies: deque = deque(maxlen=window)
+
+    def p95(self, min_samples: int = 20) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class ProviderRouter:
+    """Routes each call to one of several interchangeable agents.
+
+    Every call has a deadline. If the primary has not answered after its p95
+    latency, the same call is hedged to a backup and the first answer wins.
+    Failed providers trip a circuit breaker and the call fails over to the next.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        providers: List[Provider],
+        timeout: float,
+        hedge: bool,
+        hedge_delay: float,
+        max_workers: int = 32,
+    ):
+        if not providers:
+            raise ValueError(f"No {kind} providers configured")
+        self.kind = kind
+        self.providers = providers
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_delay_default = hedge_delay
+        # Agents are blocking SDK clients, attempts run on threads so they can race
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{kind}-provider")
+
+    @classmethod
+    def from_env(cls, kind: str, factories: Dict[str, Callable[[], Any]], default_providers: str,
+                 timeout: float, hedge: bool, hedge_delay: float) -> "ProviderRouter":
+        """Builds the providers listed in ``<KIND>_PROVIDERS`` as ``name:weight,name:weight``.
+
+        A weight of 0 makes a provider a backup only, never the primary.
+        """
+        prefix = kind.upper()
+        breaker_threshold = int(os.getenv("PROVIDER_BREAKER_FAILURES", "3"))
+        breaker_reset = float(os.getenv("PROVIDER_BREAKER_RESET", "30"))
+        providers = []
+        for entry in os.getenv(f"{prefix}_PROVIDERS", default_providers).split(","):
+            name, _, weight = entry.strip().partition(":")
+            if name not in factories:
+                raise ValueError(f"Unknown {kind} provider {name}, expected one of {sorted(factories)}")
+            providers.append(
+                Provider(name, factories[name](), float(weight or 1), CircuitBreaker(breaker_threshold, breaker_reset))
+            )
+        hedge = os.getenv(f"{prefix}_HEDGE", str(hedge)).lower() == "true"
+        if hedge and len({provider.name for provider in providers}) < 2:
+            # A hedge to the same provider doubles the load on it exactly when it is slow
+            print(f"{kind} hedging needs a second provider in {prefix}_PROVIDERS, it stays off")
+            hedge = False
+        return cls(
+            kind,
+            providers,
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+            hedge=hedge,
+            hedge_delay=float(os.getenv(f"{prefix}_HEDGE_DELAY", str(hedge_delay))),
+        )
+
+    def ranked(self) -> List[Provider]:
+        """Healthy providers, a weighted random primary first and the rest by weight."""
+        healthy = [provider for provider in self.providers if provider.breaker.allow()]
+        for provider in self.providers:
+            PROVIDER_BREAKER_OPEN.labels(kind=self.kind, provider=provider.name).set(
+                int(provider.breaker.opened_at is not None)
+            )
+        if not healthy:
+            raise ProviderUnavailable(f"Every {self.kind} provider has an open circuit")
+
+        weighted = [provider for provider in healthy if provider.weight > 0]
+        primary = random.choices(weighted, weights=[p.weight for p in weighted])[0] if weighted else healthy[0]
+        backups = sorted((p for p in healthy if p is not primary), key=lambda p: -p.weight)
+        return [primary] + backups
+
+    def hedge_delay(self, provider: Provider) -> float:
+        return provider.p95() or self.hedge_delay_default
+
+    def record(self, provider: Provider, duration: Optional[float]):
+        """Feeds one attempt into the provider's latency window and breaker, ``None`` means it failed."""
+        if duration is not None:
+            provider.latencies.append(duration)
+            provider.breaker.record_success()
+            PROVIDER_REQUESTS.labels(kind=self.kind, provider=provider.name, outcome="success").inc()
+        else:
+            was_open = provider.breaker.is_open
+            provider.breaker.record_failure()
+            if not was_open and provider.breaker.is_open:
+                print(f"{self.kind} provider {provider.name} circuit opened for {provider.breaker.reset_timeout}s")
+            PROVIDER_REQUESTS.labels(kind=self.kind, provider=provider.name, outcome="failure").inc()
+
+    def _launch(self, provider: Provider, fn: Callable[[Any], Any]) -> Future:
+        started = time.monotonic()
+        future = self.executor.submit(fn, provider.agent)
+        # Recorded even for attempts the caller stopped waiting on, so p95 sees the real tail
+        future.add_done_callback(
+            lambda f: self.record(provider, time.monotonic() - started if f.exception() is None else None)
+        )
+        return future
+
+    def call(self, fn: Callable[[Any], Any], pinned: bool = False) -> Any:
+        """Runs ``fn(agent)`` against the providers and returns the first successful result.
+
+        ``pinned`` keeps the call on the first configured provider, for results
+        that are not interchangeable between providers such as embeddings.
+        """
+        deadline = time.monotonic() + self.timeout
+        if pinned:
+            if not self.providers[0].breaker.allow():
+                raise ProviderUnavailable(f"{self.kind} provider {self.providers[0].name} has an open circuit")
+            ranked = self.providers[:1]
+        else:
+            ranked = self.ranked()
+        candidates = iter(ranked)
+        primary = next(candidates)
+        pending = {self._launch(primary, fn): primary}
+        hedged = False
+        errors = []
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = self.hedge and not hedged
+            wait_time = min(remaining, self.hedge_delay(primary)) if can_hedge else remaining
+            done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge:
+                    hedged = True
+                    # Only hedged to another provider, the backup may be behind an open circuit
+                    backup = next(candidates, None)
+                    if backup is not None:
+                        print(f"Hedging {self.kind} call to {backup.name} after {wait_time:.2f}s")
+                        PROVIDER_HEDGES.labels(kind=self.kind, provider=backup.name).inc()
+                        pending[self._launch(backup, fn)] = backup
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"{self.kind} provider {provider.name} failed: {e}")
+                    errors.append(f"{provider.name}: {e}")
+
+            if not pending:
+                failover = next(candidates, None)
+                if failover is not None:
+                    pending[self._launch(failover, fn)] = failover
+
+        if pending:
+            # Blocking SDK calls cannot be interrupted, they finish in the background
+            names = ", ".join(provider.name for provider in pending.values())
+            raise TimeoutError(f"{self.kind} call timed out after {self.timeout}s waiting on {names}")
+        raise ProviderUnavailable(f"All {self.kind} providers failed: {'; '.join(errors)}")
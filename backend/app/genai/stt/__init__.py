@@ -1,3 +1,21 @@
-from app.genai.stt.whisper_agent import WhisperAgent
+from app.utils.lifecycle import LazySingleton
 
-stt_agent = WhisperAgent()
+
+def _whisper():
+    from app.genai.stt.whisper_agent import WhisperAgent
+
+    return WhisperAgent()
+
+
+def _create_stt_agent():
+    from app.genai.provider_router import ProviderRouter
+    from app.genai.stt.routed_agent import Routed_STT_Agent
+
+    # Hedging only starts once STT_PROVIDERS lists a second provider to hedge to
+    router = ProviderRouter.from_env(
+        "stt", {"whisper": _whisper}, "whisper:1", timeout=15, hedge=True, hedge_delay=3
+    )
+    return Routed_STT_Agent(router)
+
+
+stt_agent = LazySingleton(_create_stt_agent, "stt_agent")
@@ -1,5 +1,7 @@
 import os
 
+from app.utils.metrics import stage
+
 
 class Base_STT_Agent:
     def __init__(self, agent_name: str):
@@ -19,6 +21,7 @@ class Base_STT_Agent:
         if not self._file_exists(audio_file):
             raise FileNotFoundError(f"File {audio_file} not found")
         
-        return self._transcribe_audio(audio_file)
+        with stage("stt", self.agent_name):
+            return self._transcribe_audio(audio_file)
         
         
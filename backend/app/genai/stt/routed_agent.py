@@ -0,0 +1,14 @@
+from app.genai.provider_router import ProviderRouter
+from app.genai.stt.base_agent import Base_STT_Agent
+
+
+class Routed_STT_Agent(Base_STT_Agent):
+    """Spreads transcriptions over the router's providers."""
+
+    def __init__(self, router: ProviderRouter):
+        super().__init__("+".join(provider.agent.agent_name for provider in router.providers))
+        self.client = router
+        self.router = router
+
+    def _transcribe_audio(self, audio_file: str) -> str:
+        return self.router.call(lambda agent: agent._transcribe_audio(audio_file))
@@ -1,5 +1,42 @@
-from app.genai.tts.azure_agent import Azure_Agent
-from app.genai.tts.openai_agent import OpenAI_Agent
-from app.genai.tts.pyttsx3_agent import Pyttsx3_Agent
+from app.utils.lifecycle import LazySingleton
 
-tts_agent = Azure_Agent()
+# Each agent is imported by its factory, importing them here would load
+# every SDK on every worker boot
+
+
+def _azure():
+    from app.genai.tts.azure_agent import Azure_Agent
+
+    return Azure_Agent()
+
+
+def _openai():
+    from app.genai.tts.openai_agent import OpenAI_Agent
+
+    return OpenAI_Agent()
+
+
+def _pyttsx3():
+    from app.genai.tts.pyttsx3_agent import Pyttsx3_Agent
+
+    return Pyttsx3_Agent()
+
+
+def _create_tts_agent():
+    from app.genai.provider_router import ProviderRouter
+    from app.genai.tts.routed_agent import Routed_TTS_Agent
+
+    # OpenAI has no visemes, it only speaks when Azure fails. Hedging is off
+    # by default so a slow Azure reply is not replaced by a still avatar
+    router = ProviderRouter.from_env(
+        "tts",
+        {"azure": _azure, "openai": _openai, "pyttsx3": _pyttsx3},
+        "azure:1,openai:0",
+        timeout=20,
+        hedge=False,
+        hedge_delay=5,
+    )
+    return Routed_TTS_Agent(router)
+
+
+tts_agent = LazySingleton(_create_tts_agent, "tts_agent")
@@ -1,12 +1,13 @@
 import base64
 import os
-from datetime import datetime, timedelta
-from typing import Optional
+import threading
+from typing import Dict, Optional, Tuple
 
 from app.genai.tts.base_agent import Base_TTS_Agent
-from azure.cognitiveservices.speech import (AudioDataStream, SpeechConfig,
-                                            SpeechSynthesizer)
-from azure.cognitiveservices.speech.audio import AudioOutputConfig
+from app.genai.tts.synthesizer_pool import SynthesizerPool
+from azure.cognitiveservices.speech import (AudioDataStream, ResultReason,
+                                            SpeechConfig,
+                                            SpeechSynthesisOutputFormat)
 from dotenv import load_dotenv
 from models.conversation.conversation import AudioMessage
 from models.tts.viseme import Viseme, WordOffset
@@ -66,39 +67,53 @@ class Azure_Agent(Base_TTS_Agent):
     def __init__(self):
         super().__init__("Azure")
         self.default_voice = "en-SG-LunaNeural"
-        self.client = SpeechConfig(
+        self.output_format: Optional[SpeechSynthesisOutputFormat] = None
+        self.client = self._speech_config(self.default_voice)
+        self.ssml_string = open("app/genai/tts/test.xml", "r", encoding="utf-8-sig").read()
+        self.pool_size = int(os.getenv("AZURE_TTS_POOL_SIZE", "4"))
+        self.checkout_timeout = float(os.getenv("AZURE_TTS_CHECKOUT_TIMEOUT", "10"))
+        # One pool per voice and output format, a synthesizer is bound to both
+        self.pools: Dict[Tuple[str, Optional[SpeechSynthesisOutputFormat]], SynthesizerPool] = {}
+        self.pools_lock = threading.Lock()
+
+    def _speech_config(self, voice: str) -> SpeechConfig:
+        config = SpeechConfig(
             subscription=os.getenv("AZURE_SPEECH_KEY"),
             region=os.getenv("AZURE_SPEECH_REGION"),
         )
-        self.client.speech_synthesis_language = "zh-CN"
-        self.client.speech_recognition_language = "zh-CN"
-        self.client.request_word_level_timestamps()
-        self.client.speech_synthesis_voice_name = self.default_voice
-        self.ssml_string = open("app/genai/tts/test.xml", "r", encoding="utf-8-sig").read()
+        config.speech_synthesis_language = "zh-CN"
+        config.speech_recognition_language = "zh-CN"
+        config.request_word_level_timestamps()
+        config.speech_synthesis_voice_name = voice
+        if self.output_format is not None:
+            config.set_speech_synthesis_output_format(self.output_format)
+        return config
+
+    def _pool(self, voice: Optional[str] = None) -> SynthesizerPool:
+        voice = voice or self.default_voice
+        key = (voice, self.output_format)
+        with self.pools_lock:
+            if key not in self.pools:
+                config = self.client if voice == self.default_voice else self._speech_config(voice)
+                self.pools[key] = SynthesizerPool(config, self.pool_size, self.checkout_timeout)
+            return self.pools[key]
+
+    def warm_up(self):
+        self._pool().warm_up()
 
     def _format_ssml(self, text: str):
         formatted_ssml = self.ssml_string.format(text=text)
         return formatted_ssml
 
     def tts_with_viseme(self, file_path, toSpeak, voice_id: Optional[str] = None):
-
-        audioOutputConfig = AudioOutputConfig(filename=file_path)
-        synthesizer = SpeechSynthesizer(speech_config=self.client, audio_config=None)
-        sorted_array = []
+        visemes = []
         word_boundary = []
-        start_time = datetime.now()
-        offsetArr = []
+        completed = threading.Event()
 
         def addViseme(e):
-            nonlocal offsetArr
-            offsetArr.append([e.audio_offset / 10000, e.viseme_id])
-
-        def endViseme(e):
-            nonlocal sorted_array, offsetArr
-            sorted_array = sorted(offsetArr, key=lambda x: x[0])
+            visemes.append([e.audio_offset / 10000, e.viseme_id])
 
         def addBoundary(e):
-            nonlocal word_boundary
             offset = WordOffset(
                 offset_duration=e.audio_offset,
                 word_length=e.word_length,
@@ -106,21 +121,30 @@ class Azure_Agent(Base_TTS_Agent):
             )
             word_boundary.append(offset)
 
+        def endSynthesis(e):
+            completed.set()
+
         ssml_string = self._format_ssml(toSpeak)
 
-        synthesizer.viseme_received.connect(addViseme)
-        synthesizer.synthesis_completed.connect(endViseme)
-        synthesizer.synthesis_word_boundary.connect(addBoundary)
-        speech_synthesis_result = synthesizer.speak_ssml_async(ssml_string).get()
+        with self._pool(voice_id).lease(
+            viseme=addViseme,
+            word_boundary=addBoundary,
+            completed=endSynthesis,
+            canceled=endSynthesis,
+        ) as pooled:
+            speech_synthesis_result = pooled.synthesizer.speak_ssml_async(ssml_string).get()
+            if speech_synthesis_result.reason == ResultReason.Canceled:
+                # Usually a dropped connection, the pool replaces this synthesizer.
+                # Raised so the router can fail over instead of returning silence
+                details = speech_synthesis_result.cancellation_details
+                raise RuntimeError(f"Speech synthesis canceled: {details.reason} {details.error_details}")
+            elif not completed.wait(timeout=10):
+                print("Timed out waiting for the synthesis to complete")
 
         stream = AudioDataStream(speech_synthesis_result)
         stream.save_to_wav_file(file_path)
 
-        while len(sorted_array) == 0 and (datetime.now() - start_time) < timedelta(
-            seconds=10
-        ):
-            pass
-        return sorted_array, word_boundary
+        return sorted(visemes, key=lambda x: x[0]), word_boundary
 
     def _tts(self, text: str, output_file: str, voice: str) -> bool:
         viseme, word_boundary = self.tts_with_viseme(
@@ -1,7 +1,8 @@
+import base64
 import os
-import time
 
-from app.genai.llm.base_agent import Base_LLM_Agent
+from app.utils.metrics import stage
+from models.conversation.conversation import AudioMessage
 from pydantic import BaseModel
 
 
@@ -14,6 +15,16 @@ class Base_TTS_Agent:
     def _tts(self, text: str, output_file: str, voice: str) -> bool:            
         raise NotImplementedError("Subclasses must implement _tts")
     
+    def warm_up(self):
+        """Opens provider connections ahead of the first request, if the agent keeps any."""
+        pass
+
+    def _audio_message(self, output_file: str) -> AudioMessage:
+        """For agents without viseme events, the avatar gets the audio alone."""
+        with open(output_file, "rb") as file:
+            audio = base64.b64encode(file.read()).decode("utf-8")
+        return AudioMessage(base64_audio=audio, viseme=[], word_boundary=[])
+
     def _create_directory(self, file_path: str) -> bool:
         directory = os.path.dirname(file_path)
         if not os.path.exists(directory):
@@ -26,12 +37,10 @@ class Base_TTS_Agent:
         
         self._create_directory(output_file)
         
-        tts_start_time = time.time()
-        success = self._tts(text, output_file, voice)
-        tts_end_time = time.time()
-        tts_duration = tts_end_time - tts_start_time
+        with stage("tts", self.agent_name) as timing:
+            success = self._tts(text, output_file, voice)
         
-        print(f"Audio generated in {tts_duration} seconds")
+        print(f"Audio generated in {timing.duration} seconds")
         
         return success
     
@@ -2,6 +2,7 @@ import os
 
 from app.genai.tts.base_agent import Base_TTS_Agent
 from dotenv import load_dotenv
+from models.conversation.conversation import AudioMessage
 from openai import OpenAI
 
 load_dotenv()
@@ -14,7 +15,7 @@ class OpenAI_Agent(Base_TTS_Agent):
         self.model = "tts-1"
         self.instruction = """Voice: High-energy, upbeat, and encouraging, projecting enthusiasm and motivation.\n\nPunctuation: Short, punchy sentences with strategic pauses to maintain excitement and clarity.\n\nDelivery: Fast-paced and dynamic, with rising intonation to build momentum and keep engagement high.\n\nPhrasing: Action-oriented and direct, using motivational cues to push participants forward.\n\nTone: Positive, energetic, and empowering, creating an atmosphere of encouragement and achievement."""
 
-    def _tts(self, text: str, output_file: str, voice: str) -> bool:
+    def _tts(self, text: str, output_file: str, voice: str) -> AudioMessage:
         try:
             with self.client.audio.speech.with_streaming_response.create(
                 model=self.model,
@@ -23,7 +24,7 @@ class OpenAI_Agent(Base_TTS_Agent):
                 instructions=self.instruction
             ) as response:
                 response.stream_to_file(output_file)
-            return True
         except Exception as e:
             print(f"Error in TTS generation: {str(e)}")
-            return False
\ No newline at end of file
+            raise
+        return self._audio_message(output_file)
@@ -1,5 +1,6 @@
 import pyttsx3
 from app.genai.tts.base_agent import Base_TTS_Agent
+from models.conversation.conversation import AudioMessage
 
 
 class Pyttsx3_Agent(Base_TTS_Agent):
@@ -8,8 +9,8 @@ class Pyttsx3_Agent(Base_TTS_Agent):
         self.client = pyttsx3.init()
         self.default_voice = "default"
         
-    def _tts(self, text: str, output_file: str, voice: str) -> bool:
+    def _tts(self, text: str, output_file: str, voice: str) -> AudioMessage:
         self.client.save_to_file(text, output_file)
         self.client.runAndWait()
-        return True
+        return self._audio_message(output_file)
         
\ No newline at end of file
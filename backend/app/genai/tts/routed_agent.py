@@ -0,0 +1,36 @@
+import itertools
+import os
+
+from app.genai.provider_router import ProviderRouter
+from app.genai.tts.base_agent import Base_TTS_Agent
+from models.conversation.conversation import AudioMessage
+
+
+class Routed_TTS_Agent(Base_TTS_Agent):
+    """Spreads synthesis over the router's providers."""
+
+    def __init__(self, router: ProviderRouter):
+        super().__init__("+".join(provider.agent.agent_name for provider in router.providers))
+        self.client = router
+        self.router = router
+        self.default_voice = router.providers[0].agent.default_voice
+
+    def warm_up(self):
+        for provider in self.router.providers:
+            provider.agent.warm_up()
+
+    def _tts(self, text: str, output_file: str, voice: str) -> AudioMessage:
+        root, extension = os.path.splitext(output_file)
+        first = self.router.providers[0].agent
+        attempts = itertools.count()
+
+        def synthesize(agent: Base_TTS_Agent) -> AudioMessage:
+            # A hedged attempt may run alongside another, each writes its own file.
+            # Voice names are provider specific, the others use their default
+            return agent._tts(
+                text,
+                f"{root}.{next(attempts)}.{agent.agent_name.lower()}{extension}",
+                voice if agent is first else None,
+            )
+
+        return self.router.call(synthesize)
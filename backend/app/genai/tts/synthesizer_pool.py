@@ -0,0 +1,150 @@
+import contextlib
+import threading
+import time
+from typing import Callable, Dict, List
+
+from azure.cognitiveservices.speech import (Connection, SpeechConfig,
+                                            SpeechSynthesizer)
+
+
+class PooledSynthesizer:
+    """A long-lived synthesizer whose SDK events go to the request holding it."""
+
+    def __init__(self, speech_config: SpeechConfig):
+        self.synthesizer = SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        self.connection = Connection.from_speech_synthesizer(self.synthesizer)
+        self.connected = False
+        # Set by the disconnected event, which arrives on an SDK thread at any time.
+        # ``connected`` is no help right after open(), its event may not have arrived yet
+        self.dropped = False
+        self.healthy = True
+        self.handlers: Dict[str, Callable] = {}
+
+        # Connected once, reconnecting callbacks per request is what this pool avoids
+        self.synthesizer.viseme_received.connect(lambda e: self._dispatch("viseme", e))
+        self.synthesizer.synthesis_word_boundary.connect(lambda e: self._dispatch("word_boundary", e))
+        self.synthesizer.synthesis_completed.connect(lambda e: self._dispatch("completed", e))
+        self.synthesizer.synthesis_canceled.connect(lambda e: self._dispatch("canceled", e))
+        self.connection.connected.connect(self._on_connected)
+        self.connection.disconnected.connect(self._on_disconnected)
+
+    def _dispatch(self, event: str, e):
+        handler = self.handlers.get(event)
+        if handler is not None:
+            handler(e)
+
+    def _on_connected(self, e):
+        self.connected = True
+
+    def _on_disconnected(self, e):
+        self.connected = False
+        self.dropped = True
+
+    def open(self):
+        # Starts the websocket and TLS handshake ahead of the first request
+        self.dropped = False
+        self.connection.open(True)
+
+    def bind(self, **handlers: Callable):
+        self.handlers = handlers
+
+    def unbind(self):
+        self.handlers = {}
+
+    def close(self):
+        self.unbind()
+        try:
+            self.connection.close()
+        except Exception as e:
+            print(f"Failed to close synthesizer connection: {e}")
+
+
+class SynthesizerPool:
+    """Up to ``size`` pre-connected synthesizers for one voice and output format."""
+
+    def __init__(self, speech_config: SpeechConfig, size: int = 4, checkout_timeout: float = 10):
+        self.speech_config = speech_config
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.idle: List[PooledSynthesizer] = []
+        self.created = 0
+        self.condition = threading.Condition()
+
+    def _create(self) -> PooledSynthesizer:
+        try:
+            synthesizer = PooledSynthesizer(self.speech_config)
+            synthesizer.open()
+            return synthesizer
+        except Exception:
+            with self.condition:
+                self.created -= 1
+                self.condition.notify()
+            raise
+
+    def warm_up(self):
+        """Opens every connection the pool may hold, so no request pays for one."""
+        while True:
+            with self.condition:
+                if self.created >= self.size:
+                    return
+                self.created += 1
+            try:
+                synthesizer = self._create()
+            except Exception as e:
+                print(f"Failed to pre-connect synthesizer: {e}")
+                return
+            self._release(synthesizer)
+
+    def _checkout(self) -> PooledSynthesizer:
+        deadline = time.monotonic() + self.checkout_timeout
+        with self.condition:
+            while not self.idle and self.created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No synthesizer free after {self.checkout_timeout} seconds, pool size is {self.size}"
+                    )
+                self.condition.wait(remaining)
+            # Most recently used first, its connection is the least likely to have idled out
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        return self._create()
+
+    def _release(self, synthesizer: PooledSynthesizer):
+        with self.condition:
+            self.idle.append(synthesizer)
+            self.condition.notify()
+
+    def _discard(self, synthesizer: PooledSynthesizer):
+        synthesizer.close()
+        with self.condition:
+            self.created -= 1
+            self.condition.notify()
+
+    @contextlib.contextmanager
+    def lease(self, **handlers: Callable):
+        """Checks out a synthesizer with ``handlers`` bound to its events for this request."""
+        synthesizer = self._checkout()
+        try:
+            if synthesizer.dropped:
+                # Idle connections get dropped by the service, reopen before use.
+                # A failed reopen discards the synthesizer below, freeing its slot
+                synthesizer.open()
+            synthesizer.bind(**handlers)
+            yield synthesizer
+        except Exception:
+            synthesizer.healthy = False
+            raise
+        finally:
+            synthesizer.unbind()
+            if synthesizer.healthy:
+                self._release(synthesizer)
+            else:
+                self._discard(synthesizer)
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for synthesizer in idle:
+            self._discard(synthesizer)
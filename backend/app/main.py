@@ -1,9 +1,57 @@
-from fastapi import FastAPI
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+
+from app.genai.llm import llm_agent
+from app.genai.stt import stt_agent
+from app.genai.tts import tts_agent
+from app.utils.backplane import backplane
+from app.utils.db import message_db
+from app.utils.lifecycle import readiness
+from app.utils.metrics import render_metrics
+from crawler.catalog import product_catalog
+from crawler.fetcher import tiered_fetcher
+from crawler.jobs import crawl_client
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from router.conversation import conversation_router
 from router.test import test_router
 
-server = FastAPI()
+
+# Seconds each component may take to warm up before it is reported as failed
+WARM_UP_TIMEOUT = float(os.getenv("WARM_UP_TIMEOUT", "30"))
+# Failed required components are retried, waiting twice as long each time up to the max
+WARM_UP_RETRY_BACKOFF = float(os.getenv("WARM_UP_RETRY_BACKOFF", "1"))
+WARM_UP_RETRY_MAX = float(os.getenv("WARM_UP_RETRY_MAX", "60"))
+
+# Reading any attribute builds a lazy singleton, agent_name is always there
+readiness.register("llm", lambda: llm_agent.agent_name)
+readiness.register("stt", lambda: stt_agent.agent_name)
+# Pre-connects TTS so the first reply does not pay for the handshake
+readiness.register("tts", lambda: tts_agent.warm_up())
+readiness.register("db", lambda: message_db.ping())
+readiness.register("catalog", lambda: product_catalog.records, required=False)
+readiness.register("crawler", lambda: importlib.import_module("crawl4ai"), required=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background, the worker serves / right away and /ready once done
+    warm_up = asyncio.create_task(
+        readiness.warm_up(WARM_UP_TIMEOUT, WARM_UP_RETRY_BACKOFF, WARM_UP_RETRY_MAX)
+    )
+    yield
+    warm_up.cancel()
+    # Never build a lazy singleton on the way out just to close it
+    if crawl_client._lazy_is_loaded:
+        await crawl_client.close()
+    await backplane.close()
+    await tiered_fetcher.http_fetcher.close()
+
+
+server = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 server.add_middleware(
@@ -21,3 +69,14 @@ server.include_router(test_router)
 @server.get("/")
 async def root():
     return "Hello, this is a generic backend for a talking avatar."
+
+
+@server.get("/ready")
+async def ready():
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+@server.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,258 @@
+import asyncio
+import base64
+import binascii
+import os
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+from app.utils.metrics import stage
+from app.utils.metrics.prometheus import PARTIAL_TRANSCRIPTS
+from dotenv import load_dotenv
+from models.conversation.conversation import (QueryChunkMessage,
+                                              QueryEndMessage,
+                                              QueryStartMessage)
+from scipy.io.wavfile import write
+
+load_dotenv()
+
+# Longest utterance kept, older audio is overwritten once the buffer wraps
+MAX_UTTERANCE_SECONDS = float(os.getenv("MAX_UTTERANCE_SECONDS", "30"))
+# Transcribe the audio so far whenever the speaker pauses this long
+PARTIAL_STT = os.getenv("PARTIAL_STT", "true").lower() == "true"
+PARTIAL_STT_PAUSE = float(os.getenv("PARTIAL_STT_PAUSE", "0.4"))
+# Frame RMS above which a frame counts as speech, the noise floor can raise it
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.01"))
+
+
+class AudioRingBuffer:
+    """Preallocated float32 samples of one utterance, reused across utterances."""
+
+    def __init__(self, capacity: int):
+        self.samples = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        # Samples appended since the reset, including any overwritten ones
+        self.written = 0
+        self.peak = 0.0
+
+    def reset(self) -> None:
+        self.written = 0
+        self.peak = 0.0
+
+    def append(self, chunk: np.ndarray) -> None:
+        total = len(chunk)
+        chunk = chunk[-self.capacity:]
+        self.written += total - len(chunk)
+        start = self.written % self.capacity
+        head = min(len(chunk), self.capacity - start)
+        self.samples[start:start + head] = chunk[:head]
+        self.samples[:len(chunk) - head] = chunk[head:]
+        self.written += len(chunk)
+        if len(chunk):
+            self.peak = max(self.peak, float(np.abs(chunk).max()))
+
+    def view(self, end: Optional[int] = None) -> np.ndarray:
+        """The samples kept up to ``end``, in order. Only copies once the buffer wrapped."""
+        end = self.written if end is None else min(end, self.written)
+        begin = max(0, self.written - self.capacity)
+        if end <= begin:
+            return self.samples[:0]
+        start = begin % self.capacity
+        count = end - begin
+        if start + count <= self.capacity:
+            return self.samples[start:start + count]
+        return np.concatenate((self.samples[start:], self.samples[: start + count - self.capacity]))
+
+
+class EnergyVAD:
+    """Frame energy voice activity detection with a slowly adapting noise floor."""
+
+    def __init__(self, sample_rate: int, threshold: float = VAD_THRESHOLD, frame_ms: int = 30):
+        self.frame = max(1, sample_rate * frame_ms // 1000)
+        self.threshold = threshold
+        self.noise_floor = threshold / 3
+
+    def reset(self) -> None:
+        self.noise_floor = self.threshold / 3
+
+    def last_voiced(self, chunk: np.ndarray) -> Optional[int]:
+        """End offset in ``chunk`` of its last voiced frame, None if it is all silence."""
+        frames = -(-len(chunk) // self.frame)
+        if frames == 0:
+            return None
+        padded = np.zeros(frames * self.frame, dtype=np.float32)
+        padded[: len(chunk)] = chunk
+        rms = np.sqrt(np.mean(padded.reshape(frames, self.frame) ** 2, axis=1))
+        voiced = rms > max(self.threshold, 3 * self.noise_floor)
+        if not voiced.all():
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(rms[~voiced].mean())
+        if not voiced.any():
+            return None
+        return min(len(chunk), (int(np.flatnonzero(voiced)[-1]) + 1) * self.frame)
+
+
+class AudioStream:
+    """One connection's audio upload: a start message, numbered chunks, then an end message.
+
+    Chunks are appended into a ring buffer as they arrive. Whenever the VAD
+    hears a pause, the audio so far is transcribed in the background, so an
+    utterance that ends in that pause is already transcribed by the time its
+    end message arrives.
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        transcribe: Callable[[str], Awaitable[str]],
+        sample_rate: int = 16000,
+        max_seconds: float = MAX_UTTERANCE_SECONDS,
+        partial_stt: bool = PARTIAL_STT,
+        pause: float = PARTIAL_STT_PAUSE,
+        min_speech: float = 0.5,
+    ):
+        self.conversation_id = conversation_id
+        self.transcribe = transcribe
+        self.max_seconds = max_seconds
+        self.partial_stt = partial_stt
+        self.pause = pause
+        self.min_speech = min_speech
+        self.utterance_id: Optional[str] = None
+        self._allocate(sample_rate)
+
+        self.next_seq = 0
+        self.missing = 0
+        self.first_voiced: Optional[int] = None
+        self.last_voiced = 0
+        # Background transcription and the sample count it covers
+        self.partial: Optional[asyncio.Task] = None
+        self.partial_end = 0
+        self.partials = 0
+
+    def _allocate(self, sample_rate: int) -> None:
+        self.sample_rate = sample_rate
+        self.buffer = AudioRingBuffer(int(self.max_seconds * sample_rate))
+        self.vad = EnergyVAD(sample_rate)
+
+    def start(self, message: QueryStartMessage) -> None:
+        self.cancel()
+        if message.sample_rate != self.sample_rate:
+            self._allocate(message.sample_rate)
+        self.utterance_id = message.utterance_id
+        self.buffer.reset()
+        self.vad.reset()
+        self.next_seq = 0
+        self.missing = 0
+        self.first_voiced = None
+        self.last_voiced = 0
+        self.partial_end = 0
+
+    def append(self, message: QueryChunkMessage) -> None:
+        if message.utterance_id != self.utterance_id:
+            return  # Left over from an utterance that was cancelled or replaced
+        if message.seq < self.next_seq:
+            return  # Duplicate
+        if message.seq > self.next_seq:
+            self.missing += message.seq - self.next_seq
+            print(f"Audio chunks {self.next_seq}-{message.seq - 1} of {self.utterance_id} never arrived")
+        self.next_seq = message.seq + 1
+
+        try:
+            audio = base64.b64decode(message.audio, validate=True)
+        except (binascii.Error, ValueError) as e:
+            audio, error = None, str(e)
+        else:
+            error = None if len(audio) % 4 == 0 else f"{len(audio)} bytes is not whole float32 samples"
+        if error is not None:
+            # Dropped like a lost chunk, the rest of the utterance is still usable
+            self.missing += 1
+            print(f"Audio chunk {message.seq} of {self.utterance_id} is malformed: {error}")
+            return
+        chunk = np.frombuffer(audio, dtype="<f4")
+        offset = self.buffer.written
+        self.buffer.append(chunk)
+        voiced_end = self.vad.last_voiced(chunk)
+        if voiced_end is not None:
+            if self.first_voiced is None:
+                self.first_voiced = offset
+            self.last_voiced = offset + voiced_end
+        self._maybe_transcribe_partial()
+
+    def _maybe_transcribe_partial(self) -> None:
+        if not self.partial_stt or self.first_voiced is None:
+            return
+        paused = self.buffer.written - self.last_voiced >= self.pause * self.sample_rate
+        spoken = self.last_voiced - self.first_voiced >= self.min_speech * self.sample_rate
+        if paused and spoken and self.last_voiced > self.partial_end:
+            if self.partial is not None:
+                self.partial.cancel()
+                PARTIAL_TRANSCRIPTS.labels(result="stale").inc()
+            self.partial_end = self.buffer.written
+            self.partials += 1
+            filename = f"data/tts/output/{self.conversation_id}.partial{self.partials}.wav"
+            self.partial = asyncio.create_task(
+                self._transcribe_partial(filename, self.buffer.view().copy(), self.buffer.peak)
+            )
+
+    async def _transcribe_partial(self, filename: str, samples: np.ndarray, peak: float) -> Optional[str]:
+        transcription = asyncio.ensure_future(self._write_and_transcribe(filename, samples, peak))
+        # Cancelling a stale partial does not stop the STT thread reading the file,
+        # it is removed once the transcription is done with it
+        transcription.add_done_callback(lambda done: self._remove_partial(filename, done))
+        try:
+            return await asyncio.shield(transcription)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Partial transcription of {self.conversation_id} failed: {e}")
+            return None
+
+    async def _write_and_transcribe(self, filename: str, samples: np.ndarray, peak: float) -> Optional[str]:
+        await asyncio.to_thread(self._write_wav, filename, samples, peak)
+        return await self.transcribe(filename)
+
+    @staticmethod
+    def _remove_partial(filename: str, transcription: asyncio.Future) -> None:
+        if not transcription.cancelled():
+            # Retrieved so an abandoned partial's failure is not reported as unhandled
+            transcription.exception()
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    def _write_wav(self, filename: str, samples: np.ndarray, peak: float) -> None:
+        scale = 32767 / peak if peak > 0 else 0
+        write(filename, self.sample_rate, (samples * scale).astype(np.int16))
+
+    async def finish(self, message: QueryEndMessage, filename: str) -> Optional[str]:
+        """Transcription of the utterance, reusing the background one if no speech came after it."""
+        if message.utterance_id != self.utterance_id:
+            return None
+        self.utterance_id = None
+        self.missing += max(0, message.chunks - self.next_seq)
+        if self.missing:
+            print(f"Audio of {message.utterance_id} is missing {self.missing} chunk(s)")
+
+        partial, self.partial = self.partial, None
+        if partial is not None:
+            if self.last_voiced <= self.partial_end:
+                with stage("stt_wait", "partial"):
+                    transcription = await partial
+                if transcription is not None:
+                    PARTIAL_TRANSCRIPTS.labels(result="used").inc()
+                    return transcription
+                PARTIAL_TRANSCRIPTS.labels(result="failed").inc()
+            else:
+                partial.cancel()
+                PARTIAL_TRANSCRIPTS.labels(result="stale").inc()
+
+        if self.buffer.written == 0:
+            return None
+        with stage("audio_decode"):
+            self._write_wav(filename, self.buffer.view(), self.buffer.peak)
+        return await self.transcribe(filename)
+
+    def cancel(self, utterance_id: Optional[str] = None) -> None:
+        if utterance_id is not None and utterance_id != self.utterance_id:
+            return
+        self.utterance_id = None
+        if self.partial is not None:
+            self.partial.cancel()
+            self.partial = None
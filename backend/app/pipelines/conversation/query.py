@@ -1,20 +1,31 @@
 import asyncio
 import base64
 import json
+import os
+import re
 from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
 
 import numpy as np
 from app.genai.llm import llm_agent
+from app.genai.provider_router import ProviderUnavailable
 from app.genai.stt import stt_agent
 from app.genai.tts import tts_agent
-from app.pipelines.conversation.search import llm_search_product
+from app.pipelines.conversation.audio_stream import AudioStream
+from app.pipelines.conversation.search import (LLM_STREAMING,
+                                               llm_search_product,
+                                               stream_llm_search_product)
+from app.utils.backplane import backplane
 from app.utils.db import message_db
+from app.utils.governor import Overloaded, Priority, governor
+from app.utils.metrics import stage, turn
+from app.utils.singleflight import SingleFlight
 from app.utils.ws import conversation_ws_manager
 from fastapi.responses import FileResponse
-from models.conversation.conversation import (AudioMessage,
+from models.conversation.conversation import (AudioMessage, BusyMessage,
                                               ConversationMessage,
                                               ConversationMessageType,
-                                              QueryMessage)
+                                              QueryEndMessage, QueryMessage)
 from models.conversation.message import Message
 from models.conversation.role import MessageRole
 from models.tts.viseme import AudioData
@@ -34,8 +45,9 @@ async def save_messages(conversation_id: str, query: str, llm_response: str):
         message_role=MessageRole.ASSISTANT,
         message_content=llm_response,
     )
-    message_db.insert_message(user_message)
-    message_db.insert_message(assistant_message)
+    async with governor.limit("db"):
+        await asyncio.to_thread(message_db.insert_message, user_message)
+        await asyncio.to_thread(message_db.insert_message, assistant_message)
 
 
 async def create_response(audio_response: AudioMessage):
@@ -64,19 +76,104 @@ def dict_to_wav(data: dict[str, float], filename: str, sample_rate: int = 16000)
 
 
 async def transcribe_audio(filename: str):
-    return stt_agent.transcribe(filename)
+    # The router blocks while it waits on providers, keep it off the event loop
+    return await asyncio.to_thread(stt_agent.transcribe, filename)
 
 
-querying = {}
+history_flight = SingleFlight("history")
+tts_flight = SingleFlight("tts")
 
 
+async def load_history(conversation_id: str) -> list[Message]:
+    async def load():
+        async with governor.limit("db"):
+            return await asyncio.to_thread(message_db.get_all_messages, conversation_id)
+
+    return await history_flight.do(conversation_id, load)
+
+
+async def synthesize_speech(text: str, output_file: str) -> AudioMessage:
+    async def synthesize():
+        async with governor.limit("tts"):
+            return await asyncio.to_thread(
+                tts_agent.convert_text_to_speech,
+                text=text,
+                output_file=output_file,
+            )
+
+    # The audio travels inline, so callers sharing a phrase can share one synthesis
+    return await tts_flight.do(" ".join(text.split()), synthesize)
+
+
+# A streamed reply is spoken sentence by sentence, shorter sentences join the next one
+TTS_MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "20"))
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+
+
+async def split_sentences(
+    deltas: AsyncIterator[str], min_chars: int = TTS_MIN_SENTENCE_CHARS
+) -> AsyncIterator[Tuple[str, bool]]:
+    """Regroups streamed text into (sentence, final) pairs as each sentence completes.
+
+    A sentence is only released once text follows it, so the last one is
+    known to be final when it is released.
+    """
+    pending = ""
+    async for delta in deltas:
+        pending += delta
+        start = 0
+        for match in SENTENCE_END.finditer(pending):
+            if match.end() == len(pending):
+                break
+            if match.end() - start >= min_chars:
+                yield pending[start:match.end()].strip(), False
+                start = match.end()
+        pending = pending[start:]
+    if pending.strip():
+        yield pending.strip(), True
+
+
+# Upper bound on how long a single turn may hold its conversation lock
+TURN_LOCK_TTL = float(os.getenv("TURN_LOCK_TTL", "120"))
 
 
 async def talk_to_llm(conversation_id: str, query: QueryMessage):
-    if conversation_id in querying and querying[conversation_id]:
+    async def transcribe(filename: str) -> str:
+        with stage("audio_decode"):
+            dict_to_wav(query.query, filename)
+        return await transcribe_audio(filename)
+
+    await _take_turn(conversation_id, transcribe)
+
+
+async def talk_to_llm_streamed(conversation_id: str, stream: AudioStream, end: QueryEndMessage):
+    """Runs the turn for an utterance uploaded in chunks, once its end message arrived."""
+    await _take_turn(conversation_id, lambda filename: stream.finish(end, filename))
+
+
+async def _take_turn(conversation_id: str, transcribe: Callable[[str], Awaitable[Optional[str]]]):
+    lock = await backplane.acquire_turn_lock(conversation_id, TURN_LOCK_TTL)
+    if lock is None:
         return
-    querying[conversation_id] = True
-    
+    try:
+        with turn(conversation_id), governor.scope(Priority.VOICE, TURN_LOCK_TTL):
+            async with governor.limit("turn"):
+                await _talk_to_llm(conversation_id, transcribe)
+    except Overloaded as e:
+        # Shed the turn fast, the client can retry instead of waiting on a backlog
+        print(f"Turn for {conversation_id} shed: {e}")
+        await conversation_ws_manager.send_personal_message(
+            message=ConversationMessage(
+                type=ConversationMessageType.BUSY,
+                data=BusyMessage(resource=e.resource, retry_after=round(e.retry_after, 1)),
+            ),
+            user_id=conversation_id,
+        )
+    finally:
+        await backplane.release_turn_lock(conversation_id, lock)
+
+
+async def _talk_to_llm(conversation_id: str, transcribe: Callable[[str], Awaitable[Optional[str]]]):
     print("Received audio")
     filename = f"data/tts/output/{conversation_id}.wav"
 
@@ -86,15 +183,12 @@ async def talk_to_llm(conversation_id: str, query: QueryMessage):
         "data/tts/output/reference3.wav",
     ]
     
-    dict_to_wav(query.query, filename)
+    transcription = await transcribe(filename)
     # score = verify_audio(filename)
     # print(f"{score=}")
-    # querying[conversation_id] = False
     # return
     # if score < 0.5:
-    #     querying[conversation_id] = False
     #     return
-    transcription = await transcribe_audio(filename)
     if not transcription:
         return
 
@@ -109,14 +203,16 @@ async def talk_to_llm(conversation_id: str, query: QueryMessage):
     #     message=response, user_id=conversation_id
     # )
     # return
-    messages = message_db.get_all_messages(conversation_id)
+    with stage("db_history", "cratedb"):
+        messages = await load_history(conversation_id)
     formatted_messages = [message.to_gpt_message() for message in messages]
 
     print(f"{transcription=}")
 
-    system_prompt_filepath = "app/genai/llm/prompts/Tasha/system.txt"
-    with open(system_prompt_filepath, "r") as file:
-        system_prompt = file.read()
+    if LLM_STREAMING:
+        llm_response = await _speak_streamed(conversation_id, transcription, formatted_messages)
+        asyncio.create_task(save_messages(conversation_id, transcription, llm_response))
+        return
 
     llm_response = await llm_search_product(transcription, formatted_messages)
 
@@ -128,9 +224,11 @@ async def talk_to_llm(conversation_id: str, query: QueryMessage):
     # )
 
     tts_output_filepath = f"data/tts/output/{conversation_id}.mp3"
-    audio_response = tts_agent.convert_text_to_speech(
-        text=llm_response, output_file=tts_output_filepath
-    )
+    try:
+        audio_response = await synthesize_speech(llm_response, tts_output_filepath)
+    except (ProviderUnavailable, TimeoutError) as e:
+        print(f"TTS providers failed: {e}")
+        audio_response = None
     if not audio_response:
         print("Failed to generate TTS")
         return None
@@ -145,4 +243,63 @@ async def talk_to_llm(conversation_id: str, query: QueryMessage):
     await conversation_ws_manager.send_personal_message(
         message=response, user_id=conversation_id
     )
-    querying[conversation_id] = False
+
+
+async def _end_reply(conversation_id: str) -> None:
+    try:
+        await conversation_ws_manager.send_personal_message(
+            message=await create_response(AudioMessage(base64_audio="", viseme=[], word_boundary=[], final=True)),
+            user_id=conversation_id,
+        )
+    except Exception as e:
+        print(f"Could not end the reply for {conversation_id}: {e}")
+
+
+async def _speak_streamed(conversation_id: str, query: str, message_history: list[dict]) -> str:
+    """Synthesizes each sentence of the reply as soon as it streamed and sends the audio in order.
+
+    Returns the full reply text.
+    """
+    sentences: list[str] = []
+    speeches: asyncio.Queue = asyncio.Queue()
+    ended = False
+
+    async def send():
+        nonlocal ended
+        while (item := await speeches.get()) is not None:
+            speech, final = item
+            try:
+                audio_response = await speech
+            except (ProviderUnavailable, TimeoutError) as e:
+                print(f"TTS providers failed: {e}")
+                continue
+            if not audio_response:
+                print("Failed to generate TTS")
+                continue
+            # The synthesis may be shared with other turns, copy before marking it
+            audio_response = audio_response.model_copy(update={"final": final})
+            await conversation_ws_manager.send_personal_message(
+                message=await create_response(audio_response), user_id=conversation_id
+            )
+            ended = final
+
+    sender = asyncio.create_task(send())
+    pending = []
+    try:
+        deltas = stream_llm_search_product(query, message_history)
+        async for sentence, final in split_sentences(deltas):
+            output_file = f"data/tts/output/{conversation_id}.{len(sentences)}.mp3"
+            sentences.append(sentence)
+            speech = asyncio.create_task(synthesize_speech(sentence, output_file))
+            pending.append(speech)
+            speeches.put_nowait((speech, final))
+        speeches.put_nowait(None)
+        await sender
+    finally:
+        sender.cancel()
+        for speech in pending:
+            speech.cancel()
+        if not ended:
+            # The last sentence failed or there was none, the client still waits for the end of the reply
+            await _end_reply(conversation_id)
+    return " ".join(sentences)
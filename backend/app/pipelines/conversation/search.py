@@ -1,10 +1,35 @@
+import asyncio
+import functools
 import json
+import os
+import time
+from typing import AsyncIterator, Optional
 
 from app.genai.llm import llm_agent
-from crawler.crawler import EcommerceRecommender
+from app.genai.llm.message_assembly import MessageAssembler
+from app.genai.llm.semantic_cache import SemanticCache
+from app.pipelines.conversation.speculative import (SPECULATIVE_SEARCH,
+                                                    SpeculativeSearch)
+from app.pipelines.conversation.tool_output import (product_registry,
+                                                    serialize_products)
+from app.utils.governor import governor
+from app.utils.lifecycle import LazySingleton
+from app.utils.metrics import observe_stage, record_cache, stage
+from crawler.catalog import product_catalog
+from crawler.jobs import crawl_client
+from crawler.product import sort_products
+from models.genai.llm_stream import LLMStreamEventType
 
-with open("app/genai/llm/prompts/Tasha/system.txt", "r") as file:
-    SYSTEM_PROMPT = file.read()
+SYSTEM_PROMPT_PATH = "app/genai/llm/prompts/Tasha/system.txt"
+
+# Upper bound on model round-trips for a single customer turn
+MAX_TOOL_ITERATIONS = int(os.getenv("MAX_TOOL_ITERATIONS", "4"))
+# Seconds a single tool call may run before its output reports a timeout
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+# Consume the Responses API as a stream and dispatch tool calls as they complete
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() == "true"
+# Answer near-identical queries from a semantic cache instead of the tool loop
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
 
 tools = [
     {
@@ -47,38 +72,260 @@ tools = [
 ]
 
 
-async def llm_search_product(query: str, message_history: list[dict]) -> str:
-    recommender = None
-    response_text = None
-    message_history.append({"role": "user", "content": query})
-    while response_text is None:
-        response = llm_agent._generate_tool_call_response(
-            message_history, tools, SYSTEM_PROMPT
+async def _search_product(args: dict, speculative: Optional[SpeculativeSearch] = None) -> str:
+    sort_by = args.get("sort_by")
+    products = product_catalog.search(args["query"], sort_by)
+    record_cache("catalog", products is not None)
+    if products is not None:
+        return await _serialize_products(products, sort_by)
+
+    task = speculative.claim(args["query"]) if speculative else None
+    if task is not None:
+        print(f"Reusing speculative search for {args['query']}...")
+        products = sort_products(await task, sort_by)
+    else:
+        print(f"Searching for {args['query']}...")
+        # Runs on the crawl workers, a search already in flight for the same query is joined
+        products = await crawl_client.crawl_for_products(args["query"], sort_by)
+    print(products)
+    return await _serialize_products(products, sort_by)
+
+
+async def _serialize_products(products: list, sort_by: Optional[str]) -> str:
+    output = serialize_products(products, preserve_order=sort_by is not None)
+    # The ids in the output must resolve on whichever worker the frontend reaches
+    await product_registry.share()
+    return output
+
+
+async def _run_tool_call(tool_call, speculative: Optional[SpeculativeSearch] = None) -> str:
+    try:
+        args = json.loads(tool_call.arguments)
+        return await asyncio.wait_for(_search_product(args, speculative), timeout=TOOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Tool call {tool_call.call_id} timed out")
+        return f"{tool_call.name} timed out after {TOOL_TIMEOUT} seconds"
+    except Exception as e:
+        print(f"Tool call {tool_call.call_id} failed: {e}")
+        return f"{tool_call.name} failed: {e}"
+
+
+@functools.lru_cache(maxsize=1)
+def system_prompt() -> str:
+    with open(SYSTEM_PROMPT_PATH, "r") as file:
+        return file.read()
+
+
+def _create_semantic_cache() -> SemanticCache:
+    return SemanticCache(
+        lambda text: llm_agent._embed(text),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+    )
+
+
+semantic_cache = LazySingleton(_create_semantic_cache, "semantic_cache") if SEMANTIC_CACHE else None
+
+
+async def _cache_lookup(query: str, message_history: list[dict]) -> Optional[str]:
+    if semantic_cache is None:
+        return None
+    try:
+        with stage("semantic_cache_lookup"):
+            cached = await asyncio.to_thread(semantic_cache.lookup, query, message_history)
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        return None
+    record_cache("semantic", cached is not None)
+    return cached
+
+
+async def _cache_store(
+    query: str, message_history: list[dict], assembler: MessageAssembler, reply: str
+):
+    # Replies built on search results go stale with the listings, so only
+    # turns answered without any tool output are cached
+    if semantic_cache is None or len(assembler.turns) > 1:
+        return
+    try:
+        await asyncio.to_thread(semantic_cache.store, query, message_history, reply)
+    except Exception as e:
+        print(f"Semantic cache store failed: {e}")
+
+
+def _tool_choice(iteration: int, force_answer: bool = False):
+    # On the last round-trip, or after a response that neither answered nor
+    # searched, the model has to answer with what it has
+    if force_answer or iteration == MAX_TOOL_ITERATIONS - 1:
+        return {"type": "function", "name": "respond_customer"}
+    return "required"
+
+
+def _append_tool_outputs(assembler: MessageAssembler, tool_calls: list, outputs: list[str]):
+    for tool_call, output in zip(tool_calls, outputs):
+        assembler.append(tool_call)
+        assembler.append(
+            {  # append result message
+                "type": "function_call_output",
+                "call_id": tool_call.call_id,
+                "output": output,
+            }
         )
+
+
+def _start_speculative_search(query: str) -> Optional[SpeculativeSearch]:
+    if not SPECULATIVE_SEARCH:
+        return None
+    return SpeculativeSearch.start(query, crawl_client.crawl_for_products)
+
+
+def _create_assembler(query: str, message_history: list[dict]) -> MessageAssembler:
+    assembler = MessageAssembler.create(system_prompt(), message_history, tools)
+    assembler.append({"role": "user", "content": query})
+    return assembler
+
+
+async def llm_search_product(query: str, message_history: list[dict]) -> str:
+    if LLM_STREAMING:
+        deltas = [delta async for delta in stream_llm_search_product(query, message_history)]
+        return "".join(deltas)
+
+    cached = await _cache_lookup(query, message_history)
+    if cached is not None:
+        return cached
+
+    assembler = _create_assembler(query, message_history)
+    speculative = _start_speculative_search(query)
+    try:
+        reply = await _llm_search_product(assembler, speculative)
+        # Fire-and-forget, the embedding call should not delay the reply
+        asyncio.create_task(_cache_store(query, message_history, assembler, reply))
+        return reply
+    finally:
+        if speculative is not None:
+            speculative.cancel()
+
+
+async def _llm_search_product(
+    assembler: MessageAssembler,
+    speculative: Optional[SpeculativeSearch],
+) -> str:
+    force_answer = False
+    for iteration in range(MAX_TOOL_ITERATIONS):
+        # Off the event loop, so a speculative crawl makes progress meanwhile
+        async with governor.limit("llm"):
+            with stage("llm", llm_agent.agent_name):
+                response = await asyncio.to_thread(
+                    llm_agent._generate_tool_call_response,
+                    assembler.build(),
+                    assembler.tools,
+                    tool_choice=_tool_choice(iteration, force_answer),
+                )
         if len(response.output_text) > 0:
             print("Normal output text")
-            response_text = response.output_text
-        else:
-            tool_call = response.output[0]
-            args = json.loads(tool_call.arguments)
-            function_name = tool_call.name
-            if function_name == "search_product":
-                if recommender is None:
-                    recommender = EcommerceRecommender()
-                print(f"Searching for {args['query']}...")
-                products = await recommender.crawl_for_products(args["query"])
-                print(products)
-
-                response_text = None
-                message_history.append(tool_call)
-                message_history.append(
-                    {  # append result message
-                        "type": "function_call_output",
-                        "call_id": tool_call.call_id,
-                        "output": str(products),
-                    }
-                )
-            elif function_name == "respond_customer":
-                response_text = args["response"]
-                
-    return response_text
+            return response.output_text
+
+        tool_calls = [item for item in response.output if item.type == "function_call"]
+        for tool_call in tool_calls:
+            if tool_call.name == "respond_customer":
+                return json.loads(tool_call.arguments)["response"]
+
+        search_calls = [
+            tool_call for tool_call in tool_calls if tool_call.name == "search_product"
+        ]
+        # Asking again the same way would get the same empty response
+        force_answer = not search_calls
+
+        # Every search of this response runs at once and is answered in one follow-up
+        outputs = await asyncio.gather(
+            *[_run_tool_call(tool_call, speculative) for tool_call in search_calls]
+        )
+        _append_tool_outputs(assembler, search_calls, outputs)
+
+        # Only the first round of searches can use the speculative crawl
+        if speculative is not None:
+            speculative.cancel()
+
+    raise ValueError(f"No response after {MAX_TOOL_ITERATIONS} tool iterations")
+
+
+async def stream_llm_search_product(
+    query: str, message_history: list[dict]
+) -> AsyncIterator[str]:
+    """Same tool loop as llm_search_product, yielding the reply text as it streams.
+
+    Searches start as soon as their tool call is complete, while the model is
+    still generating the rest of its response.
+    """
+    cached = await _cache_lookup(query, message_history)
+    if cached is not None:
+        yield cached
+        return
+
+    assembler = _create_assembler(query, message_history)
+    speculative = _start_speculative_search(query)
+    try:
+        deltas = []
+        async for delta in _stream_llm_search_product(assembler, speculative):
+            deltas.append(delta)
+            yield delta
+        asyncio.create_task(
+            _cache_store(query, message_history, assembler, "".join(deltas))
+        )
+    finally:
+        if speculative is not None:
+            speculative.cancel()
+
+
+async def _stream_llm_search_product(
+    assembler: MessageAssembler,
+    speculative: Optional[SpeculativeSearch],
+) -> AsyncIterator[str]:
+    force_answer = False
+    for iteration in range(MAX_TOOL_ITERATIONS):
+        answered = False
+        search_calls = []
+        search_tasks = []
+        try:
+            started = time.perf_counter()
+            first_token = None
+            # The slot is held for as long as the response streams
+            async with governor.limit("llm"):
+                async for event in llm_agent._stream_tool_call_response(
+                    assembler.build(),
+                    assembler.tools,
+                    tool_choice=_tool_choice(iteration, force_answer),
+                    text_tool="respond_customer",
+                ):
+                    if first_token is None and event.type != LLMStreamEventType.COMPLETED:
+                        first_token = time.perf_counter() - started
+                        observe_stage("llm_first_token", llm_agent.agent_name, first_token)
+                    if event.type == LLMStreamEventType.TEXT_DELTA:
+                        answered = True
+                        yield event.text
+                    elif event.type == LLMStreamEventType.TOOL_CALL:
+                        tool_call = event.tool_call
+                        if tool_call.name == "respond_customer":
+                            answered = True
+                        elif tool_call.name == "search_product":
+                            search_calls.append(tool_call)
+                            search_tasks.append(
+                                asyncio.create_task(_run_tool_call(tool_call, speculative))
+                            )
+
+            observe_stage("llm", llm_agent.agent_name, time.perf_counter() - started)
+            if answered:
+                return
+            force_answer = not search_calls
+
+            outputs = await asyncio.gather(*search_tasks)
+            _append_tool_outputs(assembler, search_calls, outputs)
+        finally:
+            for task in search_tasks:
+                task.cancel()
+
+        # Only the first round of searches can use the speculative crawl
+        if speculative is not None:
+            speculative.cancel()
+
+    raise ValueError(f"No response after {MAX_TOOL_ITERATIONS} tool iterations")
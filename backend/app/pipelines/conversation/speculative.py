@@ -0,0 +1,102 @@
+import asyncio
+import os
+import re
+from typing import Awaitable, Callable, List, Optional
+
+from app.utils.governor import Priority, governor
+from crawler.normalize import normalize_title
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "false").lower() == "true"
+# Minimum keyword overlap between the guess and the model's query to reuse the crawl
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.6"))
+
+SHOPPING_CUES = {
+    "buy", "buying", "find", "looking", "search", "recommend", "recommendation",
+    "cheap", "cheapest", "cheaper", "price", "prices", "best", "want", "need",
+    "shop", "shopping", "order", "purchase", "deal", "deals", "sell", "show",
+}
+SHOPPING_CUES_ZH = ["买", "推荐", "找", "便宜", "价格", "多少钱", "搜索"]
+STOPWORDS = {
+    "a", "an", "the", "i", "im", "i'm", "me", "my", "you", "your", "can", "could",
+    "would", "please", "some", "any", "for", "to", "of", "with", "and", "or", "is",
+    "are", "do", "does", "there", "that", "this", "what", "which", "good", "new",
+    "one", "ones", "get", "us", "we", "on", "in", "under", "about", "like",
+    "hi", "hey", "hello", "thanks", "really", "also", "something", "it", "be",
+    "dollar", "dollars", "bucks", "usd", "yuan", "rmb", "euro", "euros",
+}
+MAX_KEYWORDS = 6
+
+
+def extract_search_keywords(transcription: str) -> Optional[str]:
+    """Cheap guess of the search_product query, or None if this is not a shopping turn."""
+    words = normalize_title(transcription).split()
+    has_cue = any(word in SHOPPING_CUES for word in words) or any(
+        cue in transcription for cue in SHOPPING_CUES_ZH
+    )
+    if not has_cue:
+        return None
+
+    # The crawler expects an English query, anything else is left to the model
+    keywords = [
+        word
+        for word in words
+        if word not in SHOPPING_CUES and word not in STOPWORDS and re.fullmatch(r"[a-z0-9]+", word)
+    ]
+    if not keywords:
+        return None
+    return " ".join(keywords[:MAX_KEYWORDS])
+
+
+def _keyword_set(query: str) -> set[str]:
+    return {word.rstrip("s") for word in normalize_title(query).split() if word not in STOPWORDS}
+
+
+def keyword_similarity(first: str, second: str) -> float:
+    first_keywords, second_keywords = _keyword_set(first), _keyword_set(second)
+    if not first_keywords or not second_keywords:
+        return 0.0
+    return len(first_keywords & second_keywords) / len(first_keywords | second_keywords)
+
+
+async def _in_background(search: Awaitable[List[dict]]) -> List[dict]:
+    # A guess should never take a browser or LLM slot ahead of a real turn
+    with governor.scope(Priority.BACKGROUND):
+        return await search
+
+
+class SpeculativeSearch:
+    """A crawl started from the transcription before the model asked for it."""
+
+    def __init__(self, query: str, task: asyncio.Task):
+        self.query = query
+        self.task = task
+        self.claimed = False
+
+    @classmethod
+    def start(
+        cls, transcription: str, search: Callable[[str], Awaitable[List[dict]]]
+    ) -> Optional["SpeculativeSearch"]:
+        query = extract_search_keywords(transcription)
+        if query is None:
+            return None
+        print(f"Speculatively searching for {query}...")
+        return cls(query, asyncio.create_task(_in_background(search(query))))
+
+    def claim(self, query: str) -> Optional[asyncio.Task]:
+        """Hands the running crawl to a tool call whose query is close enough."""
+        if self.claimed or self.task.cancelled():
+            return None
+        similarity = keyword_similarity(self.query, query)
+        if similarity < SPECULATIVE_MATCH_THRESHOLD:
+            print(f"Speculative query '{self.query}' does not match '{query}' ({similarity:.2f})")
+            return None
+        self.claimed = True
+        return self.task
+
+    def cancel(self):
+        if not self.claimed and not self.task.done():
+            print(f"Cancelling speculative search for {self.query}")
+            self.task.cancel()
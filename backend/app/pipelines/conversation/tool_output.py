@@ -0,0 +1,144 @@
+import hashlib
+import json
+import math
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.utils.backplane import backplane
+from app.utils.backplane.base_backplane import Base_Backplane
+from crawler.normalize import MISSING
+from crawler.product import ProductRecord
+from crawler.ranking import ProductRanker, product_ranker
+
+# Rough token budget for one search_product output sent to the model
+TOOL_OUTPUT_TOKEN_BUDGET = int(os.getenv("TOOL_OUTPUT_TOKEN_BUDGET", "800"))
+# "json" or "table"
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "json")
+
+MAX_NAME_LENGTH = 80
+COMPACT_FIELDS = ["id", "name", "price", "rating", "reviews", "seller", "source"]
+# Seconds a product id stays resolvable on the other workers
+PRODUCT_REGISTRY_TTL = float(os.getenv("PRODUCT_REGISTRY_TTL", "3600"))
+
+
+class ProductRegistry:
+    """Keeps the full product records server-side; the model only sees their ids.
+
+    Ids are a hash of the product key, so every worker gives a product the same
+    one. Registered products are also shared over the backplane, so a product
+    page request landing on another worker than the search still resolves.
+    """
+
+    def __init__(
+        self,
+        backplane: Optional[Base_Backplane] = None,
+        max_size: int = 5000,
+        shared_ttl: float = PRODUCT_REGISTRY_TTL,
+    ):
+        self.backplane = backplane
+        self.max_size = max_size
+        self.shared_ttl = shared_ttl
+        self.products: OrderedDict[str, ProductRecord] = OrderedDict()
+        # Registered since the last share
+        self.unshared: Dict[str, ProductRecord] = {}
+
+    def register(self, product: ProductRecord) -> str:
+        product_id = "p" + hashlib.sha1(product.key.encode("utf-8")).hexdigest()[:8]
+
+        self.products[product_id] = product
+        self.products.move_to_end(product_id)
+        while len(self.products) > self.max_size:
+            self.products.popitem(last=False)
+        self.unshared[product_id] = product
+        return product_id
+
+    async def share(self) -> None:
+        unshared, self.unshared = self.unshared, {}
+        if self.backplane is None or not unshared:
+            return
+        values = {
+            f"product:{product_id}": json.dumps(product.to_dict(), ensure_ascii=False)
+            for product_id, product in unshared.items()
+        }
+        try:
+            await self.backplane.set_shared(values, self.shared_ttl)
+        except Exception as e:
+            # Only costs a 404 for pages opened from another worker
+            print(f"Sharing {len(values)} products over the backplane failed: {e}")
+
+    async def resolve(self, product_id: str) -> Optional[ProductRecord]:
+        product = self.products.get(product_id)
+        if product is not None or self.backplane is None:
+            return product
+        value = await self.backplane.get_shared(f"product:{product_id}")
+        return ProductRecord.from_dict(json.loads(value)) if value is not None else None
+
+
+product_registry = ProductRegistry(backplane)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting and needs no tokenizer
+    return math.ceil(len(text) / 4)
+
+
+def compact_product(product: ProductRecord, registry: ProductRegistry) -> Dict[str, Any]:
+    name = product.product_name
+    if len(name) > MAX_NAME_LENGTH:
+        name = name[: MAX_NAME_LENGTH - 1].rstrip() + "…"
+
+    rating = product.rating_value
+    compact = {
+        "id": registry.register(product),
+        "name": name,
+        "price": product.price,
+        "rating": round(rating, 1) if rating is not None else None,
+        "reviews": product.review_count,
+        "seller": product.seller,
+        "source": product.source,
+    }
+    return {
+        key: value
+        for key, value in compact.items()
+        if value not in (None, "", MISSING)
+    }
+
+
+def _to_json(rows: List[Dict[str, Any]]) -> str:
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+
+
+def _to_table(rows: List[Dict[str, Any]]) -> str:
+    lines = ["|".join(COMPACT_FIELDS)]
+    for row in rows:
+        lines.append(
+            "|".join(str(row.get(field, "")).replace("|", "/") for field in COMPACT_FIELDS)
+        )
+    return "\n".join(lines)
+
+
+def serialize_products(
+    products: List[ProductRecord],
+    token_budget: int = TOOL_OUTPUT_TOKEN_BUDGET,
+    output_format: str = TOOL_OUTPUT_FORMAT,
+    registry: ProductRegistry = product_registry,
+    preserve_order: bool = False,
+    ranker: ProductRanker = product_ranker,
+) -> str:
+    """Renders the ranker's top products, as many as fit the token budget for a tool output.
+
+    With ``preserve_order`` the products keep the order they were sorted in.
+    """
+    render = _to_table if output_format == "table" else _to_json
+    ordered = ranker.rank(products, preserve_order=preserve_order)
+    rows = []
+    for product in ordered:
+        candidate = rows + [compact_product(product, registry)]
+        if rows and estimate_tokens(render(candidate)) > token_budget:
+            break
+        rows = candidate
+
+    if not rows:
+        return "No products found."
+    return render(rows)
@@ -0,0 +1,19 @@
+import os
+
+from app.utils.backplane.base_backplane import Base_Backplane
+from app.utils.backplane.memory_backplane import InMemoryBackplane
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def create_backplane() -> Base_Backplane:
+    url = os.getenv("BACKPLANE_URL")
+    if url:
+        from app.utils.backplane.redis_backplane import RedisBackplane
+
+        return RedisBackplane(url=url)
+    return InMemoryBackplane()
+
+
+backplane = create_backplane()
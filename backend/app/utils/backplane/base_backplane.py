@@ -0,0 +1,58 @@
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+MessageHandler = Callable[[dict], Awaitable[None]]
+
+
+class Base_Backplane:
+    """Shared state for every worker serving the conversation websockets.
+
+    A backplane tracks which worker owns which websocket, holds the per
+    conversation turn locks and relays outgoing messages to the owning worker.
+    Each turn lock is held with its own token, as a worker can run several turns.
+    """
+
+    def __init__(self, backplane_name: str):
+        self.backplane_name = backplane_name
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def claim_connection(self, user_id: str) -> None:
+        raise NotImplementedError("Subclasses must implement claim_connection")
+
+    async def release_connection(self, user_id: str) -> None:
+        raise NotImplementedError("Subclasses must implement release_connection")
+
+    async def get_connection_owner(self, user_id: str) -> Optional[str]:
+        raise NotImplementedError("Subclasses must implement get_connection_owner")
+
+    def _lock_token(self) -> str:
+        return uuid.uuid4().hex
+
+    async def acquire_turn_lock(self, conversation_id: str, ttl: float) -> Optional[str]:
+        """A token to release the lock with, or None if another turn holds it."""
+        raise NotImplementedError("Subclasses must implement acquire_turn_lock")
+
+    async def release_turn_lock(self, conversation_id: str, token: str) -> None:
+        """Releases the lock only if it is still held with ``token``."""
+        raise NotImplementedError("Subclasses must implement release_turn_lock")
+
+    async def set_shared(self, values: Dict[str, str], ttl: float) -> None:
+        """Stores values every worker can read for ``ttl`` seconds."""
+        raise NotImplementedError("Subclasses must implement set_shared")
+
+    async def get_shared(self, key: str) -> Optional[str]:
+        raise NotImplementedError("Subclasses must implement get_shared")
+
+    async def publish(self, worker_id: str, message: dict) -> None:
+        raise NotImplementedError("Subclasses must implement publish")
+
+    async def broadcast(self, message: dict) -> None:
+        raise NotImplementedError("Subclasses must implement broadcast")
+
+    async def subscribe(self, handler: MessageHandler) -> None:
+        raise NotImplementedError("Subclasses must implement subscribe")
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,80 @@
+import time
+from typing import Dict, Optional
+
+from app.utils.backplane.base_backplane import Base_Backplane, MessageHandler
+
+
+class InMemoryHub:
+    """State shared by every in-memory backplane of one process."""
+
+    def __init__(self):
+        self.connections: Dict[str, str] = {}
+        self.turn_locks: Dict[str, tuple[str, float]] = {}
+        self.shared: Dict[str, tuple[str, float]] = {}
+        self.handlers: Dict[str, MessageHandler] = {}
+
+
+default_hub = InMemoryHub()
+
+
+class InMemoryBackplane(Base_Backplane):
+    """Single process backplane. Workers sharing a hub can reach each other."""
+
+    def __init__(self, hub: Optional[InMemoryHub] = None):
+        super().__init__("InMemory")
+        self.hub = hub or default_hub
+
+    async def claim_connection(self, user_id: str) -> None:
+        self.hub.connections[user_id] = self.worker_id
+
+    async def release_connection(self, user_id: str) -> None:
+        if self.hub.connections.get(user_id) == self.worker_id:
+            del self.hub.connections[user_id]
+
+    async def get_connection_owner(self, user_id: str) -> Optional[str]:
+        return self.hub.connections.get(user_id)
+
+    async def acquire_turn_lock(self, conversation_id: str, ttl: float) -> Optional[str]:
+        now = time.monotonic()
+        lock = self.hub.turn_locks.get(conversation_id)
+        if lock is not None and lock[1] > now:
+            return None
+        token = self._lock_token()
+        self.hub.turn_locks[conversation_id] = (token, now + ttl)
+        return token
+
+    async def release_turn_lock(self, conversation_id: str, token: str) -> None:
+        lock = self.hub.turn_locks.get(conversation_id)
+        if lock is not None and lock[0] == token:
+            del self.hub.turn_locks[conversation_id]
+
+    async def set_shared(self, values: Dict[str, str], ttl: float) -> None:
+        expires = time.monotonic() + ttl
+        for key, value in values.items():
+            self.hub.shared[key] = (value, expires)
+
+    async def get_shared(self, key: str) -> Optional[str]:
+        entry = self.hub.shared.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.hub.shared[key]
+            return None
+        return entry[0]
+
+    async def publish(self, worker_id: str, message: dict) -> None:
+        handler = self.hub.handlers.get(worker_id)
+        if handler is None:
+            print(f"No subscriber for worker {worker_id}, dropping message")
+            return
+        await handler(message)
+
+    async def broadcast(self, message: dict) -> None:
+        for handler in list(self.hub.handlers.values()):
+            await handler(message)
+
+    async def subscribe(self, handler: MessageHandler) -> None:
+        self.hub.handlers[self.worker_id] = handler
+
+    async def close(self) -> None:
+        self.hub.handlers.pop(self.worker_id, None)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from typing import Callable, Dict, Optional, Set
+
+from app.utils.backplane.base_backplane import Base_Backplane, MessageHandler
+from redis import asyncio as redis
+
+
+class RedisBackplane(Base_Backplane):
+    """Backplane on any server speaking the Redis protocol.
+
+    A pre-built ``client`` can be passed in, which lets a local stand-in such
+    as fakeredis serve the backplane.
+
+    Connection keys expire after ``connection_ttl`` so a worker that dies
+    without releasing them stops receiving messages. While the worker lives,
+    a heartbeat refreshes the keys of its connections.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client: Optional[redis.Redis] = None,
+        prefix: str = "avatar",
+        connection_ttl: int = 3600,
+    ):
+        super().__init__("Redis")
+        if client is None and url is None:
+            raise ValueError("Either url or client must be provided")
+        self.client = client or redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.connection_ttl = connection_ttl
+        self._connections: Set[str] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._pubsub = None
+
+    def _key(self, *parts: str) -> str:
+        return ":".join([self.prefix, *parts])
+
+    def _worker_channel(self, worker_id: str) -> str:
+        return self._key("worker", worker_id)
+
+    async def claim_connection(self, user_id: str) -> None:
+        await self.client.set(
+            self._key("connection", user_id), self.worker_id, ex=self.connection_ttl
+        )
+        self._connections.add(user_id)
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._refresh_connections())
+
+    async def _refresh_connections(self) -> None:
+        while True:
+            await asyncio.sleep(self.connection_ttl / 3)
+            for user_id in list(self._connections):
+                try:
+                    owned = await self._update_if_owner(
+                        self._key("connection", user_id),
+                        self.worker_id,
+                        lambda pipe, key: pipe.expire(key, self.connection_ttl),
+                    )
+                except Exception as e:
+                    print(f"Error refreshing connection of {user_id}: {e}")
+                    continue
+                if not owned:
+                    # The user reconnected to another worker
+                    self._connections.discard(user_id)
+
+    async def _update_if_owner(
+        self, key: str, value: str, update: Callable[[redis.client.Pipeline, str], None]
+    ) -> bool:
+        """Runs ``update`` on ``key`` only while it still holds ``value``."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                owner = await pipe.get(key)
+                if owner != value:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                update(pipe, key)
+                await pipe.execute()
+                return True
+            except redis.WatchError:
+                # Someone else took the key in the meantime
+                return False
+
+    async def _delete_if_owner(self, key: str, value: str) -> None:
+        await self._update_if_owner(key, value, lambda pipe, key: pipe.delete(key))
+
+    async def release_connection(self, user_id: str) -> None:
+        self._connections.discard(user_id)
+        await self._delete_if_owner(self._key("connection", user_id), self.worker_id)
+
+    async def get_connection_owner(self, user_id: str) -> Optional[str]:
+        return await self.client.get(self._key("connection", user_id))
+
+    async def acquire_turn_lock(self, conversation_id: str, ttl: float) -> Optional[str]:
+        token = self._lock_token()
+        acquired = await self.client.set(
+            self._key("turn", conversation_id),
+            token,
+            nx=True,
+            px=int(ttl * 1000),
+        )
+        return token if acquired else None
+
+    async def release_turn_lock(self, conversation_id: str, token: str) -> None:
+        await self._delete_if_owner(self._key("turn", conversation_id), token)
+
+    async def set_shared(self, values: Dict[str, str], ttl: float) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(self._key("shared", key), value, px=int(ttl * 1000))
+            await pipe.execute()
+
+    async def get_shared(self, key: str) -> Optional[str]:
+        return await self.client.get(self._key("shared", key))
+
+    async def publish(self, worker_id: str, message: dict) -> None:
+        receivers = await self.client.publish(
+            self._worker_channel(worker_id), json.dumps(message)
+        )
+        if receivers == 0:
+            print(f"No subscriber for worker {worker_id}, dropping message")
+
+    async def broadcast(self, message: dict) -> None:
+        await self.client.publish(self._key("broadcast"), json.dumps(message))
+
+    async def subscribe(self, handler: MessageHandler) -> None:
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(
+            self._worker_channel(self.worker_id), self._key("broadcast")
+        )
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: MessageHandler) -> None:
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                await handler(json.loads(message["data"]))
+            except Exception as e:
+                print(f"Error handling backplane message: {e}")
+
+    async def close(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self.client.aclose()
@@ -1,3 +1,10 @@
-from app.utils.db.messages import Message_DB
+from app.utils.lifecycle import LazySingleton
 
-message_db = Message_DB()
+
+def _create_message_db():
+    from app.utils.db.messages import Message_DB
+
+    return Message_DB()
+
+
+message_db = LazySingleton(_create_message_db, "message_db")
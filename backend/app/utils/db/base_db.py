@@ -24,6 +24,10 @@ class BaseDB:
         # self._run_connection_test()
         # self.create_tables()
 
+    def ping(self):
+        self.cursor.execute("SELECT 1")
+        self.cursor.fetchone()
+
     def _format_query_path(self, query_name: str):
         file_path = os.path.join(self.query_dir, f"{query_name}.sql")
         if not os.path.exists(file_path):
@@ -0,0 +1,5 @@
+from app.utils.governor.resource_governor import (DEFAULT_LIMITS,
+                                                  ResourceGovernor)
+from app.utils.governor.resource_limiter import Overloaded, Priority
+
+governor = ResourceGovernor(DEFAULT_LIMITS)
@@ -0,0 +1,75 @@
+import contextlib
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.utils.governor.resource_limiter import Priority, ResourceLimiter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_priority: ContextVar[int] = ContextVar("governor_priority", default=Priority.VOICE)
+_deadline: ContextVar[Optional[float]] = ContextVar("governor_deadline", default=None)
+
+# resource: (concurrency, queue length, seconds to wait for a slot)
+DEFAULT_LIMITS = {
+    "turn": (16, 32, 5),
+    "browser": (4, 16, 20),
+    "llm": (16, 64, 30),
+    "tts": (4, 32, 15),
+    # Message_DB shares one cursor, so its calls must not overlap
+    "db": (1, 64, 10),
+}
+
+
+class ResourceGovernor:
+    """Per-resource admission control shared by every turn on this worker."""
+
+    def __init__(self, limits: Dict[str, tuple]):
+        self.limiters = {
+            name: ResourceLimiter(name, *self._configure(name, defaults))
+            for name, defaults in limits.items()
+        }
+
+    def _configure(self, name: str, defaults: tuple) -> tuple:
+        concurrency, queue, timeout = defaults
+        prefix = f"GOVERNOR_{name.upper()}"
+        return (
+            int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            int(os.getenv(f"{prefix}_QUEUE", str(queue))),
+            float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+        )
+
+    @contextlib.contextmanager
+    def scope(self, priority: int, timeout: Optional[float] = None):
+        """Sets the priority and overall deadline for every resource acquired inside."""
+        priority_token = _priority.set(priority)
+        deadline_token = _deadline.set(time.monotonic() + timeout if timeout else _deadline.get())
+        try:
+            yield
+        finally:
+            _deadline.reset(deadline_token)
+            _priority.reset(priority_token)
+
+    def priority(self) -> int:
+        return _priority.get()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the current scope's deadline, None without one."""
+        deadline = _deadline.get()
+        return None if deadline is None else deadline - time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def limit(self, resource: str):
+        limiter = self.limiters[resource]
+        deadline = time.monotonic() + limiter.timeout
+        scope_deadline = _deadline.get()
+        if scope_deadline is not None:
+            deadline = min(deadline, scope_deadline)
+
+        granted_at = await limiter.acquire(_priority.get(), deadline)
+        try:
+            yield
+        finally:
+            limiter.release(granted_at)
@@ -0,0 +1,96 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+
+from app.utils.metrics.prometheus import (GOVERNOR_IN_USE, GOVERNOR_REJECTED,
+                                          GOVERNOR_WAIT, GOVERNOR_WAITING)
+
+
+class Priority(IntEnum):
+    # Lower values are admitted first
+    VOICE = 0
+    BACKGROUND = 10
+
+
+class Overloaded(Exception):
+    def __init__(self, resource: str, reason: str, retry_after: float):
+        super().__init__(f"{resource} is overloaded ({reason}), retry after {retry_after:.1f}s")
+        self.resource = resource
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ResourceLimiter:
+    """A semaphore with a bounded, priority-ordered wait queue and per-waiter deadlines."""
+
+    def __init__(self, name: str, capacity: int, max_queue: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_use = 0
+        self.waiting = 0
+        # Heap of [priority, sequence, future], cancelled entries are skipped on release
+        self.waiters: list = []
+        self.sequence = itertools.count()
+        # Smoothed slot hold time, used to tell rejected clients when to retry
+        self.hold_time = 1.0
+
+    def retry_after(self) -> float:
+        return self.hold_time * (self.waiting + 1) / self.capacity
+
+    def _reject(self, reason: str):
+        GOVERNOR_REJECTED.labels(resource=self.name, reason=reason).inc()
+        raise Overloaded(self.name, reason, self.retry_after())
+
+    def _granted(self):
+        GOVERNOR_IN_USE.labels(resource=self.name).set(self.in_use)
+
+    async def acquire(self, priority: int, deadline: float) -> float:
+        """Takes a slot, or raises Overloaded if none frees up before ``deadline``.
+
+        Returns the time the slot was granted, to be passed back to ``release``.
+        """
+        if self.in_use < self.capacity and self.waiting == 0:
+            self.in_use += 1
+            self._granted()
+            return time.monotonic()
+        if self.waiting >= self.max_queue:
+            self._reject("queue_full")
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, [priority, next(self.sequence), future])
+        self.waiting += 1
+        GOVERNOR_WAITING.labels(resource=self.name).set(self.waiting)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # A release may have handed over the slot just as the wait timed out
+            if not (future.done() and not future.cancelled()):
+                self._reject("deadline")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(time.monotonic())
+            raise
+        finally:
+            self.waiting -= 1
+            GOVERNOR_WAITING.labels(resource=self.name).set(self.waiting)
+            GOVERNOR_WAIT.labels(resource=self.name).observe(time.monotonic() - start)
+        return time.monotonic()
+
+    def release(self, granted_at: float):
+        self.hold_time = 0.8 * self.hold_time + 0.2 * (time.monotonic() - granted_at)
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                # The slot passes straight to the waiter, in_use is unchanged
+                future.set_result(None)
+                return
+        self.in_use -= 1
+        self._granted()
@@ -0,0 +1,4 @@
+from app.utils.lifecycle.lazy import LazySingleton
+from app.utils.lifecycle.readiness import Readiness
+
+readiness = Readiness()
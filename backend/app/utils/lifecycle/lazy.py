@@ -0,0 +1,40 @@
+import threading
+from typing import Any, Callable
+
+
+class LazySingleton:
+    """Stands in for a module-level singleton and builds it on first attribute access.
+
+    Keeps heavy SDK imports and client construction out of module import, so a
+    worker boots fast and one unreachable dependency does not fail the import.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str):
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_load(self) -> Any:
+        instance = self._lazy_instance
+        if instance is not None:
+            return instance
+        with self._lazy_lock:
+            if self._lazy_instance is None:
+                object.__setattr__(self, "_lazy_instance", self._lazy_factory())
+            return self._lazy_instance
+
+    @property
+    def _lazy_is_loaded(self) -> bool:
+        return self._lazy_instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_load(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._lazy_load(), name, value)
+
+    def __repr__(self) -> str:
+        if self._lazy_is_loaded:
+            return repr(self._lazy_instance)
+        return f"<LazySingleton {self._lazy_name} (not loaded)>"
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+
+class Component:
+    def __init__(self, name: str, warm_up: Callable[[], None], required: bool):
+        self.name = name
+        self.warm_up = warm_up
+        self.required = required
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.attempts = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "required": self.required,
+            "error": self.error,
+            "duration": self.duration,
+            "attempts": self.attempts,
+        }
+
+
+class Readiness:
+    """Warms registered components in parallel and reports whether the worker can serve.
+
+    A required component that fails is retried with exponential backoff until
+    it is ready, so a dependency that was down at boot does not leave the
+    worker unready for good.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, Component] = {}
+
+    def register(self, name: str, warm_up: Callable[[], None], required: bool = True):
+        self.components[name] = Component(name, warm_up, required)
+
+    async def _attempt(self, component: Component, timeout: float):
+        start = time.perf_counter()
+        component.status = "warming"
+        component.error = None
+        component.attempts += 1
+        try:
+            # Warm-ups are blocking SDK calls, each gets its own thread
+            await asyncio.wait_for(asyncio.to_thread(component.warm_up), timeout=timeout)
+            component.status = "ready"
+        except asyncio.TimeoutError:
+            component.status = "failed"
+            component.error = f"timed out after {timeout} seconds"
+        except Exception as e:
+            component.status = "failed"
+            component.error = str(e)
+        component.duration = round(time.perf_counter() - start, 3)
+        print(f"Warm-up of {component.name} {component.status} in {component.duration}s"
+              + (f": {component.error}" if component.error else ""))
+
+    async def _warm_up(self, component: Component, timeout: float, backoff: float, max_backoff: float):
+        delay = backoff
+        while True:
+            await self._attempt(component, timeout)
+            if component.status == "ready" or not component.required:
+                return
+            print(f"Retrying warm-up of {component.name} in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_backoff)
+
+    async def warm_up(self, timeout: float, backoff: float = 1, max_backoff: float = 60):
+        await asyncio.gather(
+            *[
+                self._warm_up(component, timeout, backoff, max_backoff)
+                for component in self.components.values()
+            ]
+        )
+
+    @property
+    def ready(self) -> bool:
+        return all(
+            component.status == "ready"
+            for component in self.components.values()
+            if component.required
+        )
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": {name: component.to_dict() for name, component in self.components.items()},
+        }
@@ -0,0 +1,5 @@
+from app.utils.metrics.prometheus import render_metrics
+from app.utils.metrics.tracing import (add_turn_listener, attach_turn,
+                                       current_turn, observe_stage,
+                                       record_cache, record_llm_input_tokens,
+                                       stage, turn)
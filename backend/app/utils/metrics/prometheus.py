@@ -0,0 +1,165 @@
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# Voice turns span from milliseconds (ws send) to tens of seconds (crawls)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+STAGE_DURATION = Histogram(
+    "avatar_stage_duration_seconds",
+    "Duration of one pipeline stage",
+    ["stage", "provider"],
+    buckets=LATENCY_BUCKETS,
+)
+TURN_DURATION = Histogram(
+    "avatar_turn_duration_seconds",
+    "Duration of a whole conversation turn",
+    buckets=LATENCY_BUCKETS,
+)
+TURNS_IN_FLIGHT = Gauge(
+    "avatar_turns_in_flight",
+    "Conversation turns currently being processed",
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "avatar_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+LLM_INPUT_TOKENS = Counter(
+    "avatar_llm_input_tokens_total",
+    "LLM input tokens, split by whether the provider served them from its prompt cache",
+    ["provider", "kind"],
+)
+
+GOVERNOR_IN_USE = Gauge(
+    "avatar_governor_in_use",
+    "Slots currently held per governed resource",
+    ["resource"],
+    multiprocess_mode="livesum",
+)
+GOVERNOR_WAITING = Gauge(
+    "avatar_governor_waiting",
+    "Requests queued for a governed resource",
+    ["resource"],
+    multiprocess_mode="livesum",
+)
+GOVERNOR_WAIT = Histogram(
+    "avatar_governor_wait_seconds",
+    "Time spent queued for a governed resource",
+    ["resource"],
+    buckets=LATENCY_BUCKETS,
+)
+GOVERNOR_REJECTED = Counter(
+    "avatar_governor_rejected_total",
+    "Requests shed by the governor",
+    ["resource", "reason"],
+)
+
+PROVIDER_REQUESTS = Counter(
+    "avatar_provider_requests_total",
+    "Calls to an LLM, STT or TTS provider by outcome",
+    ["kind", "provider", "outcome"],
+)
+PROVIDER_HEDGES = Counter(
+    "avatar_provider_hedges_total",
+    "Hedged second requests sent because the first was slower than its p95",
+    ["kind", "provider"],
+)
+PROVIDER_BREAKER_OPEN = Gauge(
+    "avatar_provider_breaker_open",
+    "1 while a provider's circuit breaker is open",
+    ["kind", "provider"],
+    multiprocess_mode="max",
+)
+
+CRAWL_ENGINE_OPEN = Gauge(
+    "avatar_crawl_engine_open",
+    "1 while a search engine's circuit breaker is open and searches skip it",
+    ["engine"],
+    multiprocess_mode="max",
+)
+CRAWL_ENGINE_TIMEOUT = Gauge(
+    "avatar_crawl_engine_timeout_seconds",
+    "Current adaptive browser page timeout per search engine",
+    ["engine"],
+    multiprocess_mode="max",
+)
+CRAWL_ENGINE_LATENCY = Gauge(
+    "avatar_crawl_engine_latency_ewma_seconds",
+    "Moving average of successful browser fetch durations per search engine",
+    ["engine"],
+    multiprocess_mode="max",
+)
+CRAWL_ENGINE_SKIPPED = Counter(
+    "avatar_crawl_engine_skipped_total",
+    "Searches that skipped an engine because its circuit was open",
+    ["engine"],
+)
+CRAWL_ENGINE_PROBES = Counter(
+    "avatar_crawl_engine_probes_total",
+    "Background probes of an open engine by result",
+    ["engine", "result"],
+)
+
+PROXY_IN_FLIGHT = Gauge(
+    "avatar_proxy_in_flight",
+    "Crawl requests currently going through a proxy",
+    ["proxy"],
+    multiprocess_mode="livesum",
+)
+PROXY_COOLING = Gauge(
+    "avatar_proxy_cooling",
+    "1 while a proxy is in cooldown after blocks or errors",
+    ["proxy"],
+    multiprocess_mode="max",
+)
+PROXY_REQUESTS = Counter(
+    "avatar_proxy_requests_total",
+    "Crawl requests through a proxy by result",
+    ["proxy", "result"],
+)
+
+CRAWL_JOBS = Counter(
+    "avatar_crawl_jobs_total",
+    "Crawl jobs finished by a crawl worker, by outcome",
+    ["outcome"],
+)
+CRAWL_JOBS_JOINED = Counter(
+    "avatar_crawl_jobs_joined_total",
+    "Crawl requests that joined an identical job already in flight",
+)
+CRAWL_QUEUE_WAIT = Histogram(
+    "avatar_crawl_queue_wait_seconds",
+    "Time a crawl job spent queued before a worker picked it up",
+    buckets=LATENCY_BUCKETS,
+)
+
+PARTIAL_TRANSCRIPTS = Counter(
+    "avatar_partial_transcripts_total",
+    "Transcriptions of audio received so far, started on a pause while the user speaks, by result",
+    ["result"],
+)
+
+RANK_DROPPED = Counter(
+    "avatar_rank_dropped_total",
+    "Products dropped by the ranking stage before the tool output, by reason",
+    ["reason"],
+)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "avatar_single_flight_calls_total",
+    "Calls through a single-flight group, by whether they started the call or joined one in flight",
+    ["flight", "role"],
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    # With several workers each process writes to PROMETHEUS_MULTIPROC_DIR
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
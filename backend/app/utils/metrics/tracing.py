@@ -0,0 +1,145 @@
+import contextlib
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from app.utils.metrics.prometheus import (CACHE_REQUESTS, LLM_INPUT_TOKENS,
+                                          STAGE_DURATION, TURN_DURATION,
+                                          TURNS_IN_FLIGHT)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _create_tracer():
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if not endpoint:
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk is not installed")
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "avatar-backend")})
+    )
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("avatar.pipeline")
+
+
+tracer = _create_tracer()
+
+
+class StageTiming:
+    def __init__(self, name: str, provider: str):
+        self.name = name
+        self.provider = provider
+        self.duration = 0.0
+
+
+class TurnTrace:
+    def __init__(self, conversation_id: str):
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.conversation_id = conversation_id
+        self.stages: List[StageTiming] = []
+        self.duration = 0.0
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{timing.name}{f'[{timing.provider}]' if timing.provider else ''}={timing.duration:.3f}s"
+            for timing in self.stages
+        )
+
+
+_current_turn: ContextVar[Optional[TurnTrace]] = ContextVar("current_turn", default=None)
+_turn_listeners: List[Callable[[TurnTrace], None]] = []
+
+
+def add_turn_listener(listener: Callable[[TurnTrace], None]):
+    """Calls ``listener`` with every finished turn, e.g. to collect timings in a benchmark."""
+    _turn_listeners.append(listener)
+
+
+def _span(name: str, **attributes):
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+@contextlib.contextmanager
+def turn(conversation_id: str):
+    """Traces one conversation turn; stages timed inside it are attached to it."""
+    trace = TurnTrace(conversation_id)
+    token = _current_turn.set(trace)
+    TURNS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    try:
+        with _span("turn", conversation_id=conversation_id, turn_id=trace.turn_id):
+            yield trace
+    finally:
+        trace.duration = time.perf_counter() - start
+        TURNS_IN_FLIGHT.dec()
+        TURN_DURATION.observe(trace.duration)
+        _current_turn.reset(token)
+        print(f"Turn {trace.turn_id} took {trace.duration:.3f}s: {trace.summary()}")
+        for listener in _turn_listeners:
+            listener(trace)
+
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+
+@contextlib.contextmanager
+def attach_turn(trace: Optional[TurnTrace]):
+    """Attaches stages timed inside to ``trace``, for work done on a turn's behalf in another task."""
+    token = _current_turn.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_turn.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name: str, provider: str = ""):
+    """Times a pipeline stage into the stage histogram and the current turn."""
+    timing = StageTiming(name, provider)
+    start = time.perf_counter()
+    try:
+        with _span(name, provider=provider):
+            yield timing
+    finally:
+        timing.duration = time.perf_counter() - start
+        _record_stage(timing)
+
+
+def observe_stage(name: str, provider: str, duration: float):
+    """Records a stage timed by the caller, e.g. across the yields of a stream."""
+    timing = StageTiming(name, provider)
+    timing.duration = duration
+    _record_stage(timing)
+
+
+def _record_stage(timing: StageTiming):
+    STAGE_DURATION.labels(stage=timing.name, provider=timing.provider).observe(timing.duration)
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.stages.append(timing)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_llm_input_tokens(provider: str, input_tokens: int, cached_tokens: int):
+    LLM_INPUT_TOKENS.labels(provider=provider, kind="cached").inc(cached_tokens)
+    LLM_INPUT_TOKENS.labels(provider=provider, kind="uncached").inc(input_tokens - cached_tokens)
@@ -0,0 +1 @@
+from app.utils.singleflight.single_flight import SingleFlight
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.utils.metrics.prometheus import SINGLE_FLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-progress call.
+
+    The first caller starts ``fn``, later callers await the same task. Callers
+    that give up leave the call running for the others, it is only cancelled
+    when the last one leaves. Results are shared, callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.flights: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self.flights.get(key)
+        if flight is None or flight.task.get_loop() is not asyncio.get_running_loop():
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+            SINGLE_FLIGHT_CALLS.labels(flight=self.name, role="leader").inc()
+        else:
+            SINGLE_FLIGHT_CALLS.labels(flight=self.name, role="joined").inc()
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller's cancellation does not cancel the call for everyone
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
@@ -1,3 +1,5 @@
+from app.utils.backplane import backplane
+
 from .ws_manager import ConnectionManager
 
-conversation_ws_manager = ConnectionManager()
+conversation_ws_manager = ConnectionManager(backplane)
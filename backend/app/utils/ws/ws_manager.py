@@ -1,28 +1,66 @@
 from typing import Dict
 
+from app.utils.backplane.base_backplane import Base_Backplane
+from app.utils.metrics import stage
 from fastapi import WebSocket
 from models.conversation.conversation import ConversationMessage
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[WebSocket, WebSocket] = {}
+    def __init__(self, backplane: Base_Backplane):
+        self.active_connections: Dict[str, WebSocket] = {}
+        self.backplane = backplane
+        self.subscribed = False
+
+    async def _ensure_subscribed(self):
+        if not self.subscribed:
+            self.subscribed = True
+            await self.backplane.subscribe(self._deliver)
 
     async def connect(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
+        await self._ensure_subscribed()
         self.active_connections[user_id] = websocket
+        await self.backplane.claim_connection(user_id)
 
-    def disconnect(self, user_id: str):
+    async def disconnect(self, user_id: str):
         if user_id in self.active_connections.keys():
             del self.active_connections[user_id]
+            await self.backplane.release_connection(user_id)
 
     async def send_personal_message(self, message: ConversationMessage, user_id: str):
         json_data = {
             "type": message.type.value,
             "data": message.data.model_dump(),
         }
-        await self.active_connections[user_id].send_json(json_data)
+        await self.send_json(json_data, user_id)
+
+    async def send_json(self, json_data: dict, user_id: str):
+        if user_id in self.active_connections:
+            with stage("ws_send", "local"):
+                await self.active_connections[user_id].send_json(json_data)
+            return
+
+        # The socket lives on another worker, relay the message to it
+        with stage("ws_send", self.backplane.backplane_name):
+            owner = await self.backplane.get_connection_owner(user_id)
+            if owner is None:
+                print(f"No connection found for {user_id}, dropping message")
+                return
+            await self.backplane.publish(owner, {"user_id": user_id, "data": json_data})
+
+    async def _deliver(self, envelope: dict):
+        if "text" in envelope:
+            for connection in list(self.active_connections.values()):
+                await connection.send_text(envelope["text"])
+            return
+
+        websocket = self.active_connections.get(envelope["user_id"])
+        if websocket is None:
+            print(f"Connection for {envelope['user_id']} is no longer on this worker")
+            return
+        await websocket.send_json(envelope["data"])
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
+        await self._ensure_subscribed()
+        await self.backplane.broadcast({"text": message})
@@ -0,0 +1,171 @@
+"""Redis backplane check against a local fakeredis server.
+
+Runs several RedisBackplane workers on one in-process fakeredis server and
+checks the turn locks, the connection ownership keys, the shared values and
+the message relay. It fails when two turns of one conversation overlap, a
+stale lock holder releases another turn's lock, a live connection expires,
+a shared value is not readable on another worker or outlives its TTL, or a
+relayed message is lost. Run from backend/:
+
+    python -m benchmarks.backplane --workers 4 --turns 200
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import fakeredis
+from app.utils.backplane.redis_backplane import RedisBackplane
+
+
+def create_workers(server: fakeredis.FakeServer, count: int, connection_ttl: int) -> list:
+    return [
+        RedisBackplane(
+            client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+            connection_ttl=connection_ttl,
+        )
+        for _ in range(count)
+    ]
+
+
+async def check_turn_locks(workers: list, turns: int, conversations: int) -> list:
+    failures = []
+    holders = {}
+    overlaps = 0
+
+    async def take_turn(i: int):
+        nonlocal overlaps
+        conversation_id = f"conversation-{i % conversations}"
+        worker = random.choice(workers)
+        # Retried like the client would retry a busy conversation, so every turn runs
+        while (token := await worker.acquire_turn_lock(conversation_id, ttl=10)) is None:
+            await asyncio.sleep(0.001)
+        if conversation_id in holders:
+            overlaps += 1
+        holders[conversation_id] = token
+        await asyncio.sleep(random.uniform(0, 0.005))
+        del holders[conversation_id]
+        await worker.release_turn_lock(conversation_id, token)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(take_turn(i) for i in range(turns)))
+    elapsed = time.perf_counter() - start
+    print(f"{turns} turns on {conversations} conversations took the lock in turn in {elapsed:.2f}s")
+    if overlaps:
+        failures.append(f"{overlaps} turns ran while another turn of the conversation held the lock")
+
+    # A turn that outlived its lock must not release the lock of the next turn,
+    # even when both ran on the same worker
+    worker = workers[0]
+    stale = await worker.acquire_turn_lock("expiring", ttl=0.1)
+    await asyncio.sleep(0.2)
+    current = await worker.acquire_turn_lock("expiring", ttl=10)
+    if stale is None or current is None:
+        failures.append("an expired turn lock could not be taken again")
+    else:
+        await worker.release_turn_lock("expiring", stale)
+        if await workers[-1].acquire_turn_lock("expiring", ttl=10) is not None:
+            failures.append("a stale token released the lock of a newer turn")
+        await worker.release_turn_lock("expiring", current)
+        if await workers[-1].acquire_turn_lock("expiring", ttl=10) is None:
+            failures.append("the lock was not released by its own token")
+    return failures
+
+
+async def check_connections(workers: list, connection_ttl: int) -> list:
+    failures = []
+    first, second = workers[0], workers[-1]
+    await first.claim_connection("listener")
+    # Longer than the TTL, the heartbeat has to keep the key alive
+    await asyncio.sleep(connection_ttl * 2.5)
+    owner = await second.get_connection_owner("listener")
+    print(f"Connection owner after {connection_ttl * 2.5:.1f}s idle: {owner}")
+    if owner != first.worker_id:
+        failures.append("a live connection expired")
+
+    # The user reconnects to another worker, the old one must not take it back
+    await second.claim_connection("listener")
+    await asyncio.sleep(connection_ttl / 2)
+    await first.release_connection("listener")
+    if await first.get_connection_owner("listener") != second.worker_id:
+        failures.append("releasing a moved connection removed its new owner")
+    if "listener" in first._connections:
+        failures.append("the old worker still refreshes a moved connection")
+    await second.release_connection("listener")
+    if await first.get_connection_owner("listener") is not None:
+        failures.append("a released connection still has an owner")
+    return failures
+
+
+async def check_shared(workers: list) -> list:
+    failures = []
+    first, second = workers[0], workers[-1]
+    await first.set_shared({"product:p1": "one", "product:p2": "two"}, ttl=0.5)
+    if await second.get_shared("product:p2") != "two":
+        failures.append("a shared value was not readable on another worker")
+    await asyncio.sleep(0.6)
+    if await second.get_shared("product:p1") is not None:
+        failures.append("a shared value outlived its TTL")
+    return failures
+
+
+async def check_relay(workers: list, messages: int) -> list:
+    failures = []
+    received = {worker.worker_id: [] for worker in workers}
+    for worker in workers:
+        async def handler(message, worker_id=worker.worker_id):
+            received[worker_id].append(message)
+
+        await worker.subscribe(handler)
+
+    start = time.perf_counter()
+    for i in range(messages):
+        sender, receiver = random.sample(workers, 2)
+        await sender.publish(receiver.worker_id, {"user_id": f"user-{i}", "seq": i})
+    await workers[0].broadcast({"text": "hello"})
+    expected = messages + len(workers)
+    deadline = time.monotonic() + 5
+    while sum(map(len, received.values())) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    delivered = sum(map(len, received.values()))
+    print(f"{delivered}/{expected} relayed messages delivered in {elapsed:.2f}s")
+    if delivered != expected:
+        failures.append(f"{expected - delivered} relayed messages were lost")
+    return failures
+
+
+async def run(args) -> int:
+    server = fakeredis.FakeServer()
+    workers = create_workers(server, args.workers, args.connection_ttl)
+    failures = []
+    failures += await check_turn_locks(workers, args.turns, args.conversations)
+    failures += await check_connections(workers, args.connection_ttl)
+    failures += await check_shared(workers)
+    failures += await check_relay(workers, args.messages)
+    for worker in workers:
+        await worker.close()
+
+    if failures:
+        print("\nBackplane problems:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nTurn locks, connection keys, shared values and the relay behaved")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="backplanes sharing the server")
+    parser.add_argument("--turns", type=int, default=200, help="turns competing for the locks")
+    parser.add_argument("--conversations", type=int, default=8, help="conversations the turns belong to")
+    parser.add_argument("--messages", type=int, default=200, help="messages relayed between workers")
+    parser.add_argument("--connection-ttl", type=int, default=1, help="seconds a connection key lives without a heartbeat")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Offline end-to-end benchmark of the /conversation/ws voice pipeline.
+
+Runs the real WebSocket route, tool loop, crawler and parsers against mock
+LLM/STT/TTS providers, an in-memory message store and a local HTTP server
+serving the saved search pages. Run from backend/:
+
+    python -m benchmarks.e2e --users 8 --turns 5
+    python -m benchmarks.e2e --users 8 --turns 5 --streamed   # chunked upload while speaking
+"""
+import argparse
+import base64
+import copy
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# The real clients are never called, they only need something to start with
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("AZURE_SPEECH_KEY", "offline-benchmark")
+os.environ.setdefault("AZURE_SPEECH_REGION", "eastus")
+
+import app.main
+from app.main import server
+from app.pipelines.conversation import query as query_pipeline
+from app.pipelines.conversation import search as search_pipeline
+from app.utils.metrics import add_turn_listener
+from benchmarks.mocks import (InMemory_Message_DB, Mock_LLM_Agent,
+                              Mock_STT_Agent, Mock_TTS_Agent)
+from crawler.catalog import ProductCatalog
+from crawler.crawler import EcommerceRecommender
+from crawler.fetcher import HttpFetcher, TieredFetcher
+from crawler.jobs.client import CrawlClient
+from crawler.jobs.local_broker import LocalBroker
+from crawler.jobs.worker import CrawlWorker
+from fastapi.testclient import TestClient
+
+FIXTURES = {
+    "/s": "amazon_results.html",
+    "/wholesale": "search_results.html",
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        fixture = FIXTURES.get(self.path.split("?")[0])
+        if fixture is None:
+            self.send_error(404)
+            return
+        with open(fixture, "rb") as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server() -> ThreadingHTTPServer:
+    fixture_server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=fixture_server.serve_forever, daemon=True).start()
+    return fixture_server
+
+
+class OfflineRecommender(EcommerceRecommender):
+    """Never launches a browser, pages that need one count as empty."""
+
+    async def _crawl_site(self, url, engine_config):
+        products = await self._fetch_over_http(url, engine_config)
+        return self._add_source(products, engine_config["name"])
+
+
+def local_search_engines(port: int) -> list:
+    engines = copy.deepcopy(EcommerceRecommender().search_engines)
+    for engine in engines:
+        path = "/s?k=" if engine["name"] == "Amazon" else "/wholesale?SearchText="
+        engine["url"] = f"http://127.0.0.1:{port}{path}"
+    return engines
+
+
+def install_mocks(args, port: int):
+    query_pipeline.stt_agent = Mock_STT_Agent(delay=args.stt_delay)
+    query_pipeline.tts_agent = Mock_TTS_Agent(delay=args.tts_delay)
+    query_pipeline.message_db = InMemory_Message_DB()
+    # The lifespan warm-up uses app.main's references
+    app.main.tts_agent = query_pipeline.tts_agent
+    app.main.message_db = query_pipeline.message_db
+    search_pipeline.llm_agent = Mock_LLM_Agent(delay=args.llm_delay)
+
+    # A catalog with no TTL never answers, so every search crawls
+    catalog = ProductCatalog(ttl=6 * 3600 if args.catalog else 0)
+    search_pipeline.product_catalog = catalog
+    broker = LocalBroker()
+    recommender_factory = partial(
+        OfflineRecommender,
+        search_engines=local_search_engines(port),
+        catalog=catalog,
+        fetcher=TieredFetcher(HttpFetcher()),
+    )
+    search_pipeline.crawl_client = CrawlClient(
+        broker, catalog, worker=CrawlWorker(broker, recommender_factory, concurrency=args.crawl_workers)
+    )
+
+
+def speech(seconds: float, sample_rate: int = 16000) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def audio_query(seconds: float, sample_rate: int = 16000) -> list:
+    samples = speech(seconds, sample_rate)
+    return [{"type": "query", "data": {"query": {str(i): float(sample) for i, sample in enumerate(samples)}}}]
+
+
+def streamed_query(seconds: float, trailing_silence: float, sample_rate: int = 16000, chunk: int = 1536) -> list:
+    """start, chunk and end messages, like the frontend sends them while the user speaks."""
+    samples = np.concatenate((speech(seconds, sample_rate), np.zeros(int(trailing_silence * sample_rate), np.float32)))
+    chunks = [samples[i:i + chunk] for i in range(0, len(samples), chunk)]
+    return (
+        [{"type": "query_start", "data": {"utterance_id": "bench", "sample_rate": sample_rate}}]
+        + [
+            {
+                "type": "query_chunk",
+                "data": {"utterance_id": "bench", "seq": seq, "audio": base64.b64encode(data.astype("<f4").tobytes()).decode()},
+            }
+            for seq, data in enumerate(chunks)
+        ]
+        + [{"type": "query_end", "data": {"utterance_id": "bench", "chunks": len(chunks)}}]
+    )
+
+
+def run_user(
+    client: TestClient, user_id: str, turns: int, messages: list, interval: float = 0.0
+) -> tuple[list, int]:
+    """Latency is measured from the last message, the ones before it are paced like live audio.
+
+    Returns the latencies to the first audio and to the final audio of each turn.
+    """
+    first_audio, latencies, shed = [], [], 0
+    with client.websocket_connect(f"/conversation/ws?user_id={user_id}") as websocket:
+        for _ in range(turns):
+            for message in messages[:-1]:
+                websocket.send_json(message)
+                time.sleep(interval)
+            start = time.perf_counter()
+            websocket.send_json(messages[-1])
+            first = None
+            while True:
+                reply = websocket.receive_json()
+                if reply["type"] == "busy":
+                    shed += 1
+                    break
+                if reply["type"] == "audio_response":
+                    # The end of a reply may carry no audio
+                    if first is None and reply["data"].get("base64_audio"):
+                        first = time.perf_counter() - start
+                        first_audio.append(first)
+                    # A streamed reply arrives one sentence at a time
+                    if reply["data"].get("final", True):
+                        latencies.append(time.perf_counter() - start)
+                        break
+    return (first_audio, latencies), shed
+
+
+def percentiles(values: list) -> dict:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "p50": p50, "p95": p95, "p99": p99}
+
+
+def run(args) -> dict:
+    # The pipeline writes each turn's audio here
+    os.makedirs("data/tts/output", exist_ok=True)
+    fixture_server = start_fixture_server()
+    install_mocks(args, fixture_server.server_port)
+
+    stage_durations = defaultdict(list)
+
+    def collect(trace):
+        stage_durations["turn"].append(trace.duration)
+        for timing in trace.stages:
+            name = f"{timing.name}[{timing.provider}]" if timing.provider else timing.name
+            stage_durations[name].append(timing.duration)
+
+    add_turn_listener(collect)
+
+    if args.streamed:
+        messages = streamed_query(args.audio_seconds, args.trailing_silence)
+        interval = 1536 / 16000
+    else:
+        messages, interval = audio_query(args.audio_seconds), 0.0
+    with TestClient(server) as client:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            results = list(
+                pool.map(
+                    lambda i: run_user(client, f"bench-{i}", args.turns, messages, interval),
+                    range(args.users),
+                )
+            )
+        elapsed = time.perf_counter() - start
+    fixture_server.shutdown()
+
+    first_audio = [latency for (user, _), _ in results for latency in user]
+    latencies = [latency for (_, user), _ in results for latency in user]
+    return {
+        "users": args.users,
+        "turns": len(latencies),
+        "shed": sum(shed for _, shed in results),
+        "elapsed": elapsed,
+        "turns_per_second": len(latencies) / elapsed,
+        "client_first_audio": percentiles(first_audio),
+        "client_latency": percentiles(latencies),
+        "stages": {name: percentiles(values) for name, values in sorted(stage_durations.items())},
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"\n{report['turns']} turns from {report['users']} users in {report['elapsed']:.2f}s "
+        f"({report['turns_per_second']:.2f} turns/s, {report['shed']} shed as busy)\n"
+    )
+    print(f"{'stage':<32}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [
+        ("client first audio", report["client_first_audio"]),
+        ("client round-trip", report["client_latency"]),
+    ] + list(report["stages"].items())
+    for name, stats in rows:
+        print(
+            f"{name:<32}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}"
+            f"{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=4, help="concurrent WebSocket users")
+    parser.add_argument("--turns", type=int, default=3, help="turns per user")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="seconds per mock LLM call")
+    parser.add_argument("--stt-delay", type=float, default=0.05, help="seconds per mock transcription")
+    parser.add_argument("--tts-delay", type=float, default=0.1, help="seconds per mock synthesis")
+    parser.add_argument("--audio-seconds", type=float, default=1.0, help="length of each spoken query")
+    parser.add_argument("--streamed", action="store_true", help="upload each query in chunks while it is spoken")
+    parser.add_argument("--trailing-silence", type=float, default=0.8, help="silence before a streamed query ends")
+    parser.add_argument("--catalog", action="store_true", help="answer repeated searches from the catalog")
+    parser.add_argument("--crawl-workers", type=int, default=4, help="crawl jobs run at once")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import List
+
+from app.genai.llm.base_agent import Base_LLM_Agent
+from app.genai.stt.base_agent import Base_STT_Agent
+from app.genai.tts.azure_agent import getAvatarViseme
+from app.genai.tts.base_agent import Base_TTS_Agent
+from models.conversation.conversation import AudioMessage
+from models.conversation.message import Message
+from models.genai.llm_stream import LLMStreamEvent, LLMStreamEventType
+from models.tts.viseme import Viseme, WordOffset
+
+DEFAULT_QUERIES = [
+    "wireless earbuds",
+    "mechanical keyboard",
+    "usb c charger",
+    "running shoes",
+    "coffee grinder",
+]
+
+
+def _function_call(name: str, arguments: dict) -> SimpleNamespace:
+    return SimpleNamespace(
+        type="function_call",
+        id=f"fc_{uuid.uuid4().hex[:12]}",
+        call_id=f"call_{uuid.uuid4().hex[:12]}",
+        name=name,
+        arguments=json.dumps(arguments),
+    )
+
+
+class Mock_LLM_Agent(Base_LLM_Agent):
+    """Scripted Responses API stand-in: one search_product call, then respond_customer."""
+
+    def __init__(self, delay: float = 0.3, token_delay: float = 0.01):
+        super().__init__("MockLLM", "assistant", "user")
+        self.delay = delay
+        self.token_delay = token_delay
+
+    def _script(self, message_history: list, tool_choice) -> List[SimpleNamespace]:
+        query = next(
+            item["content"]
+            for item in reversed(message_history)
+            if isinstance(item, dict) and item.get("role") == "user"
+        )
+        searched = any(
+            isinstance(item, dict) and item.get("type") == "function_call_output"
+            for item in message_history
+        )
+        if searched or tool_choice != "required":
+            reply = f"I found a few {query} for you. The first one has the best reviews."
+            return [_function_call("respond_customer", {"response": reply})]
+        return [_function_call("search_product", {"query": query, "sort_by": None})]
+
+    def _usage(self, message_history: list) -> SimpleNamespace:
+        input_tokens = sum(len(json.dumps(item, default=str)) for item in message_history) // 4
+        return SimpleNamespace(
+            input_tokens=input_tokens,
+            input_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+
+    def _generate_tool_call_response(self, message_history: list[dict], tools: list[dict], tool_choice="required"):
+        time.sleep(self.delay)
+        output = self._script(message_history, tool_choice)
+        self._report_prompt_cache(self._usage(message_history).input_tokens, 0)
+        return SimpleNamespace(output=output, output_text="")
+
+    async def _stream_tool_call_response(
+        self,
+        message_history: list[dict],
+        tools: list[dict],
+        tool_choice="required",
+        text_tool: str = None,
+        text_argument: str = "response",
+    ):
+        await asyncio.sleep(self.delay)
+        output = self._script(message_history, tool_choice)
+        for item in output:
+            if item.name == text_tool:
+                for word in json.loads(item.arguments)[text_argument].split(" "):
+                    await asyncio.sleep(self.token_delay)
+                    yield LLMStreamEvent(type=LLMStreamEventType.TEXT_DELTA, text=word + " ")
+            yield LLMStreamEvent(type=LLMStreamEventType.TOOL_CALL, tool_call=item)
+        response = SimpleNamespace(output=output, output_text="", usage=self._usage(message_history))
+        self._report_prompt_cache(response.usage.input_tokens, 0)
+        yield LLMStreamEvent(type=LLMStreamEventType.COMPLETED, response=response)
+
+    def _generate_normal_response(self, message_history: list[dict]) -> str:
+        time.sleep(self.delay)
+        return "OK"
+
+    def _embed(self, text: str) -> list[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [byte / 255 for byte in digest]
+
+
+class Mock_STT_Agent(Base_STT_Agent):
+    """Returns the scripted queries in turn, after a fixed delay."""
+
+    def __init__(self, queries: List[str] = None, delay: float = 0.05):
+        super().__init__("MockSTT")
+        self.client = True
+        self.delay = delay
+        self.queries = itertools.cycle(queries or DEFAULT_QUERIES)
+        self.lock = threading.Lock()
+
+    def _transcribe_audio(self, audio_file: str) -> str:
+        time.sleep(self.delay)
+        with self.lock:
+            return next(self.queries)
+
+
+class Mock_TTS_Agent(Base_TTS_Agent):
+    """Emits one viseme per character and one boundary per word, like Azure does."""
+
+    # Roughly what a 48 kbit/s mp3 weighs per character of speech
+    AUDIO_BYTES_PER_CHAR = 400
+
+    def __init__(self, delay: float = 0.1, char_duration: float = 60):
+        super().__init__("MockTTS")
+        self.client = True
+        self.delay = delay
+        self.char_duration = char_duration
+
+    def _tts(self, text: str, output_file: str, voice: str) -> AudioMessage:
+        time.sleep(self.delay)
+        visemes = [
+            Viseme(stopTime=(i + 1) * self.char_duration, readyPlayerMeViseme=getAvatarViseme(ord(char) % 22))
+            for i, char in enumerate(text)
+        ]
+        word_boundary = []
+        text_offset = 0
+        for word in text.split(" "):
+            word_boundary.append(
+                WordOffset(
+                    offset_duration=text_offset * self.char_duration * 10000,
+                    text_offset=text_offset,
+                    word_length=len(word),
+                )
+            )
+            text_offset += len(word) + 1
+        audio = bytes(len(text) * self.AUDIO_BYTES_PER_CHAR)
+        return AudioMessage(
+            base64_audio=base64.b64encode(audio).decode("utf-8"),
+            viseme=visemes,
+            word_boundary=word_boundary,
+        )
+
+
+class InMemory_Message_DB:
+    """Message_DB without CrateDB, for benchmarks."""
+
+    def __init__(self):
+        self.messages = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def ping(self):
+        pass
+
+    def insert_message(self, message: Message) -> bool:
+        with self.lock:
+            self.messages[message.conversation_id].append(message)
+        return True
+
+    def get_all_messages(self, conversation_id: str) -> List[Message]:
+        with self.lock:
+            return list(self.messages[conversation_id])
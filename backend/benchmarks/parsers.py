@@ -0,0 +1,242 @@
+"""Parser micro-benchmark and regression check over saved search pages.
+
+Runs the BeautifulSoup parsers and the _extract_text/_extract_attribute
+helpers over the fixture corpus in benchmarks/fixtures/corpus.json. It
+fails when an output differs from its golden file, or when parse time or
+peak memory regress past the thresholds. Run from backend/:
+
+    python -m benchmarks.parsers            # check against golden outputs and baseline
+    python -m benchmarks.parsers --update   # accept the current outputs and timings
+"""
+import argparse
+import contextlib
+import gc
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+from bs4 import BeautifulSoup
+from crawler.crawler import (EcommerceRecommender, _extract_attribute,
+                             _extract_text)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+CORPUS_PATH = os.path.join(FIXTURE_DIR, "corpus.json")
+BASELINE_PATH = os.path.join(FIXTURE_DIR, "baseline.json")
+GOLDEN_DIR = os.path.join(FIXTURE_DIR, "golden")
+
+# Selectors for the helper benchmark, covering a hit, a fallback and a miss
+TEXT_SELECTORS = ["h2", "h3", "span.a-price span.a-offscreen", "div.does-not-exist"]
+LINK_SELECTORS = ["h2 a", "a"]
+
+
+class Case:
+    def __init__(self, name: str, run: Callable[[], list]):
+        self.name = name
+        self.run = run
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _quiet(func: Callable[[], list]) -> Callable[[], list]:
+    """The parsers print progress, which would otherwise dominate the timings."""
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+
+    return run
+
+
+def load_cases(corpus: list, update: bool) -> tuple[List[Case], List[str]]:
+    recommender = EcommerceRecommender()
+    item_selectors = {engine["name"]: engine["item_selector"] for engine in recommender.search_engines}
+    parsers = {"Amazon": recommender._parse_amazon_bs, "AliExpress": recommender._parse_aliexpress_bs}
+
+    cases, failures = [], []
+    for fixture in corpus:
+        path = os.path.join(os.path.dirname(CORPUS_PATH), fixture["path"])
+        digest = _sha256(path)
+        if digest != fixture["sha256"]:
+            if not update:
+                failures.append(f"{fixture['name']}: fixture changed on disk, rerun with --update to accept it")
+                continue
+            fixture["sha256"] = digest
+        with open(path, "r", encoding="utf-8") as file:
+            html = file.read()
+
+        parser = parsers[fixture["engine"]]
+        base_url = fixture["base_url"]
+        cases.append(
+            Case(
+                f"parse:{fixture['name']}",
+                _quiet(lambda parser=parser, html=html, base_url=base_url: [
+                    product.to_dict() for product in parser(html, base_url)
+                ]),
+            )
+        )
+
+        items = BeautifulSoup(html, "html.parser").select(item_selectors[fixture["engine"]])
+        cases.append(
+            Case(
+                f"extract:{fixture['name']}",
+                lambda items=items, base_url=base_url: [
+                    [
+                        _extract_text(item, TEXT_SELECTORS),
+                        _extract_attribute(item, LINK_SELECTORS, "href", base_url),
+                    ]
+                    for item in items
+                ],
+            )
+        )
+    return cases, failures
+
+
+def measure(case: Case, repeat: int) -> dict:
+    output = case.run()  # warm-up, also the output checked against the golden file
+    timings = []
+    # Like timeit, keep collector pauses out of the measurement
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            case.run()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"output": output, "time_ms": min(timings) * 1000, "peak_kb": peak / 1024}
+
+
+def _golden_path(case: Case) -> str:
+    return os.path.join(GOLDEN_DIR, case.name.replace(":", "__") + ".json")
+
+
+def _describe_difference(expected: list, actual: list) -> str:
+    if len(expected) != len(actual):
+        return f"{len(actual)} results, golden has {len(expected)}"
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            if isinstance(want, dict):
+                fields = sorted(key for key in set(want) | set(got) if want.get(key) != got.get(key))
+                return f"result {index} differs in {', '.join(fields)}: {got} != {want}"
+            return f"result {index} differs: {got} != {want}"
+    return "outputs differ"
+
+
+def check(cases: List[Case], baseline: dict, args) -> tuple[dict, List[str]]:
+    results, failures = {}, []
+    print(f"{'case':<40}{'time ms':>10}{'base ms':>10}{'peak KB':>10}{'base KB':>10}")
+    for case in cases:
+        result = measure(case, args.repeat)
+        results[case.name] = result
+        base = baseline.get(case.name, {})
+        print(
+            f"{case.name:<40}{result['time_ms']:>10.2f}{base.get('time_ms', float('nan')):>10.2f}"
+            f"{result['peak_kb']:>10.0f}{base.get('peak_kb', float('nan')):>10.0f}"
+        )
+        if args.update:
+            continue
+
+        golden_path = _golden_path(case)
+        if not os.path.exists(golden_path):
+            failures.append(f"{case.name}: no golden output, rerun with --update")
+        else:
+            with open(golden_path, "r", encoding="utf-8") as file:
+                expected = json.load(file)
+            if expected != result["output"]:
+                failures.append(f"{case.name}: {_describe_difference(expected, result['output'])}")
+
+        # The absolute slack keeps sub-millisecond cases from failing on timer noise
+        allowed_ms = max(base.get("time_ms", 0) * (1 + args.time_threshold), base.get("time_ms", 0) + args.time_slack_ms)
+        if base and result["time_ms"] > allowed_ms:
+            failures.append(
+                f"{case.name}: {result['time_ms']:.2f} ms is more than {args.time_threshold:.0%} over the {base['time_ms']:.2f} ms baseline"
+            )
+        if base and result["peak_kb"] > base["peak_kb"] * (1 + args.memory_threshold):
+            failures.append(
+                f"{case.name}: {result['peak_kb']:.0f} KB peak is more than {args.memory_threshold:.0%} over the {base['peak_kb']:.0f} KB baseline"
+            )
+    return results, failures
+
+
+def write_update(corpus: list, results: dict):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for name, result in results.items():
+        with open(os.path.join(GOLDEN_DIR, name.replace(":", "__") + ".json"), "w", encoding="utf-8") as file:
+            json.dump(result["output"], file, indent=2, ensure_ascii=False)
+            file.write("\n")
+    with open(BASELINE_PATH, "w") as file:
+        baseline = {
+            name: {"time_ms": round(result["time_ms"], 3), "peak_kb": round(result["peak_kb"], 1)}
+            for name, result in results.items()
+        }
+        json.dump(baseline, file, indent=2)
+        file.write("\n")
+    with open(CORPUS_PATH, "w") as file:
+        json.dump(corpus, file, indent=2)
+        file.write("\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="rewrite golden outputs, baseline and fixture hashes")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case, the fastest is reported")
+    parser.add_argument(
+        "--time-threshold",
+        type=float,
+        default=float(os.getenv("PARSER_BENCH_TIME_THRESHOLD", "0.5")),
+        help="allowed slowdown over the baseline, as a fraction",
+    )
+    parser.add_argument(
+        "--time-slack-ms",
+        type=float,
+        default=float(os.getenv("PARSER_BENCH_TIME_SLACK_MS", "5")),
+        help="slowdown in milliseconds that is always allowed",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=float(os.getenv("PARSER_BENCH_MEMORY_THRESHOLD", "0.2")),
+        help="allowed peak memory growth over the baseline, as a fraction",
+    )
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, "r") as file:
+        corpus = json.load(file)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r") as file:
+            baseline = json.load(file)
+
+    cases, failures = load_cases(corpus, args.update)
+    results, check_failures = check(cases, baseline, args)
+    failures += check_failures
+
+    if args.update:
+        write_update(corpus, results)
+        print(f"\nUpdated golden outputs and baseline for {len(results)} cases")
+        return 0
+    if failures:
+        print("\nParser regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nAll {len(results)} parser cases match their golden outputs and baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
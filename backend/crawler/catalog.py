@@ -0,0 +1,186 @@
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from app.utils.lifecycle import LazySingleton
+from crawler.normalize import MISSING, normalize_title
+from crawler.product import SORT_KEYS, ProductBatch, ProductRecord
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _tokenize(text: str) -> List[str]:
+    # Crude plural folding so "cases" finds "case"
+    return [token.rstrip("s") if len(token) > 3 else token for token in normalize_title(text).split()]
+
+
+class ProductCatalog:
+    """Local index of crawled products, answering searches without a crawl.
+
+    Product names of the typed records go into an inverted index. For each sort
+    order the catalog keeps a presorted list of keys, rebuilt lazily after new
+    products arrive.
+
+    Records are kept in the order they were last indexed. Once there are more
+    than ``max_products``, or the oldest have outlived the TTL, the oldest go.
+    The file at ``path`` is append-only while running, and it is rewritten
+    with the live records on load or once it holds twice as many lines.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 6 * 3600,
+        min_results: int = 5,
+        path: Optional[str] = None,
+        max_products: int = 50000,
+    ):
+        self.ttl = ttl
+        self.min_results = min_results
+        self.path = path
+        self.max_products = max_products
+        self.records: Dict[str, ProductRecord] = {}
+        self.indexed_at: Dict[str, float] = {}
+        self.inverted_index: Dict[str, Set[str]] = defaultdict(set)
+        self.sorted_keys: Dict[str, List[str]] = {}
+        # Lines in the file at path, live or not
+        self.file_lines = 0
+
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _index(self, product: ProductRecord, indexed_at: float) -> None:
+        key = product.key
+        # Re-indexed products move to the back of the eviction order
+        self._unindex(key)
+        self.records[key] = product
+        self.indexed_at[key] = indexed_at
+        for token in _tokenize(product.product_name):
+            self.inverted_index[token].add(key)
+        self.sorted_keys.clear()
+
+    def _unindex(self, key: str) -> None:
+        product = self.records.pop(key, None)
+        if product is None:
+            return
+        del self.indexed_at[key]
+        for token in _tokenize(product.product_name):
+            postings = self.inverted_index.get(token)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del self.inverted_index[token]
+        self.sorted_keys.clear()
+
+    def _evict(self) -> None:
+        expired_before = time.time() - self.ttl
+        while self.records:
+            oldest = next(iter(self.records))
+            if len(self.records) <= self.max_products and self.indexed_at[oldest] > expired_before:
+                break
+            self._unindex(oldest)
+
+    def add_products(self, products: List[ProductRecord]) -> None:
+        indexed_at = time.time()
+        for product in products:
+            if product.product_name == MISSING:
+                continue
+            self._index(product, indexed_at)
+        self._evict()
+        if self.path:
+            self._append(products, indexed_at)
+            if self.file_lines > 2 * max(len(self.records), 1000):
+                self._compact()
+
+    def _sorted_keys(self, sort_by: str) -> List[str]:
+        if sort_by not in self.sorted_keys:
+            keys = list(self.records)
+            order = ProductBatch(self.records[key] for key in keys).order(sort_by)
+            self.sorted_keys[sort_by] = [keys[i] for i in order]
+        return self.sorted_keys[sort_by]
+
+    def search(
+        self, query: str, sort_by: Optional[str] = None, limit: int = 20
+    ) -> Optional[List[ProductRecord]]:
+        """Fresh products matching every query term, or None when a crawl is needed."""
+        tokens = _tokenize(query)
+        if not tokens:
+            return None
+        postings = sorted((self.inverted_index.get(token, set()) for token in tokens), key=len)
+        candidates = set.intersection(*postings)
+
+        fresh_after = time.time() - self.ttl
+        candidates = {key for key in candidates if self.indexed_at[key] > fresh_after}
+        if len(candidates) < self.min_results:
+            return None
+
+        if sort_by in SORT_KEYS:
+            # Walking the presorted index beats sorting once the match set is large
+            if len(candidates) * math.log2(len(candidates) + 1) < len(self.records):
+                keys = sorted(candidates)
+                order = ProductBatch(self.records[key] for key in keys).order(sort_by)
+                keys = [keys[i] for i in order]
+            else:
+                keys = [key for key in self._sorted_keys(sort_by) if key in candidates]
+        else:
+            keys = sorted(candidates, key=lambda key: (-self.indexed_at[key], key))
+
+        print(f"[Catalog] {len(candidates)} indexed products for {query}")
+        return [self.records[key] for key in keys[:limit]]
+
+    def _append(self, products: List[ProductRecord], indexed_at: float) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as file:
+                for product in products:
+                    file.write(json.dumps({"indexed_at": indexed_at, "product": product.to_dict()}) + "\n")
+                    self.file_lines += 1
+        except OSError as e:
+            print(f"Error persisting catalog to {self.path}: {e}")
+
+    def _compact(self) -> None:
+        """Rewrites the file with only the live records, in eviction order."""
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as file:
+                for key, product in self.records.items():
+                    entry = {"indexed_at": self.indexed_at[key], "product": product.to_dict()}
+                    file.write(json.dumps(entry) + "\n")
+            # Atomic, a crash leaves either the old file or the new one
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"Error compacting catalog at {self.path}: {e}")
+            return
+        print(f"[Catalog] Compacted {self.path} from {self.file_lines} to {len(self.records)} lines")
+        self.file_lines = len(self.records)
+
+    def _load(self, path: str) -> None:
+        expired_before = time.time() - self.ttl
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                self.file_lines += 1
+                try:
+                    entry = json.loads(line)
+                    if entry["indexed_at"] <= expired_before:
+                        continue
+                    self._index(ProductRecord.from_dict(entry["product"]), entry["indexed_at"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        self._evict()
+        print(f"[Catalog] Loaded {len(self.records)} products from {path}")
+        if self.file_lines > len(self.records):
+            self._compact()
+
+
+# Loading a persisted catalog can take a while, so it happens on first use
+product_catalog = LazySingleton(
+    lambda: ProductCatalog(
+        ttl=float(os.getenv("CATALOG_TTL", str(6 * 3600))),
+        min_results=int(os.getenv("CATALOG_MIN_RESULTS", "5")),
+        path=os.getenv("CATALOG_PATH"),
+        max_products=int(os.getenv("CATALOG_MAX_PRODUCTS", "50000")),
+    ),
+    "product_catalog",
+)
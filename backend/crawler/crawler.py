@@ -3,12 +3,18 @@ import json
 import os
 import re
 import traceback
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from urllib.parse import quote_plus, urljoin
 
+from app.utils.governor import Overloaded, Priority, governor
+from app.utils.metrics import stage
 from bs4 import BeautifulSoup, Tag
-from crawl4ai import (AsyncWebCrawler, BrowserConfig, CacheMode,
-                      CrawlerRunConfig)
+from crawler.catalog import ProductCatalog, product_catalog
+from crawler.engine_health import EngineHealthTracker, engine_health
+from crawler.fetcher import TieredFetcher, shows_no_results, tiered_fetcher
+from crawler.proxy_pool import NoProxyAvailable, ProxyLease, looks_blocked
+from crawler.product import ProductRecord, sort_products
+from crawler.resource_rules import ResourceBlockRules
 from dotenv import load_dotenv
 
 
@@ -62,8 +68,22 @@ def _extract_attribute(item_soup: Tag, selectors: List[str], attribute: str, bas
     return default
 
 class EcommerceRecommender:
-    def __init__(self, search_engines=None, captcha_key: Optional[str] = None):
+    def __init__(self, search_engines=None, captcha_key: Optional[str] = None, catalog: Optional[ProductCatalog] = None, fetcher: Optional[TieredFetcher] = None, health: Optional[EngineHealthTracker] = None):
         load_dotenv()
+        self.catalog = catalog if catalog is not None else product_catalog
+        self.fetcher = fetcher if fetcher is not None else tiered_fetcher
+        self.health = health if health is not None else engine_health
+        # Engines whose last page said the search had no matches, an empty result that is not their fault
+        self.empty_pages: set = set()
+        # Searched by background probes of an engine whose circuit is open
+        self.probe_query = os.getenv("CRAWL_PROBE_QUERY", "usb cable")
+        # Seconds a crawl may take before slow engines are dropped
+        self.latency_budget = float(os.getenv("CRAWL_LATENCY_BUDGET", "25"))
+        # Stop waiting for other engines once this many products were found, 0 waits for all.
+        # Above CRAWL_MAX_ITEMS, or a single engine's page would always be enough
+        self.enough_results = int(os.getenv("CRAWL_ENOUGH_RESULTS", "0"))
+        # Items parsed per results page, the ranking stage picks the few worth showing
+        self.max_items = int(os.getenv("CRAWL_MAX_ITEMS", "30"))
         # OpenAI client removed as we are focusing on BS4 parsing
         # self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
         # if not self.openai_api_key:
@@ -79,7 +99,20 @@ class EcommerceRecommender:
                 "config": {
                     "wait_for": "div.s-result-item[data-asin]",
                     "js": """ /* Optional scroll JS */ """
-                }
+                },
+                # Regexes that mark a captcha or robot check instead of results
+                "block_markers": [r"/errors/validateCaptcha", r"Type the characters you see in this image"],
+                # Regexes that mark a search without matches, an empty result that is not the engine's fault
+                "no_results_markers": [r"No results for\b", r"did not match any products"],
+                "block_resources": {
+                    "resource_types": ["stylesheet"],
+                    "url_patterns": [
+                        r"amazon-adsystem\.com",
+                        r"fls-[a-z]+\.amazon\.",
+                        r"unagi(-[a-z]+)?\.amazon\.",
+                        r"/(uedata|csm|rd/uedata)\b",
+                    ],
+                },
             },
             {
                 "name": "AliExpress",
@@ -90,14 +123,30 @@ class EcommerceRecommender:
                      # Wait for elements likely containing key info
                     "wait_for": "a.search-card-item div[class*='price'], a.search-card-item h3",
                     "js": """ /* Optional scroll JS */ """
-                }
+                },
+                "block_markers": [r"_____tmd_____/punish", r"baxia-punish"],
+                "no_results_markers": [r"couldn't find any (results|products)", r"[Nn]o matching results"],
+                "block_resources": {
+                    # Stylesheets stay, the result grid lazy-loads based on layout
+                    "url_patterns": [
+                        r"\.mmstat\.com",
+                        r"arms-retcode\.aliyuncs\.com",
+                        r"/aplus[^/]*\.js",
+                    ],
+                },
             }
         ]
+        # crawl4ai pulls in Playwright, so it is only imported once a crawl is set up
+        from crawl4ai import BrowserConfig, CacheMode, CrawlerRunConfig
+
         self.crawl_config = CrawlerRunConfig(
             cache_mode=CacheMode.BYPASS,
             verbose=True,
             magic=True, # Keep magic, might help clean up minor inconsistencies
-            simulate_user=True
+            simulate_user=True,
+            # Results are read from the DOM, no need to wait for the network to go idle
+            wait_until="domcontentloaded",
+            wait_for_images=False,
         )
 
         self.browser_config = BrowserConfig(
@@ -113,11 +162,11 @@ class EcommerceRecommender:
         """Generate search URLs for each search engine."""
         return [engine["url"] + quote_plus(query) for engine in self.search_engines]
 
-    def _parse_amazon_bs(self, html_content: str, base_url: str) -> list[dict]:
+    def _parse_amazon_bs(self, html_content: str, base_url: str) -> List[ProductRecord]:
         """Parses Amazon search results HTML using BeautifulSoup with robust selectors."""
         soup = BeautifulSoup(html_content, "html.parser")
         products = []
-        search_items = soup.select("div.s-result-item[data-asin]:not([data-asin=''])")[:10]
+        search_items = soup.select("div.s-result-item[data-asin]:not([data-asin=''])")[:self.max_items]
         print(f"[Amazon Parser] Found {len(search_items)} potential items using selector.")
 
         for item in search_items:
@@ -270,17 +319,17 @@ class EcommerceRecommender:
                 print(f"Error parsing Amazon item: {e} - ASIN: {item.get('data-asin', 'NO ASIN')}")
                 # print(traceback.format_exc()) # Keep commented unless debugging deeply
 
-        return products
+        return [ProductRecord.from_dict(product) for product in products]
     
-    def _parse_aliexpress_bs(self, html_content: str, base_url: str) -> list[dict]:
+    def _parse_aliexpress_bs(self, html_content: str, base_url: str) -> List[ProductRecord]:
         """Parses AliExpress search results HTML using BeautifulSoup."""
         soup = BeautifulSoup(html_content, "html.parser")
         products = []
-        search_items = soup.select("div.search-item-card-wrapper-gallery")[:10]
+        search_items = soup.select("div.search-item-card-wrapper-gallery")[:self.max_items]
         print(f"[AliExpress Parser] Found {len(search_items)} potential item wrappers using 'div.search-item-card-wrapper-gallery'.")
 
         if not search_items:
-             search_items = soup.select("a.search-card-item")[:10]
+             search_items = soup.select("a.search-card-item")[:self.max_items]
              print(f"[AliExpress Parser]: Found {len(search_items)} items using 'a.search-card-item'.")
 
         for item_wrapper in search_items:
@@ -430,9 +479,71 @@ class EcommerceRecommender:
                 print(f"Error parsing AliExpress item: {e}")
                 # print(traceback.format_exc())
 
+        return [ProductRecord.from_dict(product) for product in products]
+
+    def _parse_html(self, engine_name: str, html: str, base_url: str) -> List[ProductRecord]:
+        """Runs the site-specific BeautifulSoup parser for an engine, called in a worker thread."""
+        with stage("parse", engine_name):
+            return self._parse_engine_html(engine_name, html, base_url)
+
+    def _parse_engine_html(self, engine_name: str, html: str, base_url: str) -> List[ProductRecord]:
+        products = []
+        if engine_name == "Amazon":
+             # with open("amazon_results.html", "w", encoding="utf-8") as f:
+             #     f.write(html)
+            print(f"Parsing HTML using BeautifulSoup for {engine_name}...")
+            products = self._parse_amazon_bs(html, base_url)
+        elif engine_name == "AliExpress":
+             # with open("aliexpress_results.html", "w", encoding="utf-8") as f:
+             #     f.write(html)
+            print(f"Parsing HTML using BeautifulSoup for {engine_name}...")
+            products = self._parse_aliexpress_bs(html, base_url)
+        else:
+            print(f"Warning: No robust BeautifulSoup parser defined for engine: {engine_name}")
+
+        print(f"Parsed {len(products)} products for {engine_name}.")
         return products
 
-    async def _parse_site_html(self, crawler, url: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _fetch_over_http(self, url: str, config: Dict[str, Any]) -> List[ProductRecord]:
+        """Parses the plain HTTP response when it already contains the result items."""
+        engine_name = config["name"]
+        if not self.fetcher.use_http(engine_name):
+            return []
+        print(f"\n--- Fetching HTML over HTTP for {engine_name} ---")
+        with stage("http_fetch", engine_name):
+            html = await self.fetcher.fetch_http(
+                engine_name,
+                url,
+                config.get("item_selector", "body"),
+                config.get("block_markers", ()),
+                config.get("no_results_markers", ()),
+            )
+        if html is None:
+            return []
+        # BeautifulSoup takes most of a second on a results page, off the loop it does not stall other turns
+        products = await asyncio.to_thread(self._parse_html, engine_name, html, config.get("base_url", url))
+        if not products:
+            await self._check_empty_page(config, 200, html)
+        # A search without matches was still answered over HTTP
+        self.fetcher.record(engine_name, http_ok=len(products) > 0 or engine_name in self.empty_pages)
+        return products
+
+    async def _check_empty_page(self, config: Dict[str, Any], status_code: Optional[int], html: Optional[str]) -> None:
+        """Tells apart a search without matches from a block page, a changed layout or a broken parser."""
+        engine_name = config["name"]
+        if not html or looks_blocked(status_code, html, config.get("block_markers", ())):
+            self.empty_pages.discard(engine_name)
+        elif shows_no_results(html, config.get("no_results_markers", ())):
+            print(f"{engine_name} has no matches for this search")
+            self.empty_pages.add(engine_name)
+        elif await asyncio.to_thread(self.fetcher.has_items, html, config.get("item_selector", "body")):
+            print(f"The {engine_name} parser found no products on a page with result items")
+            self.empty_pages.discard(engine_name)
+        else:
+            print(f"No result items on the page of {engine_name}, its layout may have changed")
+            self.empty_pages.discard(engine_name)
+
+    async def _parse_site_html(self, crawler, url: str, config: Dict[str, Any], lease: Optional[ProxyLease] = None) -> List[ProductRecord]:
         """Fetches HTML using the crawler and parses it using site-specific BS logic."""
         products = []
         engine_name = config["name"]
@@ -444,34 +555,29 @@ class EcommerceRecommender:
             print(f"\n--- Fetching HTML for {engine_name} ---")
             print(f"URL: {url}")
 
-            result = await crawler.arun(
-                url=url,
-                js_code=config["config"].get("js", ""),
-                wait_for=wait_for_selector, # Use the potentially more specific wait_for
-                wait_timeout=60000,
-                bypass_cache=self.crawl_config.cache_mode == CacheMode.BYPASS,
-                magic=self.crawl_config.magic,
-                simulate_user=self.crawl_config.simulate_user
+            run_config = self.crawl_config.clone(
+                js_code=config["config"].get("js", "").strip() or None,
+                wait_for=f"css:{wait_for_selector}", # Use the potentially more specific wait_for
+                # Follows the engine's recent latency, a stuck engine fails fast
+                page_timeout=int(self.health.page_timeout(engine_name) * 1000),
             )
+            if lease is not None and lease.proxy is not None:
+                from crawl4ai import ProxyConfig
+
+                # Set on the run, crawl4ai applies it to the page's browser context with its credentials
+                run_config = run_config.clone(
+                    proxy_config=ProxyConfig(lease.proxy.server, lease.proxy.username, lease.proxy.password)
+                )
+            result = await crawler.arun(url=url, config=run_config)
+            if lease is not None:
+                blocked = bool(result) and looks_blocked(result.status_code, result.html, config.get("block_markers", ()))
+                lease.record(ok=bool(result and result.html), blocked=blocked)
 
             if result and result.html:
                 print(f"Successfully fetched HTML for {engine_name} (Length: {len(result.html)}).")
-                # --- Site-Specific Parsing ---
-                if engine_name == "Amazon":
-                     # with open("amazon_results.html", "w", encoding="utf-8") as f:
-                     #     f.write(result.html)
-                    print(f"Parsing HTML using BeautifulSoup for {engine_name}...")
-                    products = self._parse_amazon_bs(result.html, base_url)
-                elif engine_name == "AliExpress":
-                     # with open("aliexpress_results.html", "w", encoding="utf-8") as f:
-                     #     f.write(result.html)
-                    print(f"Parsing HTML using BeautifulSoup for {engine_name}...")
-                    products = self._parse_aliexpress_bs(result.html, base_url)
-                else:
-                    print(f"Warning: No robust BeautifulSoup parser defined for engine: {engine_name}")
-
-                print(f"Parsed {len(products)} products for {engine_name}.")
-
+                products = await asyncio.to_thread(self._parse_html, engine_name, result.html, base_url)
+                if not products:
+                    await self._check_empty_page(config, result.status_code, result.html)
             elif result and not result.html:
                  print(f"Crawler ran for {engine_name} but returned no HTML content.")
             else:
@@ -479,66 +585,143 @@ class EcommerceRecommender:
 
         except asyncio.TimeoutError:
             print(f"Error: Timeout occurred during crawl for {engine_name} at {url}")
+            if lease is not None:
+                lease.record(ok=False)
         except Exception as e:
+            if lease is not None:
+                lease.record(ok=False)
             print(f"Error during HTML fetching or parsing for {engine_name}: {str(e)}")
             print(traceback.format_exc())
 
         print(f"--- Finished processing for {engine_name}, returning {len(products)} products ---")
         return products
 
-    async def crawl_site(self, url: str, engine_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def crawl_site(self, url: str, engine_config: Dict[str, Any], probe: bool = False) -> List[ProductRecord]:
         """Crawls a single site and extracts products using BeautifulSoup."""
         engine_name = engine_config["name"]
+        if not probe and not self.health.allow(engine_name):
+            print(f"Skipping {engine_name}, its circuit is open")
+            return []
+        self.empty_pages.discard(engine_name)
         try:
-            async with AsyncWebCrawler(
+            with stage("crawl", engine_name):
+                products = await self._crawl_site(url, engine_config)
+        except (Overloaded, NoProxyAvailable) as e:
+            # Our own load, says nothing about the engine's health
+            print(f"Skipping crawl for {engine_name}: {e}")
+            return []
+        except Exception:
+            if not probe:
+                self.health.record(engine_name, ok=False, probe=lambda: self._probe(engine_config))
+            raise
+        if not probe:
+            # An empty result is only fine when the engine said the search had no matches
+            ok = bool(products) or engine_name in self.empty_pages
+            self.health.record(engine_name, ok=ok, probe=lambda: self._probe(engine_config))
+        return products
+
+    async def _probe(self, engine_config: Dict[str, Any]) -> bool:
+        # Started from a turn, but must not inherit its priority or deadline
+        with governor.scope(Priority.BACKGROUND, self.health.max_timeout * 2):
+            url = engine_config["url"] + quote_plus(self.probe_query)
+            return bool(await self.crawl_site(url, engine_config, probe=True))
+
+    async def _crawl_site(self, url: str, engine_config: Dict[str, Any]) -> List[ProductRecord]:
+        from crawl4ai import AsyncWebCrawler
+
+        engine_name = engine_config["name"]
+        products = await self._fetch_over_http(url, engine_config)
+        if products or engine_name in self.empty_pages:
+            return self._add_source(products, engine_name)
+
+        try:
+            # Each crawl is a Chromium instance, the governor caps how many run at once
+            async with self.fetcher.proxies.lease(engine_name) as lease, governor.limit("browser"), AsyncWebCrawler(
                 verbose=True, # Keep verbose for debugging
                 proxy=self.browser_config.proxy,
                 config=self.browser_config
             ) as crawler:
-                products = await self._parse_site_html(crawler, url, engine_config)
+                block_rules = ResourceBlockRules.for_engine(engine_config.get("block_resources"))
+                crawler.crawler_strategy.set_hook("on_page_context_created", block_rules.hook)
+                with stage("browser_fetch", engine_name) as timing:
+                    products = await self._parse_site_html(crawler, url, engine_config, lease)
+                if products:
+                    self.health.record_latency(engine_name, timing.duration)
+                print(f"Blocked {block_rules.blocked_requests} of {block_rules.blocked_requests + block_rules.allowed_requests} requests for {engine_name}")
                 if products:
                     return self._add_source(products, engine_name)
                 else:
                     print(f"No products extracted via parsing for {engine_name}")
                     return []
+        except (Overloaded, NoProxyAvailable):
+            raise
         except Exception as e:
             print(f"Failed to initialize or run crawler for {engine_name}: {str(e)}")
             print(traceback.format_exc())
             return []
 
-    # --- crawl_for_products and _add_source remain the same ---
-    async def crawl_for_products(self, query: str) -> List[Dict[str, Any]]:
+    async def stream_products(
+        self,
+        query: str,
+        latency_budget: Optional[float] = None,
+        enough_results: Optional[int] = None,
+    ) -> AsyncIterator[List[ProductRecord]]:
+        """Yields each engine's products as soon as that engine finishes.
+
+        Engines still running when the latency budget runs out, or once enough
+        products were yielded, are cancelled.
+        """
+        latency_budget = self.latency_budget if latency_budget is None else latency_budget
+        enough_results = self.enough_results if enough_results is None else enough_results
+        search_urls = self.generate_search_urls(query)
+        pending = {
+            asyncio.create_task(self.crawl_site(url, self.search_engines[i]))
+            for i, url in enumerate(search_urls)
+        }
+        deadline = asyncio.get_running_loop().time() + latency_budget
+        found = 0
+        try:
+            while pending:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    print(f"Latency budget of {latency_budget}s used up, cancelling {len(pending)} engine(s)")
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        print(f"Error occurred in a crawl task: {task.exception()}")
+                        continue
+                    products = task.result()
+                    if products:
+                        found += len(products)
+                        self.catalog.add_products(products)
+                        yield products
+                if enough_results and found >= enough_results:
+                    if pending:
+                        print(f"Found {found} products, cancelling {len(pending)} slower engine(s)")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def crawl_for_products(self, query: str, sort_by: Optional[str] = None) -> List[ProductRecord]:
         print(f"Crawling for products: {query}")
         """Crawl all configured e-commerce sites for products matching the query."""
-        search_urls = self.generate_search_urls(query)
         all_products = []
-        tasks = []
-
-        for i, url in enumerate(search_urls):
-            engine_config = self.search_engines[i]
-            task = asyncio.create_task(self.crawl_site(url, engine_config))
-            tasks.append(task)
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for result in results:
-            if isinstance(result, Exception):
-                print(f"Error occurred in a crawl task: {result}")
-                # print(traceback.format_exc()) # Uncomment for full traceback
-            elif isinstance(result, list):
-                all_products.extend(result)
-            else:
-                print(f"Warning: Unexpected result type from gather: {type(result)}")
+        async for products in self.stream_products(query):
+            all_products.extend(products)
 
         print(f"\nTotal products found across all sites: {len(all_products)}")
-        return all_products
+        return sort_products(all_products, sort_by)
 
-    def _add_source(self, products: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    def _add_source(self, products: List[ProductRecord], source: str) -> List[ProductRecord]:
         """Add source information to products."""
         if isinstance(products, list):
             for product in products:
-                if isinstance(product, dict):
-                    product['source'] = source
+                if isinstance(product, ProductRecord):
+                    product.source = source
         return products
 
 # --- main function remains the same ---
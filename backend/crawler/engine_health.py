@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.utils.metrics.prometheus import (CRAWL_ENGINE_LATENCY,
+                                          CRAWL_ENGINE_OPEN,
+                                          CRAWL_ENGINE_PROBES,
+                                          CRAWL_ENGINE_SKIPPED,
+                                          CRAWL_ENGINE_TIMEOUT)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class EngineHealth:
+    def __init__(self, window: int):
+        self.durations: deque = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probe_interval = 0.0
+        self.probe_task: Optional[asyncio.Task] = None
+
+
+class EngineHealthTracker:
+    """Adaptive browser timeouts and a circuit breaker per search engine.
+
+    The page timeout follows the p95 of recent successful fetches, times
+    ``timeout_multiplier`` and clamped to ``[min_timeout, max_timeout]``.
+    After ``failure_threshold`` crawls in a row that failed or parsed nothing,
+    searches skip the engine and a background probe checks it again, backing
+    off from ``probe_interval`` up to ``max_probe_interval``.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 60,
+        min_timeout: float = 10,
+        max_timeout: float = 60,
+        timeout_multiplier: float = 2,
+        min_samples: int = 5,
+        window: int = 50,
+        failure_threshold: int = 3,
+        probe_interval: float = 60,
+        max_probe_interval: float = 900,
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.engines: Dict[str, EngineHealth] = {}
+
+    def _health(self, engine_name: str) -> EngineHealth:
+        if engine_name not in self.engines:
+            self.engines[engine_name] = EngineHealth(self.window)
+        return self.engines[engine_name]
+
+    def page_timeout(self, engine_name: str) -> float:
+        """Seconds a browser fetch of this engine may take."""
+        health = self._health(engine_name)
+        if len(health.durations) < self.min_samples:
+            timeout = self.default_timeout
+        else:
+            ordered = sorted(health.durations)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            timeout = min(max(p95 * self.timeout_multiplier, self.min_timeout), self.max_timeout)
+        CRAWL_ENGINE_TIMEOUT.labels(engine=engine_name).set(timeout)
+        return timeout
+
+    def is_open(self, engine_name: str) -> bool:
+        return self._health(engine_name).open_until > time.time()
+
+    def allow(self, engine_name: str) -> bool:
+        if self.is_open(engine_name):
+            CRAWL_ENGINE_SKIPPED.labels(engine=engine_name).inc()
+            return False
+        return True
+
+    def record_latency(self, engine_name: str, duration: float) -> None:
+        """A browser fetch that returned products, the input for the adaptive timeout."""
+        health = self._health(engine_name)
+        health.durations.append(duration)
+        health.ewma = duration if health.ewma is None else 0.8 * health.ewma + 0.2 * duration
+        CRAWL_ENGINE_LATENCY.labels(engine=engine_name).set(health.ewma)
+
+    def record(self, engine_name: str, ok: bool, probe: Optional[Callable[[], Awaitable[bool]]] = None) -> None:
+        """Outcome of one crawl. ``probe`` re-checks the engine while its circuit is open."""
+        health = self._health(engine_name)
+        if ok:
+            if health.open_until:
+                print(f"[Engine health] {engine_name} recovered, closing its circuit")
+            health.consecutive_failures = 0
+            health.open_until = 0.0
+            health.probe_interval = 0.0
+            CRAWL_ENGINE_OPEN.labels(engine=engine_name).set(0)
+            return
+
+        health.consecutive_failures += 1
+        if health.consecutive_failures < self.failure_threshold or self.is_open(engine_name):
+            return
+        health.probe_interval = min(max(health.probe_interval * 2, self.probe_interval), self.max_probe_interval)
+        # With a probe it stays open until the probe succeeds, so searches never
+        # pay for the retry. Without one the next search after the interval retries
+        health.open_until = time.time() + (self.max_probe_interval * 4 if probe else health.probe_interval)
+        CRAWL_ENGINE_OPEN.labels(engine=engine_name).set(1)
+        print(
+            f"[Engine health] {engine_name} failed {health.consecutive_failures} times in a row, "
+            f"skipping it and probing in {health.probe_interval:.0f}s"
+        )
+        if probe is not None and (health.probe_task is None or health.probe_task.done()):
+            health.probe_task = asyncio.get_running_loop().create_task(self._probe(engine_name, probe))
+
+    async def _probe(self, engine_name: str, probe: Callable[[], Awaitable[bool]]) -> None:
+        health = self._health(engine_name)
+        while self.is_open(engine_name):
+            await asyncio.sleep(health.probe_interval)
+            try:
+                ok = await probe()
+            except Exception as e:
+                print(f"[Engine health] Probe of {engine_name} failed: {e}")
+                ok = False
+            CRAWL_ENGINE_PROBES.labels(engine=engine_name, result="ok" if ok else "failed").inc()
+            if ok:
+                self.record(engine_name, ok=True)
+                return
+            health.probe_interval = min(health.probe_interval * 2, self.max_probe_interval)
+            print(f"[Engine health] {engine_name} still failing, next probe in {health.probe_interval:.0f}s")
+
+
+engine_health = EngineHealthTracker(
+    default_timeout=float(os.getenv("CRAWL_PAGE_TIMEOUT", "60")),
+    min_timeout=float(os.getenv("CRAWL_MIN_PAGE_TIMEOUT", "10")),
+    max_timeout=float(os.getenv("CRAWL_MAX_PAGE_TIMEOUT", "60")),
+    failure_threshold=int(os.getenv("CRAWL_ENGINE_FAILURES", "3")),
+    probe_interval=float(os.getenv("CRAWL_PROBE_INTERVAL", "60")),
+)
@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import os
+import re
+import time
+from typing import Dict, Optional, Sequence
+
+import httpx
+from crawler.proxy_pool import ProxyPool, looks_blocked, proxy_pool
+from dotenv import load_dotenv
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+load_dotenv()
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+class HttpFetcher:
+    """Shared keep-alive HTTP/2 clients for pages whose HTML is rendered server-side.
+
+    There is one client per proxy, httpx binds the proxy to the client.
+    """
+
+    def __init__(self, timeout: float = 10.0, max_connections: int = 20):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.clients: Dict[Optional[str], httpx.AsyncClient] = {}
+
+    def _get_client(self, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        client = self.clients.get(proxy)
+        if client is None or client.is_closed:
+            # httpx negotiates gzip/deflate/br compression on its own
+            client = httpx.AsyncClient(
+                http2=True,
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                timeout=self.timeout,
+                proxy=proxy,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60,
+                ),
+            )
+            self.clients[proxy] = client
+        return client
+
+    async def get(self, url: str, proxy: Optional[str] = None) -> Optional[httpx.Response]:
+        try:
+            return await self._get_client(proxy).get(url)
+        except httpx.HTTPError as e:
+            print(f"HTTP fetch failed for {url}: {e}")
+            return None
+
+    async def fetch(self, url: str, proxy: Optional[str] = None) -> Optional[str]:
+        response = await self.get(url, proxy)
+        if response is None:
+            return None
+        if response.status_code != 200:
+            print(f"HTTP fetch for {url} returned status {response.status_code}")
+            return None
+        return response.text
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+
+class EngineFetchStats:
+    def __init__(self):
+        self.http_successes = 0
+        self.consecutive_http_failures = 0
+        self.browser_until = 0.0
+
+
+def shows_no_results(html: Optional[str], markers: Sequence[str] = ()) -> bool:
+    """Whether a page is the engine's answer to a search without matches."""
+    return bool(html) and any(re.search(marker, html) for marker in markers)
+
+
+@functools.lru_cache(maxsize=64)
+def _css_selector(selector: str) -> CSSSelector:
+    return CSSSelector(selector, translator="html")
+
+
+class TieredFetcher:
+    """Decides per engine whether a plain HTTP fetch is enough or a browser is needed.
+
+    An engine starts on the HTTP path. After ``failure_threshold`` HTTP fetches
+    in a row without result items it goes to the browser for ``browser_ttl``
+    seconds, after which HTTP is probed again.
+    """
+
+    def __init__(self, http_fetcher: HttpFetcher, failure_threshold: int = 2, browser_ttl: float = 1800, proxies: Optional[ProxyPool] = None):
+        self.http_fetcher = http_fetcher
+        self.proxies = proxies if proxies is not None else ProxyPool()
+        self.failure_threshold = failure_threshold
+        self.browser_ttl = browser_ttl
+        self.stats: Dict[str, EngineFetchStats] = {}
+
+    def _stats(self, engine_name: str) -> EngineFetchStats:
+        if engine_name not in self.stats:
+            self.stats[engine_name] = EngineFetchStats()
+        return self.stats[engine_name]
+
+    def use_http(self, engine_name: str) -> bool:
+        return time.time() >= self._stats(engine_name).browser_until
+
+    def record(self, engine_name: str, http_ok: bool) -> None:
+        stats = self._stats(engine_name)
+        if http_ok:
+            stats.http_successes += 1
+            stats.consecutive_http_failures = 0
+            return
+        stats.consecutive_http_failures += 1
+        if stats.consecutive_http_failures >= self.failure_threshold:
+            print(f"[Fetcher] {engine_name} needs a browser, skipping HTTP for {self.browser_ttl}s")
+            stats.browser_until = time.time() + self.browser_ttl
+            stats.consecutive_http_failures = 0
+
+    def has_items(self, html: str, item_selector: str) -> bool:
+        # A bare lxml tree is several times cheaper than the soup the parser builds next
+        try:
+            return bool(_css_selector(item_selector)(lxml_html.document_fromstring(html)))
+        except (etree.ParserError, ValueError):
+            return False
+
+    async def fetch_http(
+        self,
+        engine_name: str,
+        url: str,
+        item_selector: str,
+        block_markers: Sequence[str] = (),
+        no_results_markers: Sequence[str] = (),
+    ) -> Optional[str]:
+        """The raw HTML if it contains result items or says there are none, otherwise None."""
+        async with self.proxies.lease(engine_name) as lease:
+            response = await self.http_fetcher.get(url, lease.proxy.url if lease.proxy else None)
+            if response is None:
+                lease.record(ok=False)
+                html = None
+            else:
+                html = response.text if response.status_code == 200 else None
+                blocked = looks_blocked(response.status_code, response.text, block_markers)
+                lease.record(ok=html is not None, blocked=blocked)
+                if response.status_code != 200:
+                    print(f"HTTP fetch for {url} returned status {response.status_code}")
+        if html and await asyncio.to_thread(self.has_items, html, item_selector):
+            return html
+        if shows_no_results(html, no_results_markers):
+            # A complete answer, a browser would not find anything either
+            return html
+        print(f"[Fetcher] No result items in the HTTP response for {engine_name}")
+        self.record(engine_name, http_ok=False)
+        return None
+
+
+tiered_fetcher = TieredFetcher(
+    HttpFetcher(timeout=float(os.getenv("HTTP_FETCH_TIMEOUT", "10"))),
+    browser_ttl=float(os.getenv("HTTP_FETCH_BROWSER_TTL", "1800")),
+    proxies=proxy_pool,
+)
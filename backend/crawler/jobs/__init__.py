@@ -0,0 +1,39 @@
+import os
+
+from app.utils.lifecycle import LazySingleton
+from crawler.jobs.base_broker import Base_Crawl_Broker
+from crawler.jobs.job import CrawlJob, CrawlJobFailed
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def create_broker() -> Base_Crawl_Broker:
+    url = os.getenv("CRAWL_BROKER_URL")
+    if url:
+        from crawler.jobs.redis_broker import RedisBroker
+
+        return RedisBroker(url=url)
+    from crawler.jobs.local_broker import LocalBroker
+
+    return LocalBroker()
+
+
+def _create_crawl_client():
+    from crawler.catalog import product_catalog
+    from crawler.jobs.client import CrawlClient
+    from crawler.jobs.worker import CrawlWorker
+
+    broker = create_broker()
+    # Without a broker URL the crawls run in this process, otherwise in
+    # separate `python -m crawler.worker` processes
+    worker = None if broker.remote else CrawlWorker(broker, concurrency=int(os.getenv("CRAWL_WORKERS", "4")))
+    return CrawlClient(
+        broker,
+        product_catalog,
+        worker=worker,
+        job_timeout=float(os.getenv("CRAWL_JOB_TIMEOUT", "60")),
+    )
+
+
+crawl_client = LazySingleton(_create_crawl_client, "crawl_client")
@@ -0,0 +1,45 @@
+from typing import AsyncIterator, List, Optional
+
+from crawler.jobs.job import CrawlJob
+from crawler.product import ProductRecord
+
+
+class Base_Crawl_Broker:
+    """Job queue between the turns asking for crawls and the crawl workers.
+
+    Identical queries in flight share one job. Workers take the job with the
+    best priority first, publish each engine's products as they arrive and
+    finish the job. A job is cancelled once every requester released it.
+    """
+
+    def __init__(self, broker_name: str, remote: bool):
+        self.broker_name = broker_name
+        # Workers in another process fill their own catalog, not the requester's
+        self.remote = remote
+
+    async def submit(self, job: CrawlJob) -> str:
+        """Queues ``job``, or joins an identical one in flight. Returns the id to read results from."""
+        raise NotImplementedError("Subclasses must implement submit")
+
+    def results(self, job_id: str, deadline: Optional[float] = None) -> AsyncIterator[List[ProductRecord]]:
+        """Every product batch of the job, from the first, until it finishes or ``deadline`` passes."""
+        raise NotImplementedError("Subclasses must implement results")
+
+    async def release(self, job_id: str) -> None:
+        raise NotImplementedError("Subclasses must implement release")
+
+    async def next_job(self) -> CrawlJob:
+        raise NotImplementedError("Subclasses must implement next_job")
+
+    async def publish(self, job: CrawlJob, products: List[ProductRecord]) -> None:
+        raise NotImplementedError("Subclasses must implement publish")
+
+    async def finish(self, job: CrawlJob, error: Optional[str] = None) -> None:
+        raise NotImplementedError("Subclasses must implement finish")
+
+    async def wait_cancelled(self, job: CrawlJob) -> None:
+        """Returns once nobody waits for the job's results anymore."""
+        raise NotImplementedError("Subclasses must implement wait_cancelled")
+
+    async def close(self) -> None:
+        pass
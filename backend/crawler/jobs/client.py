@@ -0,0 +1,75 @@
+import time
+from typing import AsyncIterator, List, Optional
+
+from app.utils.governor import governor
+from app.utils.metrics import current_turn, stage
+from app.utils.singleflight import SingleFlight
+from crawler.catalog import ProductCatalog
+from crawler.jobs.base_broker import Base_Crawl_Broker
+from crawler.jobs.job import CrawlJob
+from crawler.jobs.worker import CrawlWorker
+from crawler.normalize import normalize_title
+from crawler.product import ProductRecord, sort_products
+
+
+class CrawlClient:
+    """Submits searches to the crawl workers and streams their products back.
+
+    Takes the place of an EcommerceRecommender for the conversation pipeline.
+    ``worker`` is a CrawlWorker to run in this process, for the local broker.
+    """
+
+    def __init__(
+        self,
+        broker: Base_Crawl_Broker,
+        catalog: ProductCatalog,
+        worker: Optional[CrawlWorker] = None,
+        job_timeout: float = 60,
+    ):
+        self.broker = broker
+        self.catalog = catalog
+        self.worker = worker
+        self.job_timeout = job_timeout
+        self.flight = SingleFlight("crawl")
+
+    def _job(self, query: str) -> CrawlJob:
+        # Priority and deadline come from the turn's governor scope
+        remaining = governor.remaining()
+        timeout = self.job_timeout if remaining is None else min(self.job_timeout, max(remaining, 0))
+        return CrawlJob(
+            query, priority=governor.priority(), deadline=time.time() + timeout, trace=current_turn()
+        )
+
+    async def stream_products(self, query: str) -> AsyncIterator[List[ProductRecord]]:
+        if self.worker is not None:
+            self.worker.start()
+        job = self._job(query)
+        job_id = await self.broker.submit(job)
+        try:
+            async for products in self.broker.results(job_id, deadline=job.deadline):
+                if self.broker.remote:
+                    self.catalog.add_products(products)
+                yield products
+        finally:
+            await self.broker.release(job_id)
+
+    async def _collect(self, query: str) -> List[ProductRecord]:
+        print(f"Crawling for products: {query}")
+        all_products = []
+        async for products in self.stream_products(query):
+            all_products.extend(products)
+        print(f"\nTotal products found across all sites: {len(all_products)}")
+        return all_products
+
+    async def crawl_for_products(self, query: str, sort_by: Optional[str] = None) -> List[ProductRecord]:
+        # Keyed by priority too, so a voice turn still reaches the broker and upgrades a queued guess
+        key = (normalize_title(query), governor.priority())
+        # Timed on every requester, joined or remote crawls leave no engine stages in its turn
+        with stage("crawl_job", self.broker.broker_name):
+            products = await self.flight.do(key, lambda: self._collect(query))
+        return sort_products(list(products), sort_by)
+
+    async def close(self) -> None:
+        if self.worker is not None:
+            await self.worker.stop()
+        await self.broker.close()
@@ -0,0 +1,60 @@
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.utils.governor import Priority
+from app.utils.metrics.tracing import TurnTrace
+from crawler.normalize import normalize_title
+
+
+class CrawlJobFailed(Exception):
+    pass
+
+
+class CrawlJob:
+    """One product search for a crawl worker.
+
+    ``deadline`` is wall-clock time so it means the same in every process.
+    Requests whose ``key`` matches a job in flight join it instead of crawling.
+    ``trace`` is the requesting turn, it only reaches workers in the same process.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        priority: int = Priority.VOICE,
+        deadline: Optional[float] = None,
+        job_id: Optional[str] = None,
+        enqueued_at: Optional[float] = None,
+        trace: Optional[TurnTrace] = None,
+    ):
+        self.query = query
+        self.priority = int(priority)
+        self.deadline = deadline
+        self.job_id = job_id or uuid.uuid4().hex
+        self.enqueued_at = enqueued_at or time.time()
+        self.trace = trace
+
+    @property
+    def key(self) -> str:
+        return normalize_title(self.query)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "query": self.query,
+            "priority": self.priority,
+            "deadline": self.deadline,
+            "job_id": self.job_id,
+            "enqueued_at": self.enqueued_at,
+        }
+
+    @classmethod
+    def from_dict(cls, job: Dict[str, Any]) -> "CrawlJob":
+        return cls(**job)
@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.utils.metrics.prometheus import CRAWL_JOBS_JOINED
+from crawler.jobs.base_broker import Base_Crawl_Broker
+from crawler.jobs.job import CrawlJob, CrawlJobFailed
+from crawler.product import ProductRecord
+
+
+class _LocalJob:
+    def __init__(self, job: CrawlJob):
+        self.job = job
+        self.batches: List[List[ProductRecord]] = []
+        self.subscribers = 1
+        self.started = False
+        self.done = False
+        self.error: Optional[str] = None
+        self.cancelled = asyncio.Event()
+
+
+class LocalBroker(Base_Crawl_Broker):
+    """Broker inside one process, for workers running on the same event loop."""
+
+    def __init__(self):
+        super().__init__("Local", remote=False)
+        # (priority, sequence, job_id), a job bumped to a better priority gets a second entry
+        self.queue: list = []
+        self.sequence = itertools.count()
+        self.jobs: Dict[str, _LocalJob] = {}
+        self.in_flight: Dict[str, str] = {}
+        self.condition: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        return self.condition
+
+    async def submit(self, job: CrawlJob) -> str:
+        async with self._condition():
+            job_id = self.in_flight.get(job.key)
+            entry = self.jobs.get(job_id) if job_id else None
+            if entry is not None:
+                CRAWL_JOBS_JOINED.inc()
+                entry.subscribers += 1
+                if job.deadline is None or (entry.job.deadline is not None and job.deadline > entry.job.deadline):
+                    entry.job.deadline = job.deadline
+                if not entry.started and job.priority < entry.job.priority:
+                    entry.job.priority = job.priority
+                    heapq.heappush(self.queue, (job.priority, next(self.sequence), job_id))
+                    self.condition.notify_all()
+                return job_id
+
+            self.jobs[job.job_id] = _LocalJob(job)
+            self.in_flight[job.key] = job.job_id
+            heapq.heappush(self.queue, (job.priority, next(self.sequence), job.job_id))
+            self.condition.notify_all()
+            return job.job_id
+
+    async def next_job(self) -> CrawlJob:
+        async with self._condition():
+            while True:
+                while not self.queue:
+                    await self.condition.wait()
+                _, _, job_id = heapq.heappop(self.queue)
+                entry = self.jobs.get(job_id)
+                # Released, already taken through its other entry, or stale
+                if entry is None or entry.started or entry.cancelled.is_set():
+                    continue
+                entry.started = True
+                if entry.job.expired():
+                    self._finish(entry, "expired before a worker was free")
+                    continue
+                return entry.job
+
+    async def publish(self, job: CrawlJob, products: List[ProductRecord]) -> None:
+        async with self._condition():
+            entry = self.jobs.get(job.job_id)
+            if entry is not None:
+                entry.batches.append(products)
+                self.condition.notify_all()
+
+    def _finish(self, entry: _LocalJob, error: Optional[str]):
+        entry.done = True
+        entry.error = error
+        if self.in_flight.get(entry.job.key) == entry.job.job_id:
+            del self.in_flight[entry.job.key]
+        self.condition.notify_all()
+
+    async def finish(self, job: CrawlJob, error: Optional[str] = None) -> None:
+        async with self._condition():
+            entry = self.jobs.get(job.job_id)
+            if entry is not None:
+                self._finish(entry, error)
+
+    async def results(self, job_id: str, deadline: Optional[float] = None) -> AsyncIterator[List[ProductRecord]]:
+        index = 0
+        condition = self._condition()
+        while True:
+            async with condition:
+                entry = self.jobs.get(job_id)
+                if entry is None:
+                    return
+                while index == len(entry.batches) and not entry.done:
+                    timeout = None if deadline is None else deadline - time.time()
+                    if timeout is not None and timeout <= 0:
+                        return
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        return
+                batches = entry.batches[index:]
+                index = len(entry.batches)
+                done, error = entry.done, entry.error
+            for batch in batches:
+                yield batch
+            if done:
+                if error:
+                    raise CrawlJobFailed(error)
+                return
+
+    async def release(self, job_id: str) -> None:
+        async with self._condition():
+            entry = self.jobs.get(job_id)
+            if entry is None:
+                return
+            entry.subscribers -= 1
+            if entry.subscribers > 0:
+                return
+            del self.jobs[job_id]
+            if self.in_flight.get(entry.job.key) == job_id:
+                del self.in_flight[entry.job.key]
+            entry.cancelled.set()
+
+    async def wait_cancelled(self, job: CrawlJob) -> None:
+        entry = self.jobs.get(job.job_id)
+        if entry is not None:
+            await entry.cancelled.wait()
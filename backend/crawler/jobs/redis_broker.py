@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, List, Optional
+
+from app.utils.metrics.prometheus import CRAWL_JOBS_JOINED
+from crawler.jobs.base_broker import Base_Crawl_Broker
+from crawler.jobs.job import CrawlJob, CrawlJobFailed
+from crawler.product import ProductRecord
+from redis import asyncio as redis
+
+
+class RedisBroker(Base_Crawl_Broker):
+    """Broker on any server speaking the Redis protocol, for workers in other processes.
+
+    Jobs wait in a sorted set scored by priority then enqueue time. Each job's
+    results are a stream, so a requester that joins late still reads every
+    batch from the start.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        client: Optional[redis.Redis] = None,
+        prefix: str = "avatar:crawl",
+        job_ttl: int = 600,
+        poll_interval: float = 0.5,
+    ):
+        super().__init__("Redis", remote=True)
+        if client is None and url is None:
+            raise ValueError("Either url or client must be provided")
+        self.client = client or redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.job_ttl = job_ttl
+        self.poll_interval = poll_interval
+
+    def _key(self, *parts: str) -> str:
+        return ":".join([self.prefix, *parts])
+
+    def _score(self, job: CrawlJob) -> float:
+        # Priority first, then first come first served
+        return job.priority * 1e10 + job.enqueued_at
+
+    async def submit(self, job: CrawlJob) -> str:
+        in_flight_key = self._key("in_flight", job.key)
+        while True:
+            if await self.client.set(in_flight_key, job.job_id, nx=True, ex=self.job_ttl):
+                async with self.client.pipeline(transaction=True) as pipe:
+                    pipe.set(self._key("job", job.job_id), json.dumps(job.to_dict()), ex=self.job_ttl)
+                    pipe.set(self._key("subscribers", job.job_id), 1, ex=self.job_ttl)
+                    pipe.zadd(self._key("queue"), {job.job_id: self._score(job)})
+                    await pipe.execute()
+                return job.job_id
+
+            job_id = await self.client.get(in_flight_key)
+            if job_id is None:
+                continue  # Finished in the meantime, try to take the key again
+            CRAWL_JOBS_JOINED.inc()
+            await self.client.incr(self._key("subscribers", job_id))
+            # Only moves the job forward, and only while it is still queued
+            await self.client.zadd(self._key("queue"), {job_id: self._score(job)}, xx=True, lt=True)
+            return job_id
+
+    async def next_job(self) -> CrawlJob:
+        while True:
+            popped = await self.client.bzpopmin(self._key("queue"), timeout=1)
+            if popped is None:
+                continue
+            _, job_id, _ = popped
+            data = await self.client.get(self._key("job", job_id))
+            if data is None or await self.client.exists(self._key("cancelled", job_id)):
+                continue
+            job = CrawlJob.from_dict(json.loads(data))
+            if job.expired():
+                await self.finish(job, "expired before a worker was free")
+                continue
+            return job
+
+    async def publish(self, job: CrawlJob, products: List[ProductRecord]) -> None:
+        stream = self._key("results", job.job_id)
+        await self.client.xadd(stream, {"products": json.dumps([product.to_dict() for product in products])})
+        await self.client.expire(stream, self.job_ttl)
+
+    async def finish(self, job: CrawlJob, error: Optional[str] = None) -> None:
+        stream = self._key("results", job.job_id)
+        await self.client.xadd(stream, {"done": "1", "error": error or ""})
+        await self.client.expire(stream, self.job_ttl)
+        await self._clear_in_flight(job.key, job.job_id)
+
+    async def _clear_in_flight(self, key: str, job_id: str) -> None:
+        in_flight_key = self._key("in_flight", key)
+        if await self.client.get(in_flight_key) == job_id:
+            await self.client.delete(in_flight_key)
+
+    async def results(self, job_id: str, deadline: Optional[float] = None) -> AsyncIterator[List[ProductRecord]]:
+        stream = self._key("results", job_id)
+        last_id = "0"
+        while True:
+            block = 1000
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                block = max(1, min(block, int(remaining * 1000)))
+            response = await self.client.xread({stream: last_id}, count=100, block=block)
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    if "products" in fields:
+                        yield [ProductRecord.from_dict(product) for product in json.loads(fields["products"])]
+                    elif fields.get("done"):
+                        if fields.get("error"):
+                            raise CrawlJobFailed(fields["error"])
+                        return
+
+    async def release(self, job_id: str) -> None:
+        if await self.client.decr(self._key("subscribers", job_id)) > 0:
+            return
+        await self.client.set(self._key("cancelled", job_id), 1, ex=self.job_ttl)
+        await self.client.zrem(self._key("queue"), job_id)
+        data = await self.client.get(self._key("job", job_id))
+        if data is not None:
+            await self._clear_in_flight(CrawlJob.from_dict(json.loads(data)).key, job_id)
+
+    async def wait_cancelled(self, job: CrawlJob) -> None:
+        while not await self.client.exists(self._key("cancelled", job.job_id)):
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        await self.client.aclose()
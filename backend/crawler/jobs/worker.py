@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+import time
+from typing import Callable, List, Optional
+
+from app.utils.governor import governor
+from app.utils.metrics import attach_turn
+from app.utils.metrics.prometheus import CRAWL_JOBS, CRAWL_QUEUE_WAIT
+from crawler.crawler import EcommerceRecommender
+from crawler.jobs.base_broker import Base_Crawl_Broker
+from crawler.jobs.job import CrawlJob
+
+
+class CrawlWorker:
+    """Runs up to ``concurrency`` crawl jobs at once, taken from the broker."""
+
+    def __init__(
+        self,
+        broker: Base_Crawl_Broker,
+        recommender_factory: Callable[[], EcommerceRecommender] = EcommerceRecommender,
+        concurrency: int = 4,
+    ):
+        self.broker = broker
+        self.recommender_factory = recommender_factory
+        self.concurrency = concurrency
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self.tasks or self.tasks[0].get_loop() is not asyncio.get_running_loop():
+            # A fresh context, or the first caller's turn trace and governor scope would stick,
+            # each job re-enters its own in _crawl
+            self.tasks = [
+                asyncio.create_task(self._loop(), context=contextvars.Context())
+                for _ in range(self.concurrency)
+            ]
+
+    async def run(self) -> None:
+        self.start()
+        await asyncio.gather(*self.tasks)
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _loop(self) -> None:
+        while True:
+            job = await self.broker.next_job()
+            try:
+                await self._run(job)
+            except Exception as e:
+                # One broken job must not take the worker down
+                print(f"Crawl job {job.job_id} failed: {e}")
+
+    async def _crawl(self, job: CrawlJob) -> None:
+        recommender = self.recommender_factory()
+        remaining = job.remaining()
+        latency_budget = recommender.latency_budget if remaining is None else min(recommender.latency_budget, remaining)
+        # The job carries the requesting turn's priority and deadline into the governor,
+        # and its trace so the engine stages show up in that turn's breakdown
+        with governor.scope(job.priority, remaining), attach_turn(job.trace):
+            async for products in recommender.stream_products(job.query, latency_budget=latency_budget):
+                await self.broker.publish(job, products)
+
+    async def _run(self, job: CrawlJob) -> None:
+        CRAWL_QUEUE_WAIT.observe(max(time.time() - job.enqueued_at, 0))
+        print(f"Crawl job {job.job_id} for '{job.query}' started (priority {job.priority})")
+        crawl = asyncio.create_task(self._crawl(job))
+        cancelled = asyncio.create_task(self.broker.wait_cancelled(job))
+        try:
+            done, _ = await asyncio.wait({crawl, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancelled.cancel()
+            crawl.cancel()
+            await asyncio.gather(crawl, cancelled, return_exceptions=True)
+
+        error: Optional[str] = None
+        if crawl not in done:
+            print(f"Crawl job {job.job_id} cancelled, nobody waits for it anymore")
+            outcome, error = "cancelled", "cancelled"
+        elif crawl.exception() is not None:
+            outcome, error = "failed", str(crawl.exception())
+        else:
+            outcome = "done"
+        CRAWL_JOBS.labels(outcome=outcome).inc()
+        await self.broker.finish(job, error)
@@ -0,0 +1,109 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urljoin, urlsplit
+
+MISSING = "N/A"
+
+CURRENCY_SYMBOLS = {"$": "USD", "£": "GBP", "€": "EUR", "¥": "JPY"}
+
+ASIN_PATTERN = re.compile(r"/(?:dp|gp/product)/([A-Z0-9]{10})(?:[/?]|$)")
+ALIEXPRESS_ITEM_PATTERN = re.compile(r"aliexpress\.[a-z.]+/item/(\d+)\.html")
+
+
+def _is_missing(text: Optional[str]) -> bool:
+    return text is None or text == MISSING or not str(text).strip()
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """Parses "$1,299.99" or "12,50€" into (1299.99, "USD") / (12.5, "EUR")."""
+    if _is_missing(text):
+        return None, None
+    text = str(text)
+    currency = None
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = code
+            break
+
+    match = re.search(r"\d[\d.,]*", text)
+    if not match:
+        return None, currency
+    number_str = match.group(0).rstrip(".,")
+    if "," in number_str and "." in number_str:
+        # Whichever separator comes last is the decimal one
+        if number_str.rfind(",") > number_str.rfind("."):
+            number_str = number_str.replace(".", "").replace(",", ".")
+        else:
+            number_str = number_str.replace(",", "")
+    elif "," in number_str:
+        head, _, tail = number_str.rpartition(",")
+        number_str = f"{head.replace(',', '')}.{tail}" if len(tail) != 3 else number_str.replace(",", "")
+    try:
+        return float(number_str), currency
+    except ValueError:
+        return None, currency
+
+
+def parse_rating(text: Optional[str]) -> Optional[float]:
+    """Parses "4.5 out of 5 stars" or "4,7" into a float between 0 and 5."""
+    if _is_missing(text):
+        return None
+    match = re.search(r"\d+(?:[.,]\d+)?", str(text))
+    if not match:
+        return None
+    rating = float(match.group(0).replace(",", "."))
+    return rating if 0 <= rating <= 5 else None
+
+
+def parse_count(text: Optional[str]) -> Optional[int]:
+    """Parses "1,234", "500+ sold", "1.2k" or "10.000+ vendidos" into an int."""
+    if _is_missing(text):
+        return None
+    match = re.search(r"(\d[\d.,]*)\s*([kKmM]?)", str(text))
+    if not match:
+        return None
+    number_str, suffix = match.groups()
+    number_str = number_str.rstrip(".,")
+    if suffix:
+        multiplier = 1_000 if suffix.lower() == "k" else 1_000_000
+        try:
+            return int(float(number_str.replace(",", ".")) * multiplier)
+        except ValueError:
+            return None
+    digits = re.sub(r"[^\d]", "", number_str)
+    return int(digits) if digits else None
+
+
+def normalize_title(text: Optional[str]) -> str:
+    """Lower-cased, punctuation free title used for matching and deduplication."""
+    if _is_missing(text):
+        return ""
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def product_identity(url: Optional[str]) -> Optional[str]:
+    """A stable id for a product URL, the same for every search that links to it.
+
+    Result links carry per-search tracking parameters (keywords=, qid=, sr=8-N)
+    and sponsored ones go through a click tracker, so the raw URL changes for
+    one product. Uses the Amazon ASIN or the AliExpress item id when there is
+    one, otherwise the URL without its query and fragment.
+    """
+    if _is_missing(url):
+        return None
+    url = str(url)
+    parts = urlsplit(url)
+    if parts.path.endswith("/sspa/click"):
+        # The click tracker carries the product page in its url parameter
+        target = parse_qs(parts.query).get("url")
+        if target:
+            url = urljoin(f"{parts.scheme}://{parts.netloc}", unquote(target[0]))
+            parts = urlsplit(url)
+    match = ASIN_PATTERN.search(parts.path + "?")
+    if match:
+        return f"amazon:{match.group(1)}"
+    match = ALIEXPRESS_ITEM_PATTERN.search(parts.netloc + parts.path)
+    if match:
+        return f"aliexpress:{match.group(1)}"
+    return f"{parts.scheme}://{parts.netloc}{parts.path}".rstrip("/")
@@ -0,0 +1,133 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from crawler.normalize import MISSING, parse_count, parse_price, parse_rating, product_identity
+
+SORT_KEYS = ["price_asc", "price_desc", "popularity", "rating"]
+
+TEXT_FIELDS = ["product_name", "price", "rating", "reviews", "url", "seller", "source_method", "source"]
+
+
+class ProductRecord:
+    """One crawled product with its display strings and their parsed values.
+
+    The numeric fields are parsed once, when the record is built by a parser,
+    so nothing downstream has to interpret strings like "4.5 out of 5 stars".
+    """
+
+    __slots__ = TEXT_FIELDS + ["price_value", "currency", "rating_value", "review_count"]
+
+    def __init__(
+        self,
+        product_name: str = MISSING,
+        price: str = MISSING,
+        rating: str = MISSING,
+        reviews: str = MISSING,
+        url: str = MISSING,
+        seller: str = MISSING,
+        source_method: str = MISSING,
+        source: str = MISSING,
+    ):
+        self.product_name = product_name
+        self.price = price
+        self.rating = rating
+        self.reviews = reviews
+        self.url = url
+        self.seller = seller
+        self.source_method = source_method
+        self.source = source
+        self.price_value, self.currency = parse_price(price)
+        self.rating_value: Optional[float] = parse_rating(rating)
+        self.review_count: Optional[int] = parse_count(reviews)
+
+    @classmethod
+    def from_dict(cls, product: Dict[str, Any]) -> "ProductRecord":
+        return cls(**{field: product[field] for field in TEXT_FIELDS if field in product})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @property
+    def key(self) -> str:
+        identity = product_identity(self.url)
+        if identity:
+            return identity
+        return f"{self.source}:{self.product_name}"
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.source}: {self.product_name!r}, {self.price}, {self.rating_value}, {self.review_count})"
+
+
+class ProductBatch:
+    """Column view over records so sorting, filtering and top-k run in NumPy."""
+
+    def __init__(self, records: Iterable[ProductRecord]):
+        self.records: List[ProductRecord] = list(records)
+        self.price = self._column("price_value")
+        self.rating = self._column("rating_value")
+        self.reviews = self._column("review_count")
+
+    def _column(self, field: str) -> np.ndarray:
+        values = [getattr(record, field) for record in self.records]
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _take(self, indices: np.ndarray) -> "ProductBatch":
+        return ProductBatch([self.records[i] for i in indices])
+
+    def sort_keys(self, sort_by: str) -> np.ndarray:
+        """Ascending keys for ``sort_by``; missing values map to +inf and sort last."""
+        if sort_by == "price_asc":
+            keys = self.price
+        elif sort_by == "price_desc":
+            keys = -self.price
+        elif sort_by == "popularity":
+            keys = -self.reviews
+        elif sort_by == "rating":
+            # Ties on rating are broken by review count
+            keys = -(self.rating * 1e9 + np.nan_to_num(self.reviews))
+        else:
+            return np.arange(len(self.records), dtype=np.float64)
+        return np.where(np.isnan(keys), np.inf, keys)
+
+    def order(self, sort_by: Optional[str]) -> np.ndarray:
+        if sort_by not in SORT_KEYS:
+            return np.arange(len(self.records))
+        return np.argsort(self.sort_keys(sort_by), kind="stable")
+
+    def sort(self, sort_by: Optional[str]) -> "ProductBatch":
+        return self._take(self.order(sort_by))
+
+    def top_k(self, k: int, sort_by: Optional[str]) -> "ProductBatch":
+        if sort_by not in SORT_KEYS or k >= len(self.records):
+            return self._take(self.order(sort_by)[:k])
+        keys = self.sort_keys(sort_by)
+        candidates = np.argpartition(keys, k)[:k]
+        return self._take(candidates[np.argsort(keys[candidates], kind="stable")])
+
+    def filter(
+        self,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        min_reviews: Optional[int] = None,
+    ) -> "ProductBatch":
+        mask = np.ones(len(self.records), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if min_price is not None:
+                mask &= self.price >= min_price
+            if max_price is not None:
+                mask &= self.price <= max_price
+            if min_rating is not None:
+                mask &= self.rating >= min_rating
+            if min_reviews is not None:
+                mask &= self.reviews >= min_reviews
+        return self._take(np.flatnonzero(mask))
+
+
+def sort_products(products: List[ProductRecord], sort_by: Optional[str]) -> List[ProductRecord]:
+    if sort_by not in SORT_KEYS:
+        return products
+    return ProductBatch(products).sort(sort_by).records
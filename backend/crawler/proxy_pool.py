@@ -0,0 +1,204 @@
+import asyncio
+import contextlib
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from app.utils.metrics.prometheus import (PROXY_COOLING, PROXY_IN_FLIGHT,
+                                          PROXY_REQUESTS)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Statuses the shops answer with when they rate limit or challenge an IP
+BLOCK_STATUSES = (403, 429, 503)
+
+
+class NoProxyAvailable(Exception):
+    pass
+
+
+def looks_blocked(status_code: Optional[int], html: Optional[str], markers: Sequence[str] = ()) -> bool:
+    """Whether a response is a block or captcha page rather than results."""
+    if status_code in BLOCK_STATUSES:
+        return True
+    return bool(html) and any(re.search(marker, html) for marker in markers)
+
+
+class Proxy:
+    def __init__(self, url: str, max_concurrency: int):
+        parts = urlsplit(url)
+        self.url = url
+        self.server = f"{parts.scheme}://{parts.hostname}:{parts.port}"
+        self.username = parts.username
+        self.password = parts.password
+        # Used as the metrics label, never includes the credentials
+        self.name = f"{parts.hostname}:{parts.port}"
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldowns = 0
+        self.latency: Optional[float] = None
+        self.cooldown_until = 0.0
+
+    @property
+    def cooling(self) -> bool:
+        return self.cooldown_until > time.time()
+
+    @property
+    def available(self) -> bool:
+        return not self.cooling and self.in_flight < self.max_concurrency
+
+    def score(self) -> float:
+        """Smoothed success rate per second of latency, higher is better."""
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return success_rate / (self.latency or 1.0)
+
+
+class ProxyLease:
+    """One request's use of a proxy, ``proxy`` is None when the pool is empty."""
+
+    def __init__(self, pool: "ProxyPool", engine_name: str, proxy: Optional[Proxy]):
+        self.pool = pool
+        self.engine_name = engine_name
+        self.proxy = proxy
+        self.started = time.monotonic()
+        self.recorded = False
+
+    def record(self, ok: bool, blocked: bool = False):
+        if self.proxy is None or self.recorded:
+            return
+        self.recorded = True
+        self.pool._record(self.engine_name, self.proxy, ok, blocked, time.monotonic() - self.started)
+
+
+class ProxyPool:
+    """Rotating crawl proxies, shared by the HTTP and browser fetch paths.
+
+    Each engine sticks to one proxy for ``sticky_ttl`` seconds, so its session
+    keeps one IP. Otherwise the best scoring proxy under ``max_concurrency``
+    is used. A block or captcha puts a proxy in cooldown, doubling from
+    ``cooldown`` while it keeps getting blocked, and moves its engines elsewhere.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str] = (),
+        max_concurrency: int = 2,
+        cooldown: float = 300,
+        max_cooldown: float = 3600,
+        failure_threshold: int = 3,
+        sticky_ttl: float = 600,
+        wait_timeout: float = 10,
+    ):
+        self.proxies: List[Proxy] = [Proxy(url, max_concurrency) for url in urls]
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failure_threshold = failure_threshold
+        self.sticky_ttl = sticky_ttl
+        self.wait_timeout = wait_timeout
+        self.sticky: Dict[str, Tuple[Proxy, float]] = {}
+        self.conditions: Dict[asyncio.AbstractEventLoop, asyncio.Condition] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.proxies)
+
+    def _condition(self) -> asyncio.Condition:
+        # A condition belongs to one event loop, scripts may run several in turn
+        loop = asyncio.get_running_loop()
+        if loop not in self.conditions:
+            self.conditions[loop] = asyncio.Condition()
+        return self.conditions[loop]
+
+    def _pick(self, engine_name: str) -> Optional[Proxy]:
+        sticky = self.sticky.get(engine_name)
+        if sticky is not None:
+            proxy, expires = sticky
+            if expires > time.time() and proxy.available:
+                return proxy
+        for proxy in self.proxies:
+            PROXY_COOLING.labels(proxy=proxy.name).set(int(proxy.cooling))
+        candidates = [proxy for proxy in self.proxies if proxy.available]
+        if not candidates:
+            return None
+        proxy = max(candidates, key=lambda p: (p.score(), -p.in_flight))
+        self.sticky[engine_name] = (proxy, time.time() + self.sticky_ttl)
+        return proxy
+
+    @contextlib.asynccontextmanager
+    async def lease(self, engine_name: str) -> AsyncIterator[ProxyLease]:
+        if not self.enabled:
+            yield ProxyLease(self, engine_name, None)
+            return
+
+        condition = self._condition()
+        async with condition:
+            # Cooldowns end on their own, so the wait wakes up now and then to check
+            deadline = time.monotonic() + self.wait_timeout
+            while (proxy := self._pick(engine_name)) is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise NoProxyAvailable(f"No proxy free for {engine_name} after {self.wait_timeout}s")
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(condition.wait(), min(remaining, 1.0))
+            proxy.in_flight += 1
+            PROXY_IN_FLIGHT.labels(proxy=proxy.name).set(proxy.in_flight)
+
+        try:
+            yield ProxyLease(self, engine_name, proxy)
+        finally:
+            async with condition:
+                proxy.in_flight -= 1
+                PROXY_IN_FLIGHT.labels(proxy=proxy.name).set(proxy.in_flight)
+                condition.notify()
+
+    def _record(self, engine_name: str, proxy: Proxy, ok: bool, blocked: bool, duration: float):
+        if ok and not blocked:
+            proxy.successes += 1
+            proxy.consecutive_failures = 0
+            proxy.cooldowns = 0
+            proxy.latency = duration if proxy.latency is None else 0.8 * proxy.latency + 0.2 * duration
+            PROXY_REQUESTS.labels(proxy=proxy.name, result="ok").inc()
+            return
+
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        PROXY_REQUESTS.labels(proxy=proxy.name, result="blocked" if blocked else "error").inc()
+        # The engine's next request tries another proxy, this one may still recover
+        if self.sticky.get(engine_name, (None,))[0] is proxy:
+            del self.sticky[engine_name]
+        if not blocked and proxy.consecutive_failures < self.failure_threshold:
+            return
+        cooldown = min(self.cooldown * 2 ** proxy.cooldowns, self.max_cooldown)
+        proxy.cooldowns += 1
+        proxy.consecutive_failures = 0
+        proxy.cooldown_until = time.time() + cooldown
+        PROXY_COOLING.labels(proxy=proxy.name).set(1)
+        print(f"[Proxy pool] {proxy.name} {'blocked' if blocked else 'failing'} on {engine_name}, cooling down for {cooldown:.0f}s")
+        # Sessions on a blocked IP are burned, every engine on it moves
+        for engine, (sticky, _) in list(self.sticky.items()):
+            if sticky is proxy:
+                del self.sticky[engine]
+
+
+def _proxy_urls() -> List[str]:
+    urls = [url.strip() for url in os.getenv("CRAWL_PROXIES", "").split(",") if url.strip()]
+    path = os.getenv("CRAWL_PROXY_FILE")
+    if path:
+        with open(path, "r") as file:
+            urls += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    return urls
+
+
+proxy_pool = ProxyPool(
+    _proxy_urls(),
+    max_concurrency=int(os.getenv("CRAWL_PROXY_MAX_CONCURRENCY", "2")),
+    cooldown=float(os.getenv("CRAWL_PROXY_COOLDOWN", "300")),
+    sticky_ttl=float(os.getenv("CRAWL_PROXY_STICKY_TTL", "600")),
+    wait_timeout=float(os.getenv("CRAWL_PROXY_WAIT", "10")),
+)
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import re
+from typing import List
+
+import numpy as np
+from app.utils.metrics.prometheus import RANK_DROPPED
+from crawler.normalize import normalize_title
+from crawler.product import ProductBatch, ProductRecord
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Sponsored results link through the ad click tracker instead of the product page
+SPONSORED_URL_MARKERS = ("/sspa/click", "_sspa")
+BUNDLE_PATTERN = re.compile(r"\b(bundle|combo|\d+ ?(pack|pcs|pieces|count)|(pack|set) of \d+)\b")
+# Sizes, capacities and model numbers tell apart products whose titles are otherwise alike
+SPEC_TOKEN = re.compile(r"\d+[a-z]{0,3}")
+BIT_VALUES = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def is_sponsored(product: ProductRecord) -> bool:
+    return any(marker in product.url for marker in SPONSORED_URL_MARKERS)
+
+
+def _shingles(title: str) -> List[str]:
+    tokens = title.split()
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(title: str) -> np.uint64:
+    """64-bit SimHash over the word unigrams and bigrams of a normalized title."""
+    shingles = _shingles(title)
+    if not shingles:
+        return np.uint64(0)
+    hashes = np.array([_hash64(shingle) for shingle in shingles], dtype=np.uint64)
+    votes = np.where((hashes[:, None] & BIT_VALUES) != 0, 1, -1).sum(axis=0)
+    return np.bitwise_or.reduce(BIT_VALUES[votes > 0], initial=np.uint64(0))
+
+
+class ProductRanker:
+    """Post-crawl ranking stage: drops sponsored and near-duplicate products and keeps the top k.
+
+    Products are scored over the batch columns: a rating shrunk towards a prior
+    by its review count, popularity, price against the batch median of the same
+    currency, and a penalty for bundles. Near duplicates, like the colour
+    variants of one listing or the same item on two engines, are titles whose
+    SimHash fingerprints are within ``max_distance`` bits and whose size and
+    model number tokens match. Only the best of each group is kept.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 8,
+        max_distance: int = 10,
+        drop_sponsored: bool = True,
+        prior_rating: float = 4.0,
+        prior_reviews: float = 20,
+        popularity_weight: float = 0.3,
+        price_weight: float = 0.15,
+        bundle_penalty: float = 0.1,
+    ):
+        self.top_k = top_k
+        self.max_distance = max_distance
+        self.drop_sponsored = drop_sponsored
+        self.prior_rating = prior_rating
+        self.prior_reviews = prior_reviews
+        self.popularity_weight = popularity_weight
+        self.price_weight = price_weight
+        self.bundle_penalty = bundle_penalty
+
+    def score(self, batch: ProductBatch, titles: List[str]) -> np.ndarray:
+        reviews = np.nan_to_num(batch.reviews)
+        rating = np.where(np.isnan(batch.rating), self.prior_rating, batch.rating)
+        # Bayesian average, a 5.0 from two reviews should not beat a 4.7 from thousands
+        shrunk = (rating * reviews + self.prior_rating * self.prior_reviews) / (reviews + self.prior_reviews)
+        scores = shrunk / 5
+        if reviews.max(initial=0) > 0:
+            scores += self.popularity_weight * np.log1p(reviews) / np.log1p(reviews.max())
+
+        # Cheaper than the median is better, capped so a price alone never decides
+        price_offset = np.ones(len(batch))
+        currencies = np.array([record.currency or "" for record in batch.records])
+        for currency in np.unique(currencies):
+            in_currency = (currencies == currency) & ~np.isnan(batch.price) & (batch.price > 0)
+            if in_currency.any():
+                median = np.median(batch.price[in_currency])
+                price_offset[in_currency] = np.clip(np.log(batch.price[in_currency] / median), -1, 1)
+        scores -= self.price_weight * price_offset
+
+        bundles = np.array([BUNDLE_PATTERN.search(title) is not None for title in titles], dtype=bool)
+        return scores - self.bundle_penalty * bundles
+
+    def _spec_keys(self, titles: List[str]) -> List[str]:
+        return [" ".join(sorted(set(SPEC_TOKEN.findall(title)) & set(title.split()))) for title in titles]
+
+    def _select(self, records: List[ProductRecord], titles: List[str], order: np.ndarray) -> List[ProductRecord]:
+        """Walks ``order`` and keeps the first of each near-duplicate group until top_k are kept."""
+        fingerprints = np.array([simhash(title) for title in titles], dtype=np.uint64)
+        spec_keys = np.array(self._spec_keys(titles), dtype=object)
+        kept: List[int] = []
+        for index in order:
+            if kept:
+                distances = np.bitwise_count(fingerprints[kept] ^ fingerprints[index])
+                if ((distances <= self.max_distance) & (spec_keys[kept] == spec_keys[index])).any():
+                    RANK_DROPPED.labels(reason="duplicate").inc()
+                    continue
+            kept.append(index)
+            if len(kept) == self.top_k:
+                break
+        return [records[index] for index in kept]
+
+    def rank(self, products: List[ProductRecord], preserve_order: bool = False) -> List[ProductRecord]:
+        """The top_k products by score, or the first top_k in the given order with ``preserve_order``."""
+        titles = [normalize_title(product.product_name) for product in products]
+        candidates = [index for index, title in enumerate(titles) if title]
+        if self.drop_sponsored:
+            organic = [index for index in candidates if not is_sponsored(products[index])]
+            # An all-sponsored page is still better than no answer
+            if organic:
+                RANK_DROPPED.labels(reason="sponsored").inc(len(candidates) - len(organic))
+                candidates = organic
+
+        records = [products[index] for index in candidates]
+        titles = [titles[index] for index in candidates]
+        if preserve_order:
+            order = np.arange(len(records))
+        else:
+            batch = ProductBatch(records)
+            order = np.argsort(-self.score(batch, titles), kind="stable")
+        return self._select(records, titles, order)
+
+
+product_ranker = ProductRanker(
+    top_k=int(os.getenv("RANK_TOP_K", "8")),
+    max_distance=int(os.getenv("RANK_SIMHASH_DISTANCE", "10")),
+    drop_sponsored=os.getenv("RANK_DROP_SPONSORED", "true").lower() == "true",
+)
@@ -0,0 +1,54 @@
+import re
+from typing import Iterable, List, Optional
+
+# Parsers only read the DOM, so nothing that is merely painted needs to load
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googlesyndication\.com",
+    r"facebook\.(com|net)/tr",
+    r"connect\.facebook\.net",
+    r"\.(png|jpe?g|gif|webp|avif|svg|ico|woff2?|ttf|otf|mp4|webm)(\?|$)",
+]
+
+
+class ResourceBlockRules:
+    """Aborts browser requests by resource type or URL pattern.
+
+    ``hook`` is registered as crawl4ai's ``on_page_context_created`` hook and
+    routes every request of the context through ``should_block``.
+    """
+
+    def __init__(self, resource_types: Iterable[str] = (), url_patterns: Iterable[str] = ()):
+        self.resource_types = set(resource_types)
+        self.url_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in url_patterns)) if url_patterns else None
+        self.blocked_requests = 0
+        self.allowed_requests = 0
+
+    @classmethod
+    def for_engine(cls, block_config: Optional[dict] = None) -> "ResourceBlockRules":
+        block_config = block_config or {}
+        resource_types: List[str] = DEFAULT_BLOCKED_RESOURCE_TYPES + block_config.get("resource_types", [])
+        url_patterns: List[str] = DEFAULT_BLOCKED_URL_PATTERNS + block_config.get("url_patterns", [])
+        return cls(resource_types, url_patterns)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        return self.url_pattern is not None and self.url_pattern.search(url) is not None
+
+    async def _route(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            self.allowed_requests += 1
+            await route.continue_()
+
+    async def hook(self, page, context=None, **kwargs):
+        if context is not None:
+            await context.route("**/*", self._route)
+        return page
@@ -0,0 +1,31 @@
+"""Standalone crawl worker, taking jobs from the broker at CRAWL_BROKER_URL.
+
+Keeps Chromium and the parsers out of the processes serving the websockets.
+Run from backend/, as many as the crawl load needs:
+
+    CRAWL_BROKER_URL=redis://localhost:6379 python -m crawler.worker
+"""
+import asyncio
+import os
+
+from crawler.jobs import create_broker
+from crawler.jobs.worker import CrawlWorker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def main():
+    broker = create_broker()
+    if not broker.remote:
+        raise SystemExit("Set CRAWL_BROKER_URL, a local broker cannot take jobs from other processes")
+    worker = CrawlWorker(broker, concurrency=int(os.getenv("CRAWL_WORKERS", "4")))
+    print(f"Crawl worker taking {worker.concurrency} jobs at a time from the {broker.broker_name} broker")
+    try:
+        await worker.run()
+    finally:
+        await broker.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
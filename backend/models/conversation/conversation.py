@@ -2,13 +2,18 @@ from enum import Enum, unique
 from typing import Dict, List
 
 from models.tts.viseme import Viseme, WordOffset
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 @unique
 class ConversationMessageType(str, Enum):
     QUERY: str = "query"
+    QUERY_START: str = "query_start"
+    QUERY_CHUNK: str = "query_chunk"
+    QUERY_END: str = "query_end"
+    QUERY_CANCEL: str = "query_cancel"
     AUDIO_RESPONSE: str = "audio_response"
+    BUSY: str = "busy"
 
 
 class ConversationMessage(BaseModel):
@@ -18,7 +23,29 @@ class ConversationMessage(BaseModel):
 class QueryMessage(BaseModel):
     query: Dict[str, float]
 
+class QueryStartMessage(BaseModel):
+    utterance_id: str
+    # The buffer is sized from it, so it is kept to rates microphones actually use
+    sample_rate: int = Field(default=16000, ge=8000, le=48000)
+
+class QueryChunkMessage(BaseModel):
+    utterance_id: str
+    seq: int
+    # Base64 of little-endian float32 samples
+    audio: str
+
+class QueryEndMessage(BaseModel):
+    utterance_id: str
+    # Number of chunks sent, to detect lost ones
+    chunks: int
+
 class AudioMessage(BaseModel):
     base64_audio: str
     viseme: List[Viseme]
-    word_boundary: List[WordOffset]
\ No newline at end of file
+    word_boundary: List[WordOffset]
+    # False while more sentences of the same reply are still to come
+    final: bool = True
+
+class BusyMessage(BaseModel):
+    resource: str
+    retry_after: float
@@ -0,0 +1,18 @@
+from enum import Enum, unique
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+@unique
+class LLMStreamEventType(str, Enum):
+    TEXT_DELTA: str = "text_delta"
+    TOOL_CALL: str = "tool_call"
+    COMPLETED: str = "completed"
+
+
+class LLMStreamEvent(BaseModel):
+    type: LLMStreamEventType
+    text: str = ""
+    tool_call: Optional[Any] = None
+    response: Optional[Any] = None
@@ -1,7 +1,16 @@
-from app.pipelines.conversation.query import talk_to_llm
+from app.pipelines.conversation.audio_stream import AudioStream
+from app.pipelines.conversation.query import (talk_to_llm,
+                                              talk_to_llm_streamed,
+                                              transcribe_audio)
+from app.pipelines.conversation.tool_output import product_registry
 from app.utils.ws import conversation_ws_manager
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from models.conversation.conversation import ConversationMessage, ConversationMessageType, QueryMessage
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from models.conversation.conversation import (ConversationMessage,
+                                              ConversationMessageType,
+                                              QueryChunkMessage,
+                                              QueryEndMessage, QueryMessage,
+                                              QueryStartMessage)
 
 conversation_router = APIRouter(prefix="/conversation", tags=["Conversation"])
 
@@ -10,16 +19,43 @@ conversation_router = APIRouter(prefix="/conversation", tags=["Conversation"])
 async def get_conversation(conversation_id: str, query: str):
     return await talk_to_llm(conversation_id, query)
 
+@conversation_router.get("/product/{product_id}")
+async def get_product(product_id: str):
+    product = await product_registry.resolve(product_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    return product.to_dict()
+
 @conversation_router.websocket("/ws")
 async def audio_ws(websocket: WebSocket, user_id: str):
     await conversation_ws_manager.connect(websocket, user_id)
+    # Chunked uploads of this connection all go into one preallocated buffer
+    stream = AudioStream(user_id, transcribe_audio)
     try:
         while True:
             data = await websocket.receive_json()   
-            conversation_message = ConversationMessage(
-                type=ConversationMessageType(data['type']),
-                data=QueryMessage(**data['data'])
-            )
-            await talk_to_llm(user_id, conversation_message.data)
+            message_type = ConversationMessageType(data['type'])
+            if message_type == ConversationMessageType.QUERY_START:
+                try:
+                    start = QueryStartMessage(**data['data'])
+                except ValidationError as e:
+                    # Drop the utterance, not the connection
+                    print(f"Invalid query start from {user_id}: {e}")
+                    stream.cancel()
+                    continue
+                stream.start(start)
+            elif message_type == ConversationMessageType.QUERY_CHUNK:
+                stream.append(QueryChunkMessage(**data['data']))
+            elif message_type == ConversationMessageType.QUERY_END:
+                await talk_to_llm_streamed(user_id, stream, QueryEndMessage(**data['data']))
+            elif message_type == ConversationMessageType.QUERY_CANCEL:
+                stream.cancel(data.get('data', {}).get('utterance_id'))
+            else:
+                conversation_message = ConversationMessage(
+                    type=message_type,
+                    data=QueryMessage(**data['data'])
+                )
+                await talk_to_llm(user_id, conversation_message.data)
     except WebSocketDisconnect:
-        conversation_ws_manager.disconnect(user_id)
+        stream.cancel()
+        await conversation_ws_manager.disconnect(user_id)
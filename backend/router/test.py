@@ -62,5 +62,6 @@ history = []
 @test_router.get("/search")
 async def test_search(query: str):
     response = await llm_search_product(query, history)
+    history.append({"role": "user", "content": query})
     history.append({"role": "assistant", "content": response})
     return response
\ No newline at end of file
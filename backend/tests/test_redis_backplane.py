@@ -0,0 +1,144 @@
+"""RedisBackplane on an in-process fakeredis server shared by several workers.
+
+Run from backend/:
+
+    python -m pytest tests
+"""
+import asyncio
+import time
+
+import fakeredis
+from app.utils.backplane.redis_backplane import RedisBackplane
+
+
+def create_workers(count: int = 2) -> list:
+    server = fakeredis.FakeServer()
+    return [
+        RedisBackplane(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        for _ in range(count)
+    ]
+
+
+async def subscribe_all(workers: list) -> dict:
+    received = {worker.worker_id: [] for worker in workers}
+    for worker in workers:
+        async def handler(message, worker_id=worker.worker_id):
+            received[worker_id].append(message)
+
+        await worker.subscribe(handler)
+    return received
+
+
+async def wait_for(condition, timeout: float = 2) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def close_all(workers: list) -> None:
+    for worker in workers:
+        await worker.close()
+
+
+def test_publish_reaches_only_the_addressed_worker():
+    async def run():
+        sender, receiver = workers = create_workers()
+        try:
+            received = await subscribe_all(workers)
+            await sender.publish(receiver.worker_id, {"user_id": "user-1", "text": "hello"})
+            assert await wait_for(lambda: received[receiver.worker_id])
+            # Give a misrouted copy the time to arrive before checking there is none
+            await asyncio.sleep(0.05)
+            assert received[receiver.worker_id] == [{"user_id": "user-1", "text": "hello"}]
+            assert received[sender.worker_id] == []
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
+
+
+def test_publish_keeps_the_order_of_messages():
+    async def run():
+        sender, receiver = workers = create_workers()
+        try:
+            received = await subscribe_all(workers)
+            for seq in range(50):
+                await sender.publish(receiver.worker_id, {"seq": seq})
+            assert await wait_for(lambda: len(received[receiver.worker_id]) == 50)
+            assert [message["seq"] for message in received[receiver.worker_id]] == list(range(50))
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
+
+
+def test_broadcast_reaches_every_worker():
+    async def run():
+        workers = create_workers(3)
+        try:
+            received = await subscribe_all(workers)
+            await workers[0].broadcast({"text": "hello"})
+            assert await wait_for(lambda: all(received.values()))
+            assert all(messages == [{"text": "hello"}] for messages in received.values())
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
+
+
+def test_message_to_a_connection_owner_on_another_worker():
+    async def run():
+        first, second = workers = create_workers()
+        try:
+            received = await subscribe_all(workers)
+            await second.claim_connection("listener")
+            # A worker that does not hold the connection looks up its owner and relays
+            owner = await first.get_connection_owner("listener")
+            assert owner == second.worker_id
+            await first.publish(owner, {"user_id": "listener", "text": "hello"})
+            assert await wait_for(lambda: received[second.worker_id])
+            assert received[first.worker_id] == []
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
+
+
+def test_a_failing_handler_does_not_stop_the_listener():
+    async def run():
+        sender, receiver = workers = create_workers()
+        received = []
+
+        async def handler(message):
+            if message.get("fail"):
+                raise ValueError("bad message")
+            received.append(message)
+
+        try:
+            await receiver.subscribe(handler)
+            await sender.publish(receiver.worker_id, {"fail": True})
+            await sender.publish(receiver.worker_id, {"text": "after"})
+            assert await wait_for(lambda: received)
+            assert received == [{"text": "after"}]
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
+
+
+def test_turn_lock_is_exclusive_across_workers():
+    async def run():
+        first, second = workers = create_workers()
+        try:
+            token = await first.acquire_turn_lock("conversation", ttl=10)
+            assert token is not None
+            assert await second.acquire_turn_lock("conversation", ttl=10) is None
+            await first.release_turn_lock("conversation", token)
+            assert await second.acquire_turn_lock("conversation", ttl=10) is not None
+        finally:
+            await close_all(workers)
+
+    asyncio.run(run())
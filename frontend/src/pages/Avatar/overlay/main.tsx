@@ -14,15 +14,30 @@ import { AvatarInitializer } from "./initializer";
 import { Status } from "./status";
 import TranscriptionManager from "./transcription";
 import { Environment, Image } from "@react-three/drei";
+import { useRef } from "react";
+import { v4 as uuidv4 } from "uuid";
 
 const MIN_SPEECH_DURATION = 1;
 const IMAGE_WIDTH = 12;
+const SAMPLE_RATE = 16000;
+
+function float32ToBase64(frame: Float32Array): string {
+  const bytes = new Uint8Array(frame.buffer, frame.byteOffset, frame.byteLength);
+  let binary = "";
+  for (let i = 0; i < bytes.length; i++) {
+    binary += String.fromCharCode(bytes[i]);
+  }
+  return btoa(binary);
+}
+
 export const AvatarOverlay = () => {
   const { setIsConnected, isConnected, websocket, setwebsocket } =
     useWebsocket();
-  const { setAudio, setViseme, setWordOffset, isPlaying } = useAvatarSpeak();
+  const { enqueueAudio, isPlaying, queue } = useAvatarSpeak();
   const { querySent, setQuerySent } = useQuerySent();
   const { sessionID } = useSessionInitializer();
+  // Utterance being uploaded while the user speaks
+  const utterance = useRef<{ id: string; seq: number } | null>(null);
 
   function onMessage(event: MessageEvent) {
     const data: ConversationMessage = JSON.parse(event.data);
@@ -32,9 +47,7 @@ export const AvatarOverlay = () => {
       case ConversationMessageType.AUDIO_RESPONSE:
         try {
           const AudioMessage: AudioMessage = data.data;
-          setAudio(AudioMessage.base64_audio);
-          setViseme(AudioMessage.viseme);
-          setWordOffset(AudioMessage.word_boundary);
+          enqueueAudio(AudioMessage);
         } catch (error) {
           console.error("Error parsing audio response:", error);
         }
@@ -42,14 +55,45 @@ export const AvatarOverlay = () => {
     }
   }
 
-  function onSendMessage(message: Float32Array) {
-    if (message.length == 0 || !websocket || !sessionID || isPlaying || querySent) return;
-    const data: ConversationMessage = {
-      type: ConversationMessageType.QUERY,
-      data: { query: message },
-    };
+  function send(type: ConversationMessageType, data: any) {
+    const message: ConversationMessage = { type, data };
+    websocket?.send(JSON.stringify(message));
+  }
+
+  function onSpeechStart(preRoll: Float32Array[]) {
+    // A queue means the reply is still being spoken, even between two segments
+    if (!websocket || !sessionID || isPlaying || queue !== null || querySent) return;
+    utterance.current = { id: uuidv4(), seq: 0 };
+    send(ConversationMessageType.QUERY_START, {
+      utterance_id: utterance.current.id,
+      sample_rate: SAMPLE_RATE,
+    });
+    preRoll.forEach(onAudioFrame);
+  }
+
+  function onAudioFrame(frame: Float32Array) {
+    const current = utterance.current;
+    if (!current) return;
+    send(ConversationMessageType.QUERY_CHUNK, {
+      utterance_id: current.id,
+      seq: current.seq++,
+      audio: float32ToBase64(frame),
+    });
+  }
+
+  function onSpeechEnd(keep: boolean) {
+    const current = utterance.current;
+    if (!current) return;
+    utterance.current = null;
+    if (!keep) {
+      send(ConversationMessageType.QUERY_CANCEL, { utterance_id: current.id });
+      return;
+    }
     setQuerySent(true);
-    websocket.send(JSON.stringify(data));
+    send(ConversationMessageType.QUERY_END, {
+      utterance_id: current.id,
+      chunks: current.seq,
+    });
   }
   return (
     <div className="flex flex-col items-center justify-center h-full w-full">
@@ -77,7 +121,9 @@ export const AvatarOverlay = () => {
       )}
       {/* <Status /> */}
       <TranscriptionManager
-        onSendMessage={onSendMessage}
+        onSpeechStart={onSpeechStart}
+        onAudioFrame={onAudioFrame}
+        onSpeechEnd={onSpeechEnd}
         timeout={MIN_SPEECH_DURATION}
       />
     </div>
@@ -1,6 +1,10 @@
 import useQuerySent from "@/zustand/Avatar/QuerySent";
 import { useAvatarSpeak } from "@/zustand/Avatar/Speak";
 import { useMicVAD } from "@ricky0123/vad-react";
+import { useRef } from "react";
+
+// Frames kept from before the VAD noticed speech, so the first syllable is not cut
+const PRE_ROLL_FRAMES = 3;
 
 function getAudioDurationFromFloat32Array(
   audioData: Float32Array,
@@ -10,24 +14,48 @@ function getAudioDurationFromFloat32Array(
 }
 
 const TranscriptionManager = ({
-  onSendMessage,
+  onSpeechStart,
+  onAudioFrame,
+  onSpeechEnd,
   timeout,
 }: {
-  onSendMessage: (message: Float32Array) => void;
+  onSpeechStart: (preRoll: Float32Array[]) => void;
+  onAudioFrame: (frame: Float32Array) => void;
+  onSpeechEnd: (keep: boolean) => void;
   timeout: number;
 }) => {
   const { querySent } = useQuerySent();
   const { isPlaying } = useAvatarSpeak();
+  const preRoll = useRef<Float32Array[]>([]);
+  const speaking = useRef(false);
   const vad = useMicVAD({
-    onSpeechEnd: (audio) => {
+    // Audio is uploaded frame by frame while the user speaks
+    onFrameProcessed: (_probabilities, frame) => {
+      if (speaking.current) {
+        onAudioFrame(frame);
+        return;
+      }
+      preRoll.current.push(frame.slice());
+      if (preRoll.current.length > PRE_ROLL_FRAMES) preRoll.current.shift();
+    },
+    onSpeechStart: () => {
       if (querySent || isPlaying) return;
+      speaking.current = true;
+      onSpeechStart(preRoll.current);
+      preRoll.current = [];
+    },
+    onVADMisfire: () => {
+      speaking.current = false;
+      onSpeechEnd(false);
+    },
+    onSpeechEnd: (audio) => {
+      speaking.current = false;
       try {
         const duration = getAudioDurationFromFloat32Array(audio);
-        if (duration > timeout) {
-          onSendMessage(audio);
-        }
+        onSpeechEnd(duration > timeout && !querySent && !isPlaying);
       } catch (error) {
         console.error("Error getting audio duration:", error);
+        onSpeechEnd(false);
       }
     },
     positiveSpeechThreshold: 0.8,
@@ -1,5 +1,9 @@
 export enum ConversationMessageType {
   QUERY = "query",
+  QUERY_START = "query_start",
+  QUERY_CHUNK = "query_chunk",
+  QUERY_END = "query_end",
+  QUERY_CANCEL = "query_cancel",
   AUDIO_RESPONSE = "audio_response",
 }
 
@@ -23,4 +27,7 @@ export interface AudioMessage {
   base64_audio: string;
   viseme: Viseme[];
   word_boundary: WordOffset[];
+  // False while more segments of the same reply are still to come, the
+  // final one may carry no audio when the last sentences failed
+  final: boolean;
 }
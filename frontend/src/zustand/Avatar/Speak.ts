@@ -1,4 +1,4 @@
-import { Viseme, WordOffset } from "@/types/avatar/conversation";
+import { AudioMessage, Viseme, WordOffset } from "@/types/avatar/conversation";
 import { create } from "zustand";
 
 // Convert base64 string to Blob
@@ -25,6 +25,8 @@ type AvatarSpeakState = {
   viseme: Viseme[] | null;
   wordOffset: WordOffset[] | null; // You can specify this more strictly if you know the shape
   isPlaying: boolean;
+  // Segments waiting for the current one to end, null while nothing is speaking
+  queue: AudioMessage[] | null;
 
   getPlaying: () => boolean;
   setAudio: (
@@ -33,6 +35,7 @@ type AvatarSpeakState = {
     speed?: number,
     stopAutoPlay?: boolean
   ) => void;
+  enqueueAudio: (message: AudioMessage) => void;
   togglePlayPause: () => void;
   pauseAudio: () => void;
   restartAudio: () => void;
@@ -48,6 +51,7 @@ export const useAvatarSpeak = create<AvatarSpeakState>((set, get) => ({
   viseme: null,
   wordOffset: null,
   isPlaying: false,
+  queue: null,
 
   getPlaying: () => {
     const audio = get().audio;
@@ -87,9 +91,44 @@ export const useAvatarSpeak = create<AvatarSpeakState>((set, get) => ({
       })
       .catch((error) => {
         console.error("Error playing audio:", error);
+        if (typeof onAudioComplete === "function") {
+          onAudioComplete();
+        }
       });
   },
 
+  // A streamed reply arrives one sentence at a time, play the segments back to back
+  enqueueAudio: (message) => {
+    const queue = get().queue;
+    // The end of a reply whose last sentences could not be spoken
+    if (!message.base64_audio && queue === null) return;
+    if (queue !== null) {
+      set({ queue: [...queue, message] });
+      return;
+    }
+
+    const play = (segment: AudioMessage) => {
+      if (!segment.base64_audio) {
+        playNext();
+        return;
+      }
+      set({ viseme: segment.viseme, wordOffset: segment.word_boundary });
+      get().setAudio(segment.base64_audio, playNext);
+    };
+    const playNext = () => {
+      const [next, ...rest] = get().queue ?? [];
+      if (!next) {
+        set({ queue: null });
+        return;
+      }
+      set({ queue: rest });
+      play(next);
+    };
+
+    set({ queue: [] });
+    play(message);
+  },
+
   togglePlayPause: () => {
     const audio = get().audio;
     const isPlaying = get().isPlaying;
@@ -144,6 +183,7 @@ export const useAvatarSpeak = create<AvatarSpeakState>((set, get) => ({
       viseme: null,
       wordOffset: null,
       isPlaying: false,
+      queue: null,
     }),
 }));
 